@@ -3,6 +3,9 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
+from apps.templates.services.templating import template_renderer
+from infrastructure.helpers.file_helper import PresignedUrlCache
+
 
 class MetricsView(APIView):
     """
@@ -15,7 +18,9 @@ class MetricsView(APIView):
             "status": "ok",
             "metrics": {
                 "version": "1.0.0",
-                "uptime": "0s"  # Здесь можно добавить реальное время работы
+                "uptime": "0s",  # Здесь можно добавить реальное время работы
+                "template_compiled_cache": template_renderer.cache_stats(),
+                "presigned_url_cache": PresignedUrlCache.stats(),
             }
         }, status=status.HTTP_200_OK)
 
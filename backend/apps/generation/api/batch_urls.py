@@ -0,0 +1,11 @@
+"""
+URL-маршруты для API пакетов генерации.
+"""
+from rest_framework.routers import DefaultRouter
+from apps.generation.api.views import RenderBatchViewSet
+
+# Создаем роутер для пакетов генерации
+router = DefaultRouter()
+router.register(r'', RenderBatchViewSet, basename='batch')
+
+urlpatterns = router.urls
\ No newline at end of file
@@ -1,13 +1,20 @@
 """
 Сериализаторы для приложения генерации документов.
 """
+import csv
+import io
+import json
 from rest_framework import serializers
+from django.conf import settings
+from django.db import models
 from django.utils import timezone
 
 # Правильные импорты
-from apps.generation.models import RenderTask, GeneratedDocument
+from apps.generation.models import RenderTask, RenderBatch, GeneratedDocument
 from apps.templates.models import Template, Page, Format, FormatSetting, Unit, PageSettings
 from apps.generation.api.validators import TemplateDataValidator
+from apps.templates.services.field_schema import field_schema_cache
+from apps.generation.services.render_quota import render_quota
 
 
 class GenerateDocumentSerializer(serializers.Serializer):
@@ -15,6 +22,11 @@ class GenerateDocumentSerializer(serializers.Serializer):
     Сериализатор для запроса генерации документа.
     """
     data = serializers.DictField(required=True, help_text="Данные для подстановки в шаблон")
+    priority = serializers.ChoiceField(
+        choices=RenderTask.PRIORITY_CHOICES,
+        default='interactive',
+        help_text="Класс приоритета: interactive или batch"
+    )
     
     def validate(self, attrs):
         """Валидирует данные на соответствие шаблону."""
@@ -34,38 +46,110 @@ class GenerateDocumentSerializer(serializers.Serializer):
     
     def _get_template_fields_structure(self, template):
         """Структурирует поля шаблона для ответа на ошибку."""
-        global_fields = []
-        page_fields = {}
+        return field_schema_cache.get(template).structure()
+
+
+class GenerateBatchSerializer(serializers.Serializer):
+    """
+    Сериализатор для запроса пакетной генерации документов.
+    
+    Данные передаются списком rows или файлом CSV/JSONL (по строке на документ).
+    """
+    rows = serializers.ListField(
+        child=serializers.JSONField(),
+        required=False,
+        help_text="Данные для подстановки, по объекту на документ"
+    )
+    file = serializers.FileField(required=False, help_text="Файл CSV или JSONL с данными")
+    priority = serializers.ChoiceField(
+        choices=RenderTask.PRIORITY_CHOICES,
+        default='batch',
+        help_text="Класс приоритета: interactive или batch"
+    )
+    
+    # Количество строк с ошибками, возвращаемых в ответе
+    MAX_REPORTED_ERRORS = 100
+    
+    def validate(self, attrs):
+        """Разбирает строки и валидирует их на соответствие шаблону за один проход."""
+        rows = attrs.get('rows')
+        upload = attrs.get('file')
         
-        for field in template.fields.all():
-            field_data = {
-                'key': field.key,
-                'label': field.label,
-                'required': field.is_required,
-                'type': field.type,
-            }
-            
-            if field.default_value:
-                field_data['default_value'] = field.default_value
-                
-            if field.type == 'choices' and field.choices.exists():
-                field_data['choices'] = [
-                    {'label': choice.label, 'value': choice.value}
-                    for choice in field.choices.all()
-                ]
-            
-            if field.page is None:
-                global_fields.append(field_data)
-            else:
-                page_key = str(field.page.index)
-                if page_key not in page_fields:
-                    page_fields[page_key] = []
-                page_fields[page_key].append(field_data)
+        if (rows is None) == (upload is None):
+            raise serializers.ValidationError({'detail': 'Передайте либо rows, либо file'})
+        
+        if upload is not None:
+            rows = self._parse_upload(upload)
+        
+        if not rows:
+            raise serializers.ValidationError({'detail': 'Пакет не содержит ни одной строки'})
+        
+        max_rows = settings.GENERATION_BATCH_MAX_ROWS
+        if len(rows) > max_rows:
+            raise serializers.ValidationError({
+                'detail': f'Слишком много строк в пакете: {len(rows)} (максимум {max_rows})'
+            })
+        
+        template = self.context.get('template')
+        if template:
+            row_errors = TemplateDataValidator.validate_rows(template, rows)
+            if row_errors:
+                raise serializers.ValidationError({
+                    'detail': 'Ошибки в данных для шаблона',
+                    'invalid_rows': len(row_errors),
+                    'errors': row_errors[:self.MAX_REPORTED_ERRORS],
+                })
+        
+        attrs['rows'] = rows
+        return attrs
+    
+    def _parse_upload(self, upload):
+        """Читает строки данных из CSV или JSONL файла."""
+        try:
+            content = upload.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise serializers.ValidationError({'file': 'Файл должен быть в кодировке UTF-8'})
+        
+        name = (upload.name or '').lower()
+        if name.endswith('.csv') or upload.content_type in ('text/csv', 'application/csv'):
+            # Пустые ячейки не передаем, чтобы сработали значения по умолчанию
+            reader = csv.DictReader(io.StringIO(content))
+            return [
+                {key: value for key, value in row.items() if key and value not in (None, '')}
+                for row in reader
+            ]
         
-        return {
-            'global_fields': global_fields,
-            'page_fields': page_fields
-        }
+        rows = []
+        for line_number, line in enumerate(content.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                raise serializers.ValidationError({'file': f'Ошибка JSON в строке {line_number}: {e.msg}'})
+        return rows
+
+
+class RenderBatchSerializer(serializers.ModelSerializer):
+    """Сериализатор для пакетов генерации."""
+    progress = serializers.IntegerField(read_only=True)
+    
+    class Meta:
+        model = RenderBatch
+        fields = [
+            'id',
+            'template',
+            'user',
+            'status',
+            'total',
+            'completed',
+            'failed',
+            'progress',
+            'created_at',
+            'updated_at',
+            'finished_at'
+        ]
+        read_only_fields = fields
 
 
 class DocumentSerializer(serializers.ModelSerializer):
@@ -109,11 +193,29 @@ class DocumentDetailSerializer(DocumentSerializer):
         fields = DocumentSerializer.Meta.fields + ['task_data']
 
 
+class RenderTaskListSerializer(serializers.ListSerializer):
+    """
+    Список задач рендеринга.
+    
+    Позиции отложенных задач в очереди читаются для всей страницы одним
+    запросом к Redis, а не отдельным запросом на каждую строку.
+    """
+    
+    def to_representation(self, data):
+        tasks = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context['queue_positions'] = render_quota.positions(
+            [task for task in tasks if task.status == 'pending']
+        )
+        return super().to_representation(tasks)
+
+
 class RenderTaskSerializer(serializers.ModelSerializer):
     """Сериализатор для задач рендеринга."""
+    queue_position = serializers.SerializerMethodField()
     
     class Meta:
         model = RenderTask
+        list_serializer_class = RenderTaskListSerializer
         fields = [
             'id',
             'template',
@@ -125,6 +227,9 @@ class RenderTaskSerializer(serializers.ModelSerializer):
             'progress',
             'error',
             'worker_id',
+            'priority',
+            'queue_position',
+            'batch',
             'created_at',
             'updated_at',
             'finished_at'
@@ -132,14 +237,27 @@ class RenderTaskSerializer(serializers.ModelSerializer):
         read_only_fields = [
             'id',
             'version_id',
+            'batch',
             'status',
             'progress',
             'error',
             'worker_id',
+            'priority',
             'created_at',
             'updated_at',
             'finished_at'
         ]
+    
+    def get_queue_position(self, obj):
+        """Позиция задачи, отложенной лимитом одновременных рендеров."""
+        if obj.status != 'pending':
+            return None
+        
+        # В списке позиции уже прочитаны для всей страницы
+        positions = self.context.get('queue_positions')
+        if positions is not None:
+            return positions.get(str(obj.id))
+        return render_quota.position(obj)
 
 
 class RenderTaskDetailSerializer(RenderTaskSerializer):
@@ -4,13 +4,14 @@ URL-маршруты для API генерации документов.
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from apps.generation.api.views import (
-    RenderTaskViewSet, DocumentViewSet, GenerateDocumentViewSet
+    RenderTaskViewSet, RenderBatchViewSet, DocumentViewSet, GenerateDocumentViewSet
 )
 
 # Создаем маршруты
 router = DefaultRouter()
 router.register(r'tasks', RenderTaskViewSet, basename='render-task')
 router.register(r'documents', DocumentViewSet, basename='document')
+router.register(r'batches', RenderBatchViewSet, basename='render-batch')
 
 # Дополнительные маршруты для генерации
 urlpatterns = [
@@ -20,6 +21,11 @@ urlpatterns = [
         GenerateDocumentViewSet.as_view({'post': 'generate'}),
         name='generate-document'
     ),
+    path(
+        'templates/<uuid:template_id>/generate/batch/',
+        GenerateDocumentViewSet.as_view({'post': 'generate_batch'}),
+        name='generate-document-batch'
+    ),
     path(
         'templates/<uuid:template_id>/fields/',
         GenerateDocumentViewSet.as_view({'get': 'get_template_fields'}),
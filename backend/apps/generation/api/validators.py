@@ -2,11 +2,17 @@
 Валидаторы для генерации документов.
 """
 from typing import Dict, Any, List, Tuple
-from apps.templates.models.template import Template, Field, FieldChoice
+from apps.templates.models.template import Template
+from apps.templates.services.field_schema import field_schema_cache
 
 
 class TemplateDataValidator:
-    """Валидатор данных для шаблонов."""
+    """
+    Валидатор данных для шаблонов.
+    
+    Работает по скомпилированной схеме полей (FieldSchema): поля и варианты
+    выбора загружаются один раз на версию шаблона, проверка идет в памяти.
+    """
     
     @staticmethod
     def validate_template_data(template: Template, data: Dict[str, Any]) -> Tuple[bool, List[Dict[str, str]]]:
@@ -20,74 +26,39 @@ class TemplateDataValidator:
         Returns:
             tuple: (is_valid, errors) - флаг валидности и список ошибок
         """
-        errors = []
-        
-        # Получаем все поля шаблона
-        fields = template.fields.all()
-        
-        # Проверяем обязательные поля
-        for field in fields:
-            if field.is_required:
-                if not field.key in data or data[field.key] is None or str(data[field.key]).strip() == '':
-                    errors.append({
-                        'field': field.key,
-                        'label': field.label,
-                        'error': 'Обязательное поле отсутствует или пустое'
-                    })
-                    continue
-            
-            # Валидируем только если поле присутствует
-            if field.key in data and data[field.key] is not None:
-                field_errors = TemplateDataValidator._validate_field(field, data[field.key])
-                errors.extend(field_errors)
-        
-        # Проверяем на лишние поля
-        template_field_keys = set(field.key for field in fields)
-        data_keys = set(data.keys())
-        extra_keys = data_keys - template_field_keys
-        
-        for extra_key in extra_keys:
-            errors.append({
-                'field': extra_key,
-                'label': extra_key,
-                'error': 'Поле не существует в шаблоне'
-            })
-        
+        errors = field_schema_cache.get(template).validate(data)
         return len(errors) == 0, errors
     
     @staticmethod
-    def _validate_field(field: Field, value: Any) -> List[Dict[str, str]]:
+    def validate_rows(template: Template, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
-        Валидирует конкретное поле.
+        Валидирует набор строк данных за один проход.
+        
+        Схема полей шаблона загружается один раз на весь набор.
         
         Args:
-            field: Поле шаблона
-            value: Значение для проверки
+            template: Объект шаблона
+            rows: Список данных для подстановки
             
         Returns:
-            List[Dict[str, str]]: Список ошибок
+            List[Dict[str, Any]]: Ошибки по строкам: [{'row': индекс, 'errors': [...]}]
         """
-        errors = []
+        schema = field_schema_cache.get(template)
         
-        if field.type == 'choices':
-            # Проверяем, что значение есть среди допустимых
-            valid_values = list(field.choices.values_list('value', flat=True))
-            
-            if str(value) not in map(str, valid_values):
-                choices_info = [
-                    f"{choice.label} ({choice.value})" 
-                    for choice in field.choices.all().order_by('order')
-                ]
-                errors.append({
-                    'field': field.key,
-                    'label': field.label,
-                    'error': f'Значение должно быть одним из: {", ".join(choices_info)}'
+        row_errors = []
+        for index, data in enumerate(rows):
+            if not isinstance(data, dict):
+                row_errors.append({
+                    'row': index,
+                    'errors': [{'field': None, 'label': None, 'error': 'Строка должна быть объектом'}]
                 })
+                continue
+            
+            errors = schema.validate(data)
+            if errors:
+                row_errors.append({'row': index, 'errors': errors})
         
-        # Дополнительные валидации можно добавить здесь
-        # например для email, phone, url и т.д.
-        
-        return errors
+        return row_errors
     
     @staticmethod
     def get_template_fields_structure(template: Template) -> Dict[str, Any]:
@@ -100,44 +71,12 @@ class TemplateDataValidator:
         Returns:
             Dict: Структура полей
         """
-        global_fields = []
-        page_fields = {}
-        
-        for field in template.fields.all().order_by('page__index', 'order'):
-            field_data = {
-                'key': field.key,
-                'label': field.label,
-                'type': field.type,
-                'required': field.is_required,
-                'placeholder': field.placeholder,
-                'help_text': field.help_text,
-            }
-            
-            if field.default_value:
-                field_data['default_value'] = field.default_value
-            
-            if field.type == 'choices' and field.choices.exists():
-                field_data['choices'] = [
-                    {
-                        'label': choice.label,
-                        'value': choice.value,
-                        'order': choice.order
-                    }
-                    for choice in field.choices.all().order_by('order')
-                ]
-            
-            if field.page is None:
-                global_fields.append(field_data)
-            else:
-                page_key = str(field.page.index)
-                if page_key not in page_fields:
-                    page_fields[page_key] = {
-                        'index': field.page.index,
-                        'fields': []
-                    }
-                page_fields[page_key]['fields'].append(field_data)
+        structure = field_schema_cache.get(template).structure()
         
         return {
-            'global_fields': global_fields,
-            'page_fields': page_fields
-        } 
\ No newline at end of file
+            'global_fields': structure['global_fields'],
+            'page_fields': {
+                page_key: {'index': int(page_key), 'fields': fields}
+                for page_key, fields in structure['page_fields'].items()
+            }
+        }
@@ -13,21 +13,24 @@ from django_filters import rest_framework as filters
 from rest_framework.decorators import action
 from reversion import revisions
 from reversion.models import Version
-import requests
 
 from apps.templates.models import Template
 from apps.templates.api.permissions import IsPublicTemplateOrAuthenticated
 from apps.templates.services.templating import template_renderer
-from apps.generation.models import RenderTask, GeneratedDocument
+from apps.templates.services.field_schema import field_schema_cache
+from apps.generation.models import RenderTask, RenderBatch, GeneratedDocument
 from apps.generation.api.serializers import (
     RenderTaskSerializer, RenderTaskDetailSerializer,
+    RenderBatchSerializer,
     DocumentSerializer, DocumentDetailSerializer,
-    GenerateDocumentSerializer,
+    GenerateDocumentSerializer, GenerateBatchSerializer,
     TemplateSerializer
 )
 from apps.generation.tasks.render import render_pdf, render_png, render_svg
 from apps.generation.services.document_generation_service import DocumentGenerationService, DocumentGenerationError
 from apps.generation.api.permissions import DocumentTokenOrAuthenticated
+from infrastructure.renderers.balancer import renderer_balancer
+from infrastructure.renderers.render_client import RendererClient
 
 logger = logging.getLogger(__name__)
 
@@ -101,6 +104,35 @@ class RenderTaskViewSet(viewsets.ReadOnlyModelViewSet):
         return RenderTaskSerializer
 
 
+class RenderBatchViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet для просмотра пакетов генерации.
+    """
+    serializer_class = RenderBatchSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        """Возвращает пакеты пользователя."""
+        user = self.request.user
+        if user.is_staff:
+            return RenderBatch.objects.all().order_by('-created_at')
+        return RenderBatch.objects.filter(user=user).order_by('-created_at')
+    
+    @action(detail=True, methods=['get'])
+    def tasks(self, request, pk=None):
+        """Возвращает задачи пакета постранично."""
+        batch = self.get_object()
+        queryset = batch.tasks.all().order_by('created_at')
+        
+        status_filter = request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        
+        page = self.paginate_queryset(queryset)
+        serializer = RenderTaskSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+
 class DocumentFilter(filters.FilterSet):
     """Фильтры для документов."""
     
@@ -161,6 +193,18 @@ class GenerateDocumentViewSet(viewsets.GenericViewSet):
         template_id = self.kwargs.get('template_id')
         return get_object_or_404(Template, id=template_id)
     
+    def get_permissions(self):
+        """Пакетная генерация доступна только авторизованным пользователям."""
+        if self.action == 'generate_batch':
+            return [IsAuthenticated(), IsPublicTemplateOrAuthenticated()]
+        return super().get_permissions()
+    
+    def get_serializer_class(self):
+        """Выбор сериализатора в зависимости от действия."""
+        if self.action == 'generate_batch':
+            return GenerateBatchSerializer
+        return super().get_serializer_class()
+    
     def generate(self, request, template_id=None):
         """
         Генерирует документ из шаблона.
@@ -180,7 +224,8 @@ class GenerateDocumentViewSet(viewsets.GenericViewSet):
                 template=template,
                 data=serializer.validated_data['data'],
                 user=request.user,
-                request_ip=self._get_client_ip(request)
+                request_ip=self._get_client_ip(request),
+                priority=serializer.validated_data['priority']
             )
             
             # Создаем структуру ответа
@@ -210,75 +255,81 @@ class GenerateDocumentViewSet(viewsets.GenericViewSet):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
-    @action(detail=True, methods=['get'], url_path='fields')
-    def get_template_fields(self, request, template_id=None):
-        """Возвращает структуру полей шаблона для генерации."""
+    def generate_batch(self, request, template_id=None):
+        """
+        Создает пакет документов из одного шаблона.
+        
+        Принимает список rows или файл CSV/JSONL. Все строки валидируются
+        до создания задач; прогресс доступен через пакет.
+        """
         template = self.get_object()
         
-        # Собираем структуру полей
-        global_fields = []
-        page_fields = {}
+        # Проверяем права доступа
+        self.check_object_permissions(request, template)
         
-        for field in template.fields.all().order_by('page__index', 'order'):
-            field_info = {
-                'key': field.key,
-                'label': field.label,
-                'type': field.type,
-                'required': field.is_required,
-                'placeholder': field.placeholder,
-                'help_text': field.help_text,
-            }
-            
-            if field.default_value:
-                field_info['default_value'] = field.default_value
-            
-            if field.type == 'choices' and field.choices.exists():
-                field_info['choices'] = [
-                    {'label': choice.label, 'value': choice.value}
-                    for choice in field.choices.all().order_by('order')
-                ]
+        # Валидируем все строки за один проход
+        serializer = self.get_serializer(data=request.data, context={'template': template})
+        serializer.is_valid(raise_exception=True)
+        
+        try:
+            batch = DocumentGenerationService.generate_batch(
+                template=template,
+                rows=serializer.validated_data['rows'],
+                user=request.user,
+                request_ip=self._get_client_ip(request),
+                priority=serializer.validated_data['priority']
+            )
+            return Response(RenderBatchSerializer(batch).data, status=status.HTTP_202_ACCEPTED)
             
-            if field.page is None:
-                global_fields.append(field_info)
-            else:
-                page_key = str(field.page.index)
-                if page_key not in page_fields:
-                    page_fields[page_key] = []
-                page_fields[page_key].append(field_info)
+        except DocumentGenerationError as e:
+            return Response(
+                {'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except Exception as e:
+            logger.error(f"Unexpected error in batch generation: {e}")
+            return Response(
+                {'error': 'Произошла неожиданная ошибка'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @action(detail=True, methods=['get'], url_path='fields')
+    def get_template_fields(self, request, template_id=None):
+        """Возвращает структуру полей шаблона для генерации."""
+        template = self.get_object()
         
-        return Response({
-            'global_fields': global_fields,
-            'page_fields': page_fields
-        })
+        # Структура полей строится из закешированной схемы версии шаблона
+        return Response(field_schema_cache.get(template).structure())
     
     @action(detail=True, methods=['get'], url_path='renderer-status')
     def check_renderer_status(self, request, template_id=None):
-        """Проверяет доступность сервисов рендеринга."""
+        """
+        Проверяет доступность сервисов рендеринга.
+        
+        Проверяются все экземпляры рендерера формата; для каждого возвращается
+        состояние circuit breaker и статистика запросов.
+        """
         template = self.get_object()
+        format_name = template.format.name
         
-        # Получаем URL рендерера из шаблона
-        renderer_url = template.format.render_url
+        renderer_urls = RendererClient.get_renderer_urls(format_name)
+        checks = {url: renderer_balancer.check_health(url) for url in renderer_urls}
         
-        # Получаем URL для проверки здоровья из URL рендеринга
-        # Предполагаем, что health endpoint это тот же URL, но с заменой последнего сегмента
-        url_parts = renderer_url.split('/')
-        # Заменяем последний сегмент на health
-        url_parts[-1] = 'health'
-        health_url = '/'.join(url_parts)
+        endpoints = []
+        for stats in renderer_balancer.stats(renderer_urls):
+            check = checks[stats['url']]
+            endpoints.append({**stats, 'status': check['status'], 'message': check['message']})
         
-        try:
-            response = requests.get(health_url, timeout=5)
-            status = 'available' if response.ok else 'error'
-            message = response.text if not response.ok else "Сервис доступен"
-        except Exception as e:
-            status = 'unavailable'
-            message = f"Ошибка подключения: {str(e)}"
+        # Формат доступен, если отвечает хотя бы один экземпляр
+        available = [endpoint for endpoint in endpoints if endpoint['status'] == 'available']
+        primary = available[0] if available else endpoints[0]
         
         return Response({
-            'format': template.format.name,
-            'renderer_url': renderer_url,
-            'status': status,
-            'message': message
+            'format': format_name,
+            'renderer_url': primary['url'],
+            'status': primary['status'],
+            'message': primary['message'],
+            'endpoints': endpoints
         })
     
     def _get_client_ip(self, request):
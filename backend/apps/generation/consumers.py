@@ -1,15 +1,94 @@
 """
 WebSocket потребители для отслеживания прогресса генерации документов.
+
+- TaskProgressConsumer - одна задача (ws/tasks/<id>/stream/);
+- RenderStreamConsumer - задачи и пакеты через одно соединение (ws/render/stream/).
+
+Доступ проверяется так же, как в REST API: владелец задачи (или staff)
+либо токен документа анонимной задачи в параметре ?document_token=.
 """
 import json
 import logging
-from channels.generic.websocket import AsyncWebsocketConsumer
+import uuid
+from urllib.parse import parse_qs
+from channels.generic.websocket import AsyncJsonWebsocketConsumer, AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
-from apps.generation.models import RenderTask
+from django.conf import settings
+from django.utils import timezone
+from apps.generation.models import RenderTask, RenderBatch
+from apps.generation.tasks.progress import batch_group, task_group
 
 logger = logging.getLogger(__name__)
 
 
+def get_document_token(scope):
+    """Токен документа из параметров строки подключения."""
+    query = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+    return (query.get('document_token') or [None])[0]
+
+
+def accessible_tasks(user, document_token=None):
+    """Задачи, доступные по токену документа или пользователю (как в RenderTaskViewSet)."""
+    if document_token:
+        return RenderTask.objects.filter(
+            document_token=document_token,
+            document_token_expires_at__gt=timezone.now()
+        )
+    
+    if user and user.is_authenticated:
+        if user.is_staff:
+            return RenderTask.objects.all()
+        return RenderTask.objects.filter(user=user)
+    
+    return RenderTask.objects.none()
+
+
+def accessible_batches(user):
+    """Пакеты, доступные пользователю (как в RenderBatchViewSet)."""
+    if user and user.is_authenticated:
+        if user.is_staff:
+            return RenderBatch.objects.all()
+        return RenderBatch.objects.filter(user=user)
+    
+    return RenderBatch.objects.none()
+
+
+def task_state(task):
+    """Текущее состояние задачи в формате событий WebSocket."""
+    data = {
+        'task_id': str(task.id),
+        'status': task.status,
+        'progress': task.progress,
+    }
+    
+    # Добавляем информацию об ошибке, если есть
+    if task.status == 'failed' and task.error:
+        data['error'] = task.error
+    
+    # Добавляем информацию о документе, если задача выполнена
+    if task.status == 'done':
+        # documents может быть предзагружен (подписка на много задач)
+        document = max(task.documents.all(), key=lambda document: document.created_at, default=None)
+        if document:
+            data['document_id'] = str(document.id)
+            data['document_url'] = document.file
+            data['file_url'] = document.file
+    
+    return data
+
+
+def batch_state(batch):
+    """Текущее состояние пакета в формате событий WebSocket."""
+    return {
+        'batch_id': str(batch.id),
+        'status': batch.status,
+        'total': batch.total,
+        'completed': batch.completed,
+        'failed': batch.failed,
+        'progress': batch.progress,
+    }
+
+
 class TaskProgressConsumer(AsyncWebsocketConsumer):
     """
     WebSocket потребитель для отслеживания прогресса задач рендеринга в реальном времени.
@@ -19,11 +98,11 @@ class TaskProgressConsumer(AsyncWebsocketConsumer):
         """Обработчик подключения клиента WebSocket."""
         # Получаем ID задачи из URL
         self.task_id = self.scope['url_route']['kwargs']['task_id']
-        self.group_name = f"task_{self.task_id}"
+        self.group_name = task_group(self.task_id)
         
         # Проверяем существование задачи и права доступа
-        task_exists = await self.check_task_exists()
-        if not task_exists:
+        task_data = await self.get_task_data()
+        if not task_data:
             logger.warning(f"WebSocket connection rejected: Task {self.task_id} not found")
             await self.close()
             return
@@ -34,12 +113,9 @@ class TaskProgressConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
         
-        # Принимаем подключение
+        # Принимаем подключение и отправляем текущее состояние задачи
         await self.accept()
-        
-        # Отправляем текущее состояние задачи
-        task_data = await self.get_task_data()
-        await self.send_task_status(task_data)
+        await self.send(text_data=json.dumps(task_data))
     
     async def disconnect(self, close_code):
         """Обработчик отключения клиента WebSocket."""
@@ -49,60 +125,144 @@ class TaskProgressConsumer(AsyncWebsocketConsumer):
             self.channel_name
         )
     
-    async def receive(self, text_data):
+    async def receive(self, text_data=None, bytes_data=None):
         """Обработчик входящих сообщений (не используется)."""
         # Клиенты не должны отправлять сообщения, поэтому игнорируем
         pass
     
-    async def task_progress(self, event):
+    async def render_task_update(self, event):
         """
         Обработчик сообщений о прогрессе задачи.
         
         Получает обновления от Celery задачи и отправляет их клиенту.
         """
-        # Отправляем сообщение клиенту
         await self.send(text_data=json.dumps(event['message']))
     
-    async def send_task_status(self, task_data):
-        """Отправляет текущее состояние задачи клиенту."""
-        if task_data:
-            await self.send(text_data=json.dumps(task_data))
-    
-    @database_sync_to_async
-    def check_task_exists(self):
-        """Проверяет существование задачи."""
-        try:
-            return RenderTask.objects.filter(id=self.task_id).exists()
-        except Exception as e:
-            logger.error(f"Error checking task existence: {e}")
-            return False
-    
     @database_sync_to_async
     def get_task_data(self):
-        """Получает текущие данные о задаче."""
+        """Получает текущие данные о задаче, если она доступна клиенту."""
         try:
-            task = RenderTask.objects.get(id=self.task_id)
-            
-            data = {
-                'status': task.status,
-                'progress': task.progress,
-            }
-            
-            # Добавляем информацию об ошибке, если есть
-            if task.status == 'failed' and task.error:
-                data['error'] = task.error
-            
-            # Добавляем информацию о документе, если задача выполнена
-            if task.status == 'done' and task.documents.exists():
-                document = task.documents.first()
-                data['document_id'] = str(document.id)
-                data['file_url'] = document.file
-            
-            return data
-        
+            task = accessible_tasks(self.scope.get('user'), get_document_token(self.scope)).get(id=self.task_id)
+            return task_state(task)
         except RenderTask.DoesNotExist:
-            logger.warning(f"Task {self.task_id} not found when trying to get data")
             return None
         except Exception as e:
             logger.error(f"Error getting task data: {e}")
-            return None
\ No newline at end of file
+            return None
+
+
+class RenderStreamConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Поток статусов многих задач и пакетов через одно соединение.
+    
+    Клиент управляет подпиской сообщениями:
+        {"action": "subscribe", "tasks": ["<id>", ...], "batches": ["<id>", ...]}
+        {"action": "unsubscribe", "tasks": [...], "batches": [...]}
+    
+    После подписки приходит текущее состояние каждого объекта, затем события:
+        {"type": "task", "task_id": "...", "status": "...", "progress": ...}
+        {"type": "batch", "batch_id": "...", "status": "...", "progress": ...}
+    
+    Подписка на пакет доставляет его прогресс и итоговые события (done, failed)
+    всех его задач, поэтому за пакетом следят одним соединением.
+    """
+    
+    async def connect(self):
+        """Принимает подключение; доступ проверяется при подписке."""
+        self.subscriptions = set()
+        self.document_token = get_document_token(self.scope)
+        await self.accept()
+    
+    async def disconnect(self, close_code):
+        """Покидает все группы подписки."""
+        for group in getattr(self, 'subscriptions', ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
+    
+    async def receive_json(self, content, **kwargs):
+        """Обрабатывает сообщения подписки."""
+        action = content.get('action') if isinstance(content, dict) else None
+        if action not in ('subscribe', 'unsubscribe'):
+            await self.send_json({'type': 'error', 'error': 'unknown_action'})
+            return
+        
+        task_ids = self._parse_ids(content.get('tasks'))
+        batch_ids = self._parse_ids(content.get('batches'))
+        
+        if action == 'subscribe':
+            await self.subscribe(task_ids, batch_ids)
+        else:
+            await self.unsubscribe(task_ids, batch_ids)
+    
+    async def subscribe(self, task_ids, batch_ids):
+        """Подписывает соединение на доступные задачи и пакеты и отправляет их состояние."""
+        tasks, batches = await self.get_states(task_ids, batch_ids)
+        
+        subscribed = [(task_group(state['task_id']), dict(state, type='task')) for state in tasks]
+        subscribed += [(batch_group(state['batch_id']), dict(state, type='batch')) for state in batches]
+        
+        for group, state in subscribed:
+            if group not in self.subscriptions:
+                if len(self.subscriptions) >= settings.WS_MAX_SUBSCRIPTIONS:
+                    await self.send_json({'type': 'error', 'error': 'subscription_limit', 'limit': settings.WS_MAX_SUBSCRIPTIONS})
+                    break
+                await self.channel_layer.group_add(group, self.channel_name)
+                self.subscriptions.add(group)
+            await self.send_json(state)
+        
+        # Недоступные объекты не отличаются от несуществующих
+        found_tasks = {state['task_id'] for state in tasks}
+        found_batches = {state['batch_id'] for state in batches}
+        missing_tasks = [task_id for task_id in task_ids if task_id not in found_tasks]
+        missing_batches = [batch_id for batch_id in batch_ids if batch_id not in found_batches]
+        if missing_tasks or missing_batches:
+            await self.send_json({
+                'type': 'error',
+                'error': 'not_found',
+                'tasks': missing_tasks,
+                'batches': missing_batches,
+            })
+    
+    async def unsubscribe(self, task_ids, batch_ids):
+        """Отписывает соединение от задач и пакетов."""
+        groups = [task_group(task_id) for task_id in task_ids] + [batch_group(batch_id) for batch_id in batch_ids]
+        for group in groups:
+            if group in self.subscriptions:
+                await self.channel_layer.group_discard(group, self.channel_name)
+                self.subscriptions.discard(group)
+    
+    async def render_task_update(self, event):
+        """Событие задачи."""
+        await self.send_json(dict(event['message'], type='task'))
+    
+    async def render_batch_update(self, event):
+        """Событие пакета."""
+        await self.send_json(dict(event['message'], type='batch'))
+    
+    @database_sync_to_async
+    def get_states(self, task_ids, batch_ids):
+        """Состояние доступных клиенту задач и пакетов."""
+        user = self.scope.get('user')
+        tasks = []
+        if task_ids:
+            queryset = accessible_tasks(user, self.document_token).filter(id__in=task_ids).prefetch_related('documents')
+            tasks = [task_state(task) for task in queryset]
+        
+        batches = []
+        if batch_ids:
+            batches = [batch_state(batch) for batch in accessible_batches(user).filter(id__in=batch_ids)]
+        
+        return tasks, batches
+    
+    @staticmethod
+    def _parse_ids(values):
+        """Нормализует список UUID; некорректные значения отбрасываются."""
+        if not isinstance(values, list):
+            return []
+        
+        ids = []
+        for value in values[:settings.WS_MAX_SUBSCRIPTIONS]:
+            try:
+                ids.append(str(uuid.UUID(str(value))))
+            except ValueError:
+                continue
+        return list(dict.fromkeys(ids))
@@ -0,0 +1,5 @@
+"""
+Команды управления для генерации документов.
+"""
+
+# This file is intentionally left empty 
\ No newline at end of file
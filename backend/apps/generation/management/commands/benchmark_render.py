@@ -0,0 +1,103 @@
+"""
+Сравнение пропускной способности рендеринга: prefork против асинхронного режима.
+
+Запуск:
+    python manage.py benchmark_render --format pdf --requests 64 --processes 4 --concurrency 16
+    python manage.py benchmark_render --url http://pdf-renderer:8080/render --html-file card.html
+
+Измеряется только обмен с рендерером: БД и MinIO не участвуют.
+"""
+import asyncio
+import io
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from infrastructure.renderers.render_client import RendererClient, AsyncRendererClient, RendererSessionPool
+
+
+SAMPLE_HTML = """
+<html>
+  <body style="font-family: sans-serif; padding: 24px">
+    <h1>Иван Иванов</h1>
+    <p>Ведущий разработчик</p>
+  </body>
+</html>
+"""
+
+SAMPLE_OPTIONS = {'width': 90, 'height': 50, 'unit': 'mm'}
+
+
+def _render_blocking(args):
+    """Один рендер так, как его выполняет процесс prefork-воркера."""
+    format_type, url, html = args
+    started = time.perf_counter()
+    RendererClient(format_type, renderer_url=url).render(html, SAMPLE_OPTIONS)
+    return time.perf_counter() - started
+
+
+async def _render_async(format_type, url, html, count, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    client = AsyncRendererClient(format_type, renderer_url=url)
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await client.render_to_file(html, SAMPLE_OPTIONS, io.BytesIO())
+            return time.perf_counter() - started
+
+    try:
+        return await asyncio.gather(*(one() for _ in range(count)))
+    finally:
+        await AsyncRendererClient.close_http_client()
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает пропускную способность prefork и асинхронного режима рендеринга'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', default='pdf', help='Формат документа (pdf, png, svg)')
+        parser.add_argument('--url', default=None, help='URL рендерера (по умолчанию из Format)')
+        parser.add_argument('--html-file', default=None, help='HTML для рендеринга')
+        parser.add_argument('--requests', type=int, default=64, help='Количество рендеров в каждом режиме')
+        parser.add_argument('--processes', type=int, default=4, help='Процессов prefork-воркера')
+        parser.add_argument('--concurrency', type=int, default=16, help='Рендеров в полете в асинхронном режиме')
+
+    def handle(self, *args, **options):
+        format_type = options['format']
+        url = options['url'] or RendererClient.get_renderer_url(format_type)
+        count = options['requests']
+
+        html = SAMPLE_HTML
+        if options['html_file']:
+            with open(options['html_file'], 'r', encoding='utf-8') as f:
+                html = f.read()
+
+        self.stdout.write(f"Renderer: {url}, requests: {count}, HTML size: {len(html)} chars")
+
+        # Прогрев рендерера
+        _render_blocking((format_type, url, html))
+
+        started = time.perf_counter()
+        # Как и в воркере Celery, дочерние процессы не делят сокеты с родителем
+        with ProcessPoolExecutor(max_workers=options['processes'], initializer=RendererSessionPool.close_all) as pool:
+            prefork = list(pool.map(_render_blocking, [(format_type, url, html)] * count))
+        self._summary(f"prefork x{options['processes']}", prefork, time.perf_counter() - started)
+
+        started = time.perf_counter()
+        async_timings = asyncio.run(_render_async(format_type, url, html, count, options['concurrency']))
+        self._summary(
+            f"async 1 process, {options['concurrency']} in flight",
+            async_timings,
+            time.perf_counter() - started
+        )
+
+    def _summary(self, name, timings, elapsed):
+        ordered = sorted(timings)
+        p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+        self.stdout.write(
+            f"{name:<32} throughput={len(timings) / elapsed:7.2f}/s  "
+            f"mean={statistics.mean(timings) * 1000:8.1f}ms  p95={p95 * 1000:8.1f}ms"
+        )
@@ -0,0 +1,73 @@
+"""
+Очереди пулов воркеров Celery и подсказки по их масштабированию.
+
+Запуск:
+    python manage.py celery_pools
+    python manage.py celery_pools --json
+
+Для каждого пула выводятся очереди (аргумент -Q), глубина очередей,
+рекомендуемое число процессов и команда запуска воркера. Вывод --json
+предназначен для внешнего автоскейлера.
+"""
+import json
+import math
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.celery import app
+from apps.generation.tasks.routing import RenderQueues
+
+
+class Command(BaseCommand):
+    help = 'Показывает очереди пулов воркеров Celery и подсказки по масштабированию'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Вывести результат в JSON')
+
+    def handle(self, *args, **options):
+        pools = []
+        with app.connection_for_read() as connection:
+            channel = connection.default_channel
+            for name, config in settings.CELERY_WORKER_POOLS.items():
+                queues = RenderQueues.pool_queues(name)
+                depth = {queue: _queue_depth(channel, queue) for queue in queues}
+                pools.append({
+                    'pool': name,
+                    'queues': queues,
+                    'depth': depth,
+                    'min': config['min'],
+                    'max': config['max'],
+                    'suggested_concurrency': _suggested_concurrency(sum(depth.values()), config),
+                    'command': (
+                        f"celery -A core worker -n {name}@%h -Q {','.join(queues)} "
+                        f"--autoscale={config['max']},{config['min']}"
+                    ),
+                })
+
+        if options['json']:
+            self.stdout.write(json.dumps(pools, indent=2))
+            return
+
+        for pool in pools:
+            self.stdout.write(
+                f"{pool['pool']}: {sum(pool['depth'].values())} queued, "
+                f"suggested concurrency {pool['suggested_concurrency']} ({pool['min']}..{pool['max']})"
+            )
+            for queue, depth in pool['depth'].items():
+                self.stdout.write(f"  {queue:<28} {depth}")
+            self.stdout.write(f"  {pool['command']}")
+
+
+def _queue_depth(channel, queue: str) -> int:
+    """Количество сообщений в очереди брокера (0, если очередь еще не создана)."""
+    try:
+        return channel.queue_declare(queue=queue, passive=True).message_count
+    except Exception:
+        return 0
+
+
+def _suggested_concurrency(depth: int, config: dict) -> int:
+    """Число процессов, при котором на каждый приходится не больше CELERY_QUEUE_TARGET_PER_WORKER задач."""
+    wanted = math.ceil(depth / settings.CELERY_QUEUE_TARGET_PER_WORKER)
+    return max(config['min'], min(config['max'], wanted))
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generation', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rendertask',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 версии шаблона, HTML и опций рендеринга', max_length=64, null=True),
+        ),
+    ]
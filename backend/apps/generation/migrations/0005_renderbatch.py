@@ -0,0 +1,50 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:09
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('templates', '0003_template_dedupe_renders'),
+        ('generation', '0004_rendertask_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('request_ip', models.GenericIPAddressField(blank=True, help_text='IP адрес запроса', null=True)),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('processing', 'В обработке'), ('done', 'Завершено'), ('failed', 'Ошибка')], default='pending', help_text='Статус пакета', max_length=20)),
+                ('total', models.PositiveIntegerField(default=0, help_text='Количество задач в пакете')),
+                ('completed', models.PositiveIntegerField(default=0, help_text='Успешно завершенные задачи')),
+                ('failed', models.PositiveIntegerField(default=0, help_text='Задачи, завершившиеся с ошибкой')),
+                ('finished_at', models.DateTimeField(blank=True, help_text='Время завершения', null=True)),
+                ('template', models.ForeignKey(help_text='Шаблон', on_delete=django.db.models.deletion.CASCADE, related_name='render_batches', to='templates.template')),
+                ('user', models.ForeignKey(blank=True, help_text='Пользователь, запросивший генерацию', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='render_batches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Пакет генерации',
+                'verbose_name_plural': 'Пакеты генерации',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='rendertask',
+            name='batch',
+            field=models.ForeignKey(blank=True, help_text='Пакет генерации', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='generation.renderbatch'),
+        ),
+        migrations.AddIndex(
+            model_name='renderbatch',
+            index=models.Index(fields=['user', '-created_at'], name='generation__user_id_1ec3b7_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generation', '0005_renderbatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generateddocument',
+            name='checksum',
+            field=models.CharField(blank=True, help_text='SHA-256 содержимого файла', max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generation', '0006_generateddocument_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rendertask',
+            name='priority',
+            field=models.CharField(choices=[('interactive', 'Интерактивный'), ('batch', 'Пакетный')], default='interactive', help_text='Класс приоритета', max_length=20),
+        ),
+    ]
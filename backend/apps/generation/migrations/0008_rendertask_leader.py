@@ -0,0 +1,19 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('generation', '0007_rendertask_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rendertask',
+            name='leader',
+            field=models.ForeignKey(blank=True, help_text='Ведущая задача объединенного рендеринга', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='followers', to='generation.rendertask'),
+        ),
+    ]
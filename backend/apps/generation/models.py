@@ -25,6 +25,11 @@ class RenderTask(BaseModel):
         ('failed', 'Ошибка'),
     ]
     
+    PRIORITY_CHOICES = [
+        ('interactive', 'Интерактивный'),
+        ('batch', 'Пакетный'),
+    ]
+    
     template = models.ForeignKey(
         Template,
         on_delete=models.CASCADE,
@@ -60,6 +65,14 @@ class RenderTask(BaseModel):
     )
     error = models.TextField(blank=True, help_text="Сообщение об ошибке")
     
+    # Класс приоритета определяет очереди Celery задачи
+    priority = models.CharField(
+        max_length=20,
+        choices=PRIORITY_CHOICES,
+        default='interactive',
+        help_text="Класс приоритета"
+    )
+    
     # Данные для рендеринга
     data_input = models.JSONField(
         default=dict,
@@ -99,6 +112,35 @@ class RenderTask(BaseModel):
         help_text="Время истечения токена доступа"
     )
     
+    # Пакет генерации, в который входит задача
+    batch = models.ForeignKey(
+        'RenderBatch',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='tasks',
+        help_text="Пакет генерации"
+    )
+    
+    # Хеш содержимого рендеринга для дедупликации документов
+    content_hash = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        db_index=True,
+        help_text="SHA-256 версии шаблона, HTML и опций рендеринга"
+    )
+    
+    # Ведущая задача с тем же хешем, результатом которой завершится эта задача
+    leader = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='followers',
+        help_text="Ведущая задача объединенного рендеринга"
+    )
+    
     class Meta:
         verbose_name = "Задача рендеринга"
         verbose_name_plural = "Задачи рендеринга"
@@ -117,6 +159,10 @@ class RenderTask(BaseModel):
         self.progress = 100
         self.finished_at = timezone.now()
         self.save(update_fields=['status', 'progress', 'finished_at'])
+        self._release_quota()
+        
+        if self.batch_id:
+            RenderBatch.record_result(self.batch_id, success=True)
     
     def mark_as_failed(self, error_message):
         """Отмечает задачу как завершившуюся с ошибкой."""
@@ -124,6 +170,12 @@ class RenderTask(BaseModel):
         self.error = error_message
         self.finished_at = timezone.now()
         self.save(update_fields=['status', 'error', 'finished_at'])
+        self._release_quota()
+    
+    def _release_quota(self):
+        """Освобождает слоты задачи в лимитах одновременных рендеров."""
+        from apps.generation.services.render_quota import render_quota
+        render_quota.release(self)
     
     def mark_as_processing(self):
         """Отмечает задачу как обрабатываемую."""
@@ -163,6 +215,7 @@ class GeneratedDocument(BaseModel):
     size_bytes = models.PositiveIntegerField(help_text="Размер файла в байтах")
     file_name = models.CharField(max_length=255, help_text="Имя файла")
     content_type = models.CharField(max_length=100, help_text="MIME-тип файла")
+    checksum = models.CharField(max_length=64, blank=True, help_text="SHA-256 содержимого файла")
     
     class Meta:
         verbose_name = "Документ"
@@ -173,4 +226,96 @@ class GeneratedDocument(BaseModel):
         ]
     
     def __str__(self):
-        return self.file_name
\ No newline at end of file
+        return self.file_name
+
+
+class RenderBatch(BaseModel):
+    """
+    Пакет генерации документов.
+    
+    Объединяет задачи рендеринга одного шаблона с разными данными
+    и агрегирует их прогресс.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Ожидает'),
+        ('processing', 'В обработке'),
+        ('done', 'Завершено'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    template = models.ForeignKey(
+        Template,
+        on_delete=models.CASCADE,
+        related_name='render_batches',
+        help_text="Шаблон"
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='render_batches',
+        help_text="Пользователь, запросивший генерацию"
+    )
+    request_ip = models.GenericIPAddressField(
+        null=True,
+        blank=True,
+        help_text="IP адрес запроса"
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='pending',
+        help_text="Статус пакета"
+    )
+    total = models.PositiveIntegerField(default=0, help_text="Количество задач в пакете")
+    completed = models.PositiveIntegerField(default=0, help_text="Успешно завершенные задачи")
+    failed = models.PositiveIntegerField(default=0, help_text="Задачи, завершившиеся с ошибкой")
+    finished_at = models.DateTimeField(null=True, blank=True, help_text="Время завершения")
+    
+    class Meta:
+        verbose_name = "Пакет генерации"
+        verbose_name_plural = "Пакеты генерации"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.template.name} x{self.total} - {self.get_status_display()}"
+    
+    @property
+    def progress(self):
+        """Процент обработанных задач пакета."""
+        if not self.total:
+            return 0
+        return int((self.completed + self.failed) * 100 / self.total)
+    
+    @classmethod
+    def record_result(cls, batch_id, success):
+        """
+        Атомарно учитывает результат задачи пакета и завершает пакет,
+        когда обработаны все задачи.
+        """
+        counter = 'completed' if success else 'failed'
+        cls.objects.filter(id=batch_id, finished_at__isnull=True).update(
+            **{counter: models.F(counter) + 1},
+            status='processing',
+            updated_at=timezone.now()
+        )
+        
+        # Завершаем пакет ровно один раз: условие отсекает повторные вызовы
+        finished = cls.objects.filter(
+            id=batch_id,
+            finished_at__isnull=True,
+            total__lte=models.F('completed') + models.F('failed')
+        ).update(
+            # Пакет считается неуспешным, только если не удалась ни одна задача
+            status=models.Case(
+                models.When(completed=0, then=models.Value('failed')),
+                default=models.Value('done'),
+            ),
+            finished_at=timezone.now()
+        )
+        
+        return finished > 0
@@ -6,4 +6,5 @@ from . import consumers
 
 websocket_urlpatterns = [
     path('ws/tasks/<uuid:task_id>/stream/', consumers.TaskProgressConsumer.as_asgi()),
-]
\ No newline at end of file
+    path('ws/render/stream/', consumers.RenderStreamConsumer.as_asgi()),
+]
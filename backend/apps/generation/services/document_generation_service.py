@@ -1,20 +1,34 @@
 """
 Сервис для генерации документов.
 """
+import hashlib
+import json
 import logging
-from typing import Dict, Any, Optional
+import re
+from datetime import timedelta
+from typing import Dict, Any, List, Optional
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F, Prefetch, prefetch_related_objects
 from django.utils import timezone
 from reversion.models import Version
 from datetime import datetime
 
-from apps.templates.models.template import Template
+from apps.templates.models.template import Template, PageSettings
 from apps.templates.services.templating import template_renderer
-from apps.generation.models import RenderTask, GeneratedDocument
+from apps.templates.services.asset_helper import asset_helper
+from apps.generation.models import RenderTask, RenderBatch, GeneratedDocument
+from apps.generation.services.render_payload import render_payload_store
+from apps.generation.services.single_flight import render_single_flight
 from apps.generation.tasks.render import render_pdf, render_png, render_svg
+from apps.generation.tasks.routing import RenderQueues
+from infrastructure.renderers.render_client import RendererClient
 
 logger = logging.getLogger(__name__)
 
+# Подпись presigned URL меняется со временем и не должна влиять на хеш содержимого
+PRESIGNED_QUERY_RE = re.compile(r'([?&])X-Amz-[A-Za-z-]+=[^&"\'\s)]*')
+
 
 class DocumentGenerationError(Exception):
     """Исключение для ошибок генерации документов."""
@@ -37,16 +51,23 @@ class DocumentGenerationService:
         template: Template,
         data: Dict[str, Any],
         user,
-        request_ip: str
+        request_ip: str,
+        async_templating: Optional[bool] = None,
+        priority: str = RenderQueues.INTERACTIVE
     ) -> RenderTask:
         """
         Генерирует документ на основе шаблона.
         
+        В асинхронном режиме запрос только создает задачу, а шаблонизация,
+        подготовка опций и рендеринг выполняются в воркере Celery.
+        
         Args:
             template: Шаблон для генерации
             data: Данные для подстановки
             user: Пользователь, запросивший генерацию
             request_ip: IP адрес запроса
+            async_templating: Шаблонизировать в воркере (по умолчанию из настроек)
+            priority: Класс приоритета (interactive или batch) - определяет очереди Celery
             
         Returns:
             RenderTask: Созданная задача рендеринга
@@ -54,21 +75,27 @@ class DocumentGenerationService:
         Raises:
             DocumentGenerationError: При ошибке генерации
         """
+        if async_templating is None:
+            async_templating = settings.GENERATION_ASYNC_TEMPLATING
+        
         try:
             with transaction.atomic():
                 # Создаем задачу рендеринга (без создания версии)
-                task = cls._create_render_task(template, user, request_ip, data)
+                task = cls._create_render_task(template, user, request_ip, data, priority)
                 
                 # Если пользователь анонимный, генерируем токен документа
                 if not user or user.is_anonymous:
                     task.generate_document_token(expires_in_hours=48)  # 48 часов для анонимов
                 
-                # Подготавливаем данные для рендеринга
-                rendered_html = cls._prepare_template_html(template, data)
-                options = cls._prepare_render_options(template)
+                if async_templating:
+                    # Задача уходит в очередь только после фиксации транзакции
+                    from apps.generation.tasks.render import prepare_document
+                    task_id = str(task.id)
+                    queue = RenderQueues.prepare_queue(task.priority)
+                    transaction.on_commit(lambda: prepare_document.apply_async(args=[task_id], queue=queue))
+                    return task
                 
-                # Запускаем задачу рендеринга
-                cls._start_render_task(task, rendered_html, options, template.format)
+                cls._prepare_and_start(task, template, data)
                 
                 return task
                 
@@ -76,12 +103,213 @@ class DocumentGenerationService:
             logger.error(f"Error generating document: {e}")
             raise DocumentGenerationError(f"Ошибка генерации документа: {str(e)}") from e
     
+    @classmethod
+    def process_task(cls, task_id: str) -> RenderTask:
+        """
+        Шаблонизирует и запускает рендеринг ранее созданной задачи.
+        
+        Вызывается воркером Celery в асинхронном режиме генерации.
+        
+        Args:
+            task_id: ID задачи рендеринга
+            
+        Returns:
+            RenderTask: Задача рендеринга
+        """
+        task = RenderTask.objects.select_related(
+            'template', 'template__format', 'template__unit'
+        ).get(id=task_id)
+        
+        cls._prepare_and_start(task, task.template, task.data_input)
+        return task
+    
+    @classmethod
+    def generate_batch(
+        cls,
+        template: Template,
+        rows: List[Dict[str, Any]],
+        user,
+        request_ip: str,
+        priority: str = RenderQueues.BATCH
+    ) -> RenderBatch:
+        """
+        Создает пакет генерации документов по одному шаблону.
+        
+        Задачи создаются одним bulk-запросом, шаблонизация и запуск
+        рендеринга выполняются в воркере (см. process_batch).
+        
+        Args:
+            template: Шаблон для генерации
+            rows: Провалидированные данные для каждого документа
+            user: Пользователь, запросивший генерацию
+            request_ip: IP адрес запроса
+            priority: Класс приоритета задач пакета
+            
+        Returns:
+            RenderBatch: Созданный пакет
+            
+        Raises:
+            DocumentGenerationError: При ошибке создания пакета
+        """
+        try:
+            with transaction.atomic():
+                version = Version.objects.get_for_object(template).first()
+                owner = user if user and not user.is_anonymous else None
+                
+                batch = RenderBatch.objects.create(
+                    template=template,
+                    user=owner,
+                    request_ip=request_ip,
+                    total=len(rows),
+                )
+                
+                RenderTask.objects.bulk_create(
+                    [
+                        RenderTask(
+                            template=template,
+                            batch=batch,
+                            version_id=version.id if version else None,
+                            user=owner,
+                            request_ip=request_ip,
+                            data_input=row,
+                            priority=RenderQueues.normalize(priority),
+                            status='pending',
+                            progress=0,
+                        )
+                        for row in rows
+                    ],
+                    batch_size=500
+                )
+                
+                from apps.generation.tasks.render import prepare_batch
+                batch_id = str(batch.id)
+                queue = RenderQueues.prepare_queue(priority)
+                transaction.on_commit(lambda: prepare_batch.apply_async(args=[batch_id], queue=queue))
+                
+                return batch
+                
+        except Exception as e:
+            logger.error(f"Error generating batch: {e}")
+            raise DocumentGenerationError(f"Ошибка создания пакета генерации: {str(e)}") from e
+    
+    @classmethod
+    def process_batch(cls, batch_id: str) -> RenderBatch:
+        """
+        Шаблонизирует и запускает рендеринг всех задач пакета.
+        
+        Страницы, карта ассетов и опции рендеринга загружаются один раз
+        на пакет, скомпилированные шаблоны берутся из общего кеша.
+        
+        Args:
+            batch_id: ID пакета
+            
+        Returns:
+            RenderBatch: Пакет генерации
+        """
+        batch = RenderBatch.objects.select_related(
+            'template', 'template__format', 'template__unit'
+        ).get(id=batch_id)
+        template = batch.template
+        
+        try:
+            pages = list(template.pages.all().order_by('index'))
+            asset_map = asset_helper.get_asset_map(str(template.id), version=template.updated_at)
+            options = cls._prepare_render_options(template, pages=pages)
+        except Exception as e:
+            logger.error(f"Error preparing batch {batch_id}: {e}")
+            cls._fail_batch(batch, str(e))
+            return batch
+        
+        RenderBatch.objects.filter(id=batch.id, status='pending').update(status='processing')
+        
+        for task in batch.tasks.filter(status='pending').iterator():
+            task.template = template
+            try:
+                cls._prepare_and_start(
+                    task, template, task.data_input,
+                    pages=pages, asset_map=asset_map, options=options
+                )
+            except Exception as e:
+                logger.error(f"Error preparing task {task.id} of batch {batch_id}: {e}")
+                task.mark_as_failed(str(e))
+                RenderBatch.record_result(batch.id, success=False)
+        
+        batch.refresh_from_db()
+        return batch
+    
+    @staticmethod
+    def _fail_batch(batch: RenderBatch, error: str):
+        """Завершает с ошибкой все необработанные задачи пакета."""
+        now = timezone.now()
+        failed = batch.tasks.filter(status='pending').update(status='failed', error=error, finished_at=now)
+        RenderBatch.objects.filter(id=batch.id).update(
+            failed=F('failed') + failed,
+            status='failed',
+            finished_at=now
+        )
+        batch.refresh_from_db()
+    
+    @classmethod
+    def _prepare_and_start(
+        cls,
+        task: RenderTask,
+        template: Template,
+        data: Dict[str, Any],
+        pages: Optional[List] = None,
+        asset_map: Optional[Dict[str, Dict]] = None,
+        options: Optional[Dict[str, Any]] = None
+    ):
+        """Готовит HTML и опции и запускает рендеринг (или переиспользует документ)."""
+        if pages is None:
+            pages = list(template.pages.all().order_by('index'))
+        
+        if template.render_mode == 'per_page' and len(pages) > 1:
+            cls._prepare_and_start_pages(task, template, data, pages, asset_map)
+            return
+        
+        # Подготавливаем данные для рендеринга
+        rendered_html = cls._prepare_template_html(template, data, pages=pages, asset_map=asset_map)
+        if options is None:
+            options = cls._prepare_render_options(template, pages=pages)
+        
+        # Идентичный документ уже был сгенерирован - переиспользуем его
+        task.content_hash = cls._compute_content_hash(task, template, rendered_html, options)
+        task.save(update_fields=['content_hash'])
+        if cls._reuse_existing_document(task, template) or cls._join_in_flight_render(task, template):
+            return
+        
+        # Запускаем задачу рендеринга
+        cls._start_render_task(task, rendered_html, options, template.format)
+    
+    @classmethod
+    def _prepare_and_start_pages(
+        cls,
+        task: RenderTask,
+        template: Template,
+        data: Dict[str, Any],
+        pages: List,
+        asset_map: Optional[Dict[str, Dict]] = None
+    ):
+        """Готовит страницы по отдельности и запускает их параллельный рендеринг."""
+        pages_html = cls._render_pages(template, data, pages, asset_map)
+        pages_options = cls._prepare_pages_options(template, pages)
+        
+        task.content_hash = cls._compute_content_hash(
+            task, template, ''.join(pages_html), {'pages': pages_options}
+        )
+        task.save(update_fields=['content_hash'])
+        if cls._reuse_existing_document(task, template) or cls._join_in_flight_render(task, template):
+            return
+        
+        cls._start_page_render_tasks(task, pages_html, pages_options, template.format)
+    
     @staticmethod
     def _create_render_task(
         template: Template,
         user,
         request_ip: str,
-        data: Dict[str, Any]
+        data: Dict[str, Any],
+        priority: str = RenderQueues.INTERACTIVE
     ) -> RenderTask:
         """Создает задачу рендеринга."""
         # Если нужно сохранить информацию о версии шаблона - берем текущую
@@ -93,16 +321,45 @@ class DocumentGenerationService:
             user=user if not user.is_anonymous else None,
             request_ip=request_ip,
             data_input=data,
+            priority=RenderQueues.normalize(priority),
             status='pending',
             progress=0,
         )
     
+    @classmethod
+    def _prepare_template_html(
+        cls,
+        template: Template,
+        data: Dict[str, Any],
+        pages: Optional[List] = None,
+        asset_map: Optional[Dict[str, Dict]] = None
+    ) -> str:
+        """
+        Подготавливает HTML шаблона со всеми страницами.
+        
+        Страницы и карту ассетов можно передать заранее загруженными
+        (например, одни на весь пакет генерации).
+        """
+        if pages is None:
+            pages = template.pages.all().order_by('index')
+        
+        return RendererClient.PAGE_SEPARATOR.join(cls._render_pages(template, data, pages, asset_map))
+    
     @staticmethod
-    def _prepare_template_html(template: Template, data: Dict[str, Any]) -> str:
-        """Подготавливает HTML шаблона со всеми страницами."""
+    def _render_pages(
+        template: Template,
+        data: Dict[str, Any],
+        pages,
+        asset_map: Optional[Dict[str, Dict]] = None
+    ) -> List[str]:
+        """Рендерит HTML каждой страницы с данными."""
         pages_html = []
         
-        for page in template.pages.all().order_by('index'):
+        # Карта ассетов загружается один раз на документ, а не на каждый вызов asset()
+        if asset_map is None:
+            asset_map = asset_helper.get_asset_map(str(template.id), version=template.updated_at)
+        
+        for page in pages:
             # Используем HTML страницы или базовый шаблон
             page_html = page.html if page.html else template.html
             
@@ -112,37 +369,212 @@ class DocumentGenerationService:
                     page_html, 
                     data, 
                     template_id=str(template.id),
-                    page_id=str(page.id)
+                    page_id=str(page.id),
+                    asset_map=asset_map
                 )
                 pages_html.append(rendered_page)
             except Exception as e:
                 logger.error(f"Error rendering page {page.index}: {e}")
                 raise DocumentGenerationError(f"Ошибка рендеринга страницы {page.index}: {str(e)}")
         
-        return ''.join(pages_html)
+        return pages_html
     
-    @staticmethod
-    def _prepare_render_options(template: Template) -> Dict[str, Any]:
-        """Подготавливает опции для рендеринга."""
-        first_page = template.pages.first()
-        if not first_page:
+    @classmethod
+    def _prepare_render_options(cls, template: Template, pages: Optional[List] = None) -> Dict[str, Any]:
+        """
+        Подготавливает опции для рендеринга.
+        
+        Размеры и настройки верхнего уровня берутся с первой страницы. Для
+        многостраничных шаблонов в options['pages'] передаются размеры и
+        настройки каждой страницы - в порядке страниц в HTML документа.
+        """
+        if pages is None:
+            pages = list(template.pages.all().order_by('index'))
+        if not pages:
             raise DocumentGenerationError("Шаблон не содержит ни одной страницы")
         
+        pages_options = cls._prepare_pages_options(template, pages)
+        
         # Базовые опции
-        options = {
-            'format': template.format.name.lower(),
-            'width': float(first_page.width),
-            'height': float(first_page.height),
-            'unit': template.unit.key,
-        }
-        
-        # Добавляем настройки формата
-        for page in template.pages.all():
-            for setting in page.settings.all():
-                options[setting.format_setting.key] = setting.value
+        options = dict(pages_options[0])
+        
+        if len(pages_options) > 1:
+            options['pages'] = [
+                {
+                    'width': page_options['width'],
+                    'height': page_options['height'],
+                    'settings': cls._page_settings(page),
+                }
+                for page, page_options in zip(pages, pages_options)
+            ]
         
         return options
     
+    @classmethod
+    def _prepare_pages_options(cls, template: Template, pages: List) -> List[Dict[str, Any]]:
+        """Подготавливает опции рендеринга каждой страницы по ее размерам и настройкам."""
+        # Настройки всех страниц загружаются одним запросом
+        prefetch_related_objects(
+            pages,
+            Prefetch('settings', queryset=PageSettings.objects.select_related('format_setting'))
+        )
+        
+        pages_options = []
+        for page in pages:
+            options = {
+                'format': template.format.name.lower(),
+                'width': float(page.width),
+                'height': float(page.height),
+                'unit': template.unit.key,
+            }
+            options.update(cls._page_settings(page))
+            pages_options.append(options)
+        
+        return pages_options
+    
+    @staticmethod
+    def _page_settings(page) -> Dict[str, str]:
+        """Возвращает настройки формата страницы (настройки должны быть предзагружены)."""
+        return {setting.format_setting.key: setting.value for setting in page.settings.all()}
+    
+    @staticmethod
+    def _compute_content_hash(
+        task: RenderTask,
+        template: Template,
+        html: str,
+        options: Dict[str, Any]
+    ) -> str:
+        """
+        Вычисляет хеш содержимого рендеринга.
+        
+        Учитывает версию шаблона, итоговый HTML (без подписей presigned URL)
+        и опции рендеринга.
+        """
+        digest = hashlib.sha256()
+        digest.update(str(template.id).encode())
+        digest.update(str(task.version_id or '').encode())
+        digest.update(template.updated_at.isoformat().encode() if template.updated_at else b'')
+        digest.update(PRESIGNED_QUERY_RE.sub(r'\1', html).encode('utf-8'))
+        digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+        return digest.hexdigest()
+    
+    @staticmethod
+    def _reuse_existing_document(task: RenderTask, template: Template) -> bool:
+        """
+        Завершает задачу, переиспользуя ранее сгенерированный документ с тем же хешем.
+        
+        Returns:
+            bool: True, если документ найден и задача завершена
+        """
+        ttl = settings.RENDER_DEDUP_TTL
+        if not ttl or not template.dedupe_renders or not task.content_hash:
+            return False
+        
+        existing = GeneratedDocument.objects.filter(
+            task__content_hash=task.content_hash,
+            task__status='done',
+            created_at__gte=timezone.now() - timedelta(seconds=ttl),
+        ).exclude(task=task).order_by('-created_at').first()
+        
+        if not existing:
+            return False
+        
+        DocumentGenerationService.attach_document(task, existing)
+        
+        logger.info(f"Task {task.id} reused document {existing.id} (hash {task.content_hash[:12]})")
+        return True
+    
+    @staticmethod
+    def _join_in_flight_render(task: RenderTask, template: Template) -> bool:
+        """
+        Присоединяет задачу к выполняющемуся рендерингу с тем же хешем.
+        
+        Присоединившаяся задача не рендерится и остается в очереди (pending),
+        пока ведущая задача не завершит ее своим результатом.
+        
+        Returns:
+            bool: True, если задача присоединена
+        """
+        # Ведущая задача не увидит незафиксированную задачу при завершении,
+        # поэтому внутри транзакции (синхронная шаблонизация) рендерим сами
+        if transaction.get_connection().in_atomic_block:
+            return False
+        
+        leader_id = render_single_flight.join(task, template)
+        if leader_id is None:
+            return False
+        
+        task.leader_id = leader_id
+        task.save(update_fields=['leader'])
+        return True
+    
+    @staticmethod
+    def settle_follower(
+        follower: RenderTask,
+        document: Optional[GeneratedDocument] = None,
+        error: Optional[str] = None
+    ) -> bool:
+        """
+        Завершает присоединившуюся задачу результатом ведущей.
+        
+        Returns:
+            bool: False, если задачу уже завершили или перезапустили
+        """
+        # Ведущая задача и периодическая проверка могут завершать задачу одновременно
+        claimed = RenderTask.objects.filter(
+            id=follower.id, status='pending', leader_id=follower.leader_id
+        ).update(status='processing')
+        if not claimed:
+            return False
+        
+        if document is not None:
+            DocumentGenerationService.attach_document(follower, document)
+        else:
+            follower.mark_as_failed(error)
+            if follower.batch_id:
+                RenderBatch.record_result(follower.batch_id, success=False)
+        return True
+    
+    @classmethod
+    def restart_follower(cls, follower: RenderTask) -> bool:
+        """
+        Запускает рендеринг присоединившейся задачи, которую ведущая не завершит.
+        
+        Returns:
+            bool: False, если задачу уже завершили или перезапустили
+        """
+        claimed = RenderTask.objects.filter(
+            id=follower.id, status='pending', leader_id=follower.leader_id
+        ).update(leader=None)
+        if not claimed:
+            return False
+        
+        follower.leader = None
+        template = Template.objects.select_related('format', 'unit').get(id=follower.template_id)
+        try:
+            cls._prepare_and_start(follower, template, follower.data_input)
+        except Exception as e:
+            logger.error(f"Error restarting render task {follower.id}: {e}")
+            follower.mark_as_failed(str(e))
+            if follower.batch_id:
+                RenderBatch.record_result(follower.batch_id, success=False)
+        return True
+    
+    @staticmethod
+    def attach_document(task: RenderTask, document: GeneratedDocument) -> GeneratedDocument:
+        """Завершает задачу готовым документом другой задачи с тем же содержимым."""
+        # Новая запись ссылается на тот же объект в хранилище
+        attached = GeneratedDocument.objects.create(
+            task=task,
+            file=document.file,
+            size_bytes=document.size_bytes,
+            file_name=document.file_name,
+            content_type=document.content_type,
+            checksum=document.checksum,
+        )
+        task.mark_as_done()
+        return attached
+    
     @staticmethod
     def _create_document_record(task: RenderTask, file_bytes: bytes, file_name: str, content_type: str) -> 'GeneratedDocument':
         """Создает запись документа в БД и сохраняет в MinIO."""
@@ -160,6 +592,43 @@ class DocumentGenerationService:
             logger.error(f"Failed to create document record: {e}")
             raise DocumentGenerationError(f"Ошибка создания документа: {str(e)}")
     
+    @staticmethod
+    def _start_page_render_tasks(
+        task: RenderTask,
+        pages_html: List[str],
+        pages_options: List[Dict[str, Any]],
+        format_obj: 'Format'
+    ):
+        """
+        Запускает рендеринг каждой страницы отдельной задачей.
+        
+        Страницы рендерятся параллельно, после чего задача merge_pages
+        склеивает их в один PDF или упаковывает в ZIP.
+        """
+        from celery import chord
+        from apps.generation.tasks.render import render_page, merge_pages
+        
+        task_id = str(task.id)
+        format_type = format_obj.name.lower()
+        page_count = len(pages_html)
+        queue = RenderQueues.render_queue(format_type, task.priority)
+        
+        header = []
+        for index, (html, options) in enumerate(zip(pages_html, pages_options)):
+            payload_html = html
+            if not render_payload_store.should_inline(html):
+                render_payload_store.store(task_id, html, page_index=index)
+                payload_html = None
+            
+            header.append(render_page.s(
+                task_id, index, page_count, payload_html, options, format_type
+            ).set(queue=queue))
+        
+        result = chord(header)(merge_pages.s(task_id=task_id, format_type=format_type).set(queue=queue))
+        
+        task.worker_id = result.id
+        task.save(update_fields=['worker_id'])
+    
     @classmethod
     def _start_render_task(
         cls,
@@ -174,13 +643,18 @@ class DocumentGenerationService:
         if not celery_task_func:
             raise DocumentGenerationError(f"Неподдерживаемый формат: {format_obj.name}")
         
-        # Запускаем задачу Celery с format_type и renderer_url
-        celery_task = celery_task_func.delay(
-            str(task.id),
-            html,
-            options,
-            format_obj.name.lower(),  # Передаем format_type
-            format_obj.render_url     # Передаем renderer_url
+        # Большой HTML передаем через Redis, а не через брокер: задача несет только ID
+        payload_html = html
+        if not render_payload_store.should_inline(html):
+            render_payload_store.store(str(task.id), html)
+            payload_html = None
+        
+        # Запускаем задачу Celery с format_type; экземпляр рендерера
+        # выбирается балансировщиком в воркере в момент запроса
+        format_type = format_obj.name.lower()
+        celery_task = celery_task_func.apply_async(
+            args=[str(task.id), payload_html, options, format_type],
+            queue=RenderQueues.render_queue(format_type, task.priority)
         )
         
         # Сохраняем ID задачи Celery
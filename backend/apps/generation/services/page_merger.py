@@ -0,0 +1,64 @@
+"""
+Склейка страниц, отрендеренных по отдельности.
+"""
+import io
+import logging
+import zipfile
+from typing import BinaryIO, List
+from pypdf import PdfWriter
+
+from infrastructure.minio_client import minio_client
+
+logger = logging.getLogger(__name__)
+
+
+class PageMerger:
+    """Собирает итоговый документ из страниц, сохраненных в MinIO."""
+    
+    # Форматы, страницы которых склеиваются в один документ; остальные упаковываются в ZIP
+    MERGEABLE_FORMATS = {'pdf'}
+    
+    @classmethod
+    def merge(cls, object_names: List[str], format_type: str, output: BinaryIO) -> str:
+        """
+        Собирает документ из страниц в output.
+        
+        Args:
+            object_names: Объекты страниц в bucket документов, по порядку
+            format_type: Формат страниц
+            output: Файл для записи результата
+            
+        Returns:
+            str: content_type результата
+        """
+        if format_type in cls.MERGEABLE_FORMATS:
+            cls.merge_pdf(object_names, output)
+            return 'application/pdf'
+        
+        cls.zip_pages(object_names, format_type, output)
+        return 'application/zip'
+    
+    @staticmethod
+    def merge_pdf(object_names: List[str], output: BinaryIO):
+        """Склеивает PDF-страницы в один документ."""
+        writer = PdfWriter()
+        for object_name in object_names:
+            writer.append(io.BytesIO(minio_client.download_file(object_name, 'documents')))
+        writer.write(output)
+        writer.close()
+    
+    @staticmethod
+    def zip_pages(object_names: List[str], format_type: str, output: BinaryIO):
+        """Упаковывает страницы в ZIP-архив."""
+        # PNG уже сжат, повторное сжатие только тратит CPU
+        compression = zipfile.ZIP_STORED if format_type == 'png' else zipfile.ZIP_DEFLATED
+        with zipfile.ZipFile(output, 'w', compression=compression) as archive:
+            for number, object_name in enumerate(object_names, start=1):
+                archive.writestr(
+                    f"page_{number:03d}.{format_type}",
+                    minio_client.download_file(object_name, 'documents')
+                )
+
+
+# Создаем экземпляр для удобного использования
+page_merger = PageMerger()
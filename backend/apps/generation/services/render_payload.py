@@ -0,0 +1,116 @@
+"""
+Хранилище HTML для задач рендеринга.
+
+Большой HTML (встроенные шрифты, data URI) не передается через брокер Celery:
+задача получает только ID, а HTML сохраняется в Redis под ключом задачи.
+Если блоб истек или не был сохранен, воркер пересобирает HTML из шаблона
+и входных данных задачи.
+"""
+import logging
+import zlib
+from typing import Optional
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.generation.models import RenderTask
+
+logger = logging.getLogger(__name__)
+
+
+class RenderPayloadStore:
+    """Передача HTML между API и воркерами рендеринга по ссылке."""
+
+    # HTML больше этого размера передается по ссылке (байты, 0 - всегда по ссылке)
+    INLINE_MAX_BYTES = getattr(settings, 'RENDER_HTML_INLINE_MAX_BYTES', 256 * 1024)
+
+    # Время жизни блоба; должно покрывать ожидание в очереди и все повторы задачи
+    BLOB_TIMEOUT = getattr(settings, 'RENDER_HTML_BLOB_TIMEOUT', 3600)
+
+    @classmethod
+    def should_inline(cls, html: str) -> bool:
+        """Проверяет, можно ли передать HTML аргументом задачи."""
+        if not cls.INLINE_MAX_BYTES:
+            return False
+        return len(html.encode('utf-8')) <= cls.INLINE_MAX_BYTES
+
+    @classmethod
+    def store(cls, task_id: str, html: str, page_index: Optional[int] = None) -> bool:
+        """
+        Сохраняет HTML задачи (или одной страницы в постраничном режиме) в Redis.
+
+        Returns:
+            bool: True если HTML сохранен
+        """
+        try:
+            cache.set(cls._cache_key(task_id, page_index), zlib.compress(html.encode('utf-8')), cls.BLOB_TIMEOUT)
+            return True
+        except Exception as e:
+            # Воркер пересоберет HTML из шаблона
+            logger.warning(f"Failed to store render payload for task {task_id}: {e}")
+            return False
+
+    @classmethod
+    def load(cls, task_id: str, page_index: Optional[int] = None) -> Optional[str]:
+        """Возвращает сохраненный HTML задачи или None."""
+        try:
+            blob = cache.get(cls._cache_key(task_id, page_index))
+        except Exception as e:
+            logger.warning(f"Failed to load render payload for task {task_id}: {e}")
+            return None
+
+        if blob is None:
+            return None
+        return zlib.decompress(blob).decode('utf-8')
+
+    @classmethod
+    def discard(cls, task_id: str, page_count: int = 0):
+        """Удаляет HTML задачи (и ее страниц) после успешного рендеринга."""
+        keys = [cls._cache_key(task_id)] + [cls._cache_key(task_id, index) for index in range(page_count)]
+        try:
+            cache.delete_many(keys)
+        except Exception as e:
+            logger.warning(f"Failed to discard render payload for task {task_id}: {e}")
+
+    @classmethod
+    def resolve(cls, task_id: str, html: Optional[str], page_index: Optional[int] = None) -> str:
+        """
+        Возвращает HTML для рендеринга задачи.
+
+        Args:
+            task_id: ID задачи рендеринга
+            html: HTML из аргументов задачи (None, если передан по ссылке)
+            page_index: Позиция страницы в постраничном режиме
+        """
+        if html is not None:
+            return html
+
+        html = cls.load(task_id, page_index)
+        if html is not None:
+            return html
+
+        logger.info(f"Render payload for task {task_id} not found, rebuilding from template")
+        return cls.rebuild(task_id, page_index)
+
+    @staticmethod
+    def rebuild(task_id: str, page_index: Optional[int] = None) -> str:
+        """Пересобирает HTML (всего документа или одной страницы) из шаблона и входных данных задачи."""
+        from apps.generation.services.document_generation_service import DocumentGenerationService
+
+        render_task = RenderTask.objects.select_related('template').get(id=task_id)
+        template = render_task.template
+
+        if page_index is None:
+            return DocumentGenerationService._prepare_template_html(template, render_task.data_input)
+
+        page = template.pages.all().order_by('index')[page_index]
+        return DocumentGenerationService._render_pages(template, render_task.data_input, [page])[0]
+
+    @staticmethod
+    def _cache_key(task_id: str, page_index: Optional[int] = None) -> str:
+        if page_index is None:
+            return f"render_html_{task_id}"
+        return f"render_html_{task_id}_page_{page_index}"
+
+
+# Создаем экземпляр для удобного использования
+render_payload_store = RenderPayloadStore()
@@ -0,0 +1,213 @@
+"""
+Ограничение числа одновременных рендеров.
+
+Задача рендеринга занимает слот в каждой своей области: пользователь (или
+IP анонимного запроса) и шаблон. Если в какой-то области слотов нет,
+задача не отклоняется, а откладывается и встает в очередь ожидания этой
+области (FIFO); позиция в очереди отдается в статусе задачи.
+
+Слоты хранятся в Redis в sorted set по области, проверка и захват слотов
+всех областей выполняются одним Lua-скриптом атомарно.
+"""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# KEYS: active_1, wait_1, ..., active_n, wait_n
+# ARGV: task_id, now, stale_before, heartbeat_prefix, heartbeat_ttl, key_ttl, limit_1, ..., limit_n
+# Возвращает {0, 0}, если слоты заняты, иначе {номер области, позиция в очереди}
+ACQUIRE_SCRIPT = """
+local task = ARGV[1]
+local now = tonumber(ARGV[2])
+local stale_before = tonumber(ARGV[3])
+local heartbeat_prefix = ARGV[4]
+local heartbeat_ttl = tonumber(ARGV[5])
+local key_ttl = tonumber(ARGV[6])
+local n = #KEYS / 2
+
+-- Задача уже занимает слоты (страницы одного документа)
+if redis.call('ZSCORE', KEYS[1], task) then
+  return {0, 0}
+end
+
+for i = 1, n do
+  local active, wait, limit = KEYS[2 * i - 1], KEYS[2 * i], tonumber(ARGV[6 + i])
+
+  -- Слоты задач, не освободивших их (убитый воркер), истекают
+  redis.call('ZREMRANGEBYSCORE', active, '-inf', stale_before)
+  local free = limit - redis.call('ZCARD', active)
+
+  -- Ожидающие без heartbeat брошены и не должны держать очередь
+  if free > 0 then
+    for _, waiter in ipairs(redis.call('ZRANGE', wait, 0, free - 1)) do
+      if waiter ~= task and redis.call('EXISTS', heartbeat_prefix .. waiter) == 0 then
+        redis.call('ZREM', wait, waiter)
+      end
+    end
+  end
+
+  local rank = redis.call('ZRANK', wait, task)
+  if not rank then
+    rank = redis.call('ZCARD', wait)
+  end
+
+  if rank >= free then
+    -- Задача ждет только в очереди области, которая ее задерживает
+    for j = 1, n do
+      if j ~= i then
+        redis.call('ZREM', KEYS[2 * j], task)
+      end
+    end
+    redis.call('ZADD', wait, 'NX', now, task)
+    redis.call('EXPIRE', wait, key_ttl)
+    redis.call('SET', heartbeat_prefix .. task, 1, 'EX', heartbeat_ttl)
+    return {i, redis.call('ZRANK', wait, task) + 1}
+  end
+end
+
+for i = 1, n do
+  redis.call('ZADD', KEYS[2 * i - 1], now, task)
+  redis.call('EXPIRE', KEYS[2 * i - 1], key_ttl)
+  redis.call('ZREM', KEYS[2 * i], task)
+end
+redis.call('DEL', heartbeat_prefix .. task)
+return {0, 0}
+"""
+
+
+class RenderQuota:
+    """Квоты одновременных рендеров по пользователю, IP и шаблону."""
+
+    KEY_PREFIX = 'render_quota'
+
+    def __init__(self):
+        self._client: Optional[redis.Redis] = None
+        self._script = None
+        self._lock = threading.Lock()
+
+    def acquire(self, task) -> Tuple[bool, Optional[str], int]:
+        """
+        Занимает слоты задачи во всех ее областях.
+
+        Args:
+            task: RenderTask (нужны id, user_id, request_ip, template_id)
+
+        Returns:
+            Tuple[bool, Optional[str], int]: (слоты заняты, область ожидания, позиция в очереди)
+        """
+        scopes = self._scopes(task)
+        if not scopes:
+            return True, None, 0
+
+        keys = []
+        for scope, _ in scopes:
+            keys += [self._key('active', scope), self._key('wait', scope)]
+
+        now = time.time()
+        try:
+            blocked, position = self._get_script()(
+                keys=keys,
+                args=[
+                    str(task.id),
+                    now,
+                    now - settings.RENDER_QUOTA_SLOT_TTL,
+                    self._key('heartbeat', ''),
+                    settings.RENDER_QUOTA_RETRY_DELAY * 6,
+                    settings.RENDER_QUOTA_SLOT_TTL,
+                ] + [limit for _, limit in scopes]
+            )
+        except redis.RedisError as e:
+            # Без Redis квоты не проверяются, рендеринг важнее
+            logger.warning(f"Render quota check failed for task {task.id}: {e}")
+            return True, None, 0
+
+        if not blocked:
+            return True, None, 0
+        return False, scopes[blocked - 1][0], position
+
+    def release(self, task):
+        """Освобождает слоты задачи и убирает ее из очередей ожидания."""
+        scopes = self._scopes(task)
+        if not scopes:
+            return
+
+        task_id = str(task.id)
+        try:
+            pipe = self._get_client().pipeline(transaction=False)
+            for scope, _ in scopes:
+                pipe.zrem(self._key('active', scope), task_id)
+                pipe.zrem(self._key('wait', scope), task_id)
+            pipe.delete(self._key('heartbeat', task_id))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning(f"Failed to release render quota for task {task.id}: {e}")
+
+    def position(self, task) -> Optional[int]:
+        """Позиция отложенной задачи в очереди ожидания (None, если задача не ждет)."""
+        return self.positions([task]).get(str(task.id))
+
+    def positions(self, tasks) -> Dict[str, int]:
+        """
+        Позиции отложенных задач в очередях ожидания за один запрос к Redis.
+
+        Returns:
+            Dict[str, int]: ID задачи -> позиция (только для ожидающих задач)
+        """
+        scoped = [(task, self._scopes(task)) for task in tasks]
+        scoped = [(task, scopes) for task, scopes in scoped if scopes]
+        if not scoped:
+            return {}
+
+        try:
+            pipe = self._get_client().pipeline(transaction=False)
+            for task, scopes in scoped:
+                for scope, _ in scopes:
+                    pipe.zrank(self._key('wait', scope), str(task.id))
+            ranks = iter(pipe.execute())
+        except redis.RedisError as e:
+            logger.warning(f"Failed to read render queue positions for {len(scoped)} task(s): {e}")
+            return {}
+
+        positions = {}
+        for task, scopes in scoped:
+            task_ranks = [next(ranks) for _ in scopes]
+            rank = next((rank for rank in task_ranks if rank is not None), None)
+            if rank is not None:
+                positions[str(task.id)] = rank + 1
+        return positions
+
+    @staticmethod
+    def _scopes(task) -> List[Tuple[str, int]]:
+        """Области задачи с ненулевым лимитом: сначала пользователь (или IP), затем шаблон."""
+        scopes = []
+        if task.user_id:
+            scopes.append((f"user:{task.user_id}", settings.RENDER_QUOTA_PER_USER))
+        elif task.request_ip:
+            scopes.append((f"ip:{task.request_ip}", settings.RENDER_QUOTA_PER_ANON_IP))
+        scopes.append((f"template:{task.template_id}", settings.RENDER_QUOTA_PER_TEMPLATE))
+        return [(scope, limit) for scope, limit in scopes if limit > 0]
+
+    def _key(self, kind: str, scope: str) -> str:
+        return f"{self.KEY_PREFIX}:{kind}:{scope}"
+
+    def _get_client(self) -> redis.Redis:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = redis.Redis.from_url(settings.RENDER_COORDINATION_REDIS_URL)
+        return self._client
+
+    def _get_script(self):
+        if self._script is None:
+            self._script = self._get_client().register_script(ACQUIRE_SCRIPT)
+        return self._script
+
+
+# Создаем экземпляр для использования в задачах рендеринга
+render_quota = RenderQuota()
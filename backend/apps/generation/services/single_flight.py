@@ -0,0 +1,139 @@
+"""
+Объединение одинаковых рендеров, выполняющихся одновременно (single-flight).
+
+Первая задача с данным хешем содержимого становится ведущей и рендерит
+документ. Задачи с тем же хешем, пришедшие до ее завершения (двойной клик,
+повторы клиента), не запускают свой рендеринг, а присоединяются к ведущей
+и получают тот же документ (или ту же ошибку), когда она завершится.
+
+В Redis хранится только ведущая задача для хеша; связь присоединившейся
+задачи с ведущей хранится в БД (RenderTask.leader), поэтому не теряется
+с истечением ключа. Задачи, ведущая которых не завершила их (воркер убит,
+ключ истек), подбирает периодическая задача reap_single_flight_followers.
+"""
+import logging
+import threading
+from typing import List, Optional
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+# KEYS: inflight, ARGV: task_id, ttl
+# Возвращает ID ведущей задачи или пустую строку, если ведущей стала эта задача
+JOIN_SCRIPT = """
+local leader = redis.call('GET', KEYS[1])
+if not leader then
+  redis.call('SET', KEYS[1], ARGV[1], 'EX', tonumber(ARGV[2]))
+  return ''
+end
+if leader == ARGV[1] then
+  return ''
+end
+return leader
+"""
+
+# KEYS: inflight; ARGV: task_id
+# Снимает ведущую задачу, если ключ еще принадлежит ей
+FINISH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+
+class RenderSingleFlight:
+    """Координация одинаковых задач рендеринга через Redis."""
+
+    KEY_PREFIX = 'render_single_flight'
+
+    def __init__(self):
+        self._client: Optional[redis.Redis] = None
+        self._scripts = {}
+        self._lock = threading.Lock()
+
+    def join(self, task, template) -> Optional[str]:
+        """
+        Присоединяет задачу к выполняющейся задаче с тем же хешем.
+
+        Args:
+            task: RenderTask с вычисленным content_hash
+            template: Шаблон задачи
+
+        Returns:
+            Optional[str]: ID ведущей задачи или None, если задача должна рендерить сама
+        """
+        ttl = settings.RENDER_SINGLE_FLIGHT_TTL
+        if not ttl or not template.dedupe_renders or not task.content_hash:
+            return None
+
+        try:
+            leader_id = self._run(
+                JOIN_SCRIPT,
+                keys=[self._key('inflight', task.content_hash)],
+                args=[str(task.id), ttl]
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Single-flight join failed for task {task.id}: {e}")
+            return None
+
+        if not leader_id:
+            return None
+
+        leader_id = leader_id.decode('utf-8')
+        logger.info(f"Task {task.id} attached to in-flight render {leader_id} (hash {task.content_hash[:12]})")
+        return leader_id
+
+    def finish(self, task):
+        """Снимает задачу с роли ведущей после окончательного завершения."""
+        if not settings.RENDER_SINGLE_FLIGHT_TTL or not task.content_hash:
+            return
+
+        try:
+            self._run(
+                FINISH_SCRIPT,
+                keys=[self._key('inflight', task.content_hash)],
+                args=[str(task.id)]
+            )
+        except redis.RedisError as e:
+            logger.warning(f"Single-flight finish failed for task {task.id}: {e}")
+
+    def is_leading(self, task) -> Optional[bool]:
+        """
+        Проверяет, что задача все еще ведущая для своего хеша.
+
+        Returns:
+            Optional[bool]: None, если Redis недоступен
+        """
+        if not task.content_hash:
+            return False
+
+        try:
+            leader_id = self._get_client().get(self._key('inflight', task.content_hash))
+        except redis.RedisError as e:
+            logger.warning(f"Single-flight check failed for task {task.id}: {e}")
+            return None
+
+        return leader_id is not None and leader_id.decode('utf-8') == str(task.id)
+
+    def _key(self, kind: str, value: str) -> str:
+        return f"{self.KEY_PREFIX}:{kind}:{value}"
+
+    def _get_client(self) -> redis.Redis:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = redis.Redis.from_url(settings.RENDER_COORDINATION_REDIS_URL)
+        return self._client
+
+    def _run(self, script: str, keys: List[str], args: List):
+        self._get_client()
+        if script not in self._scripts:
+            self._scripts[script] = self._client.register_script(script)
+        return self._scripts[script](keys=keys, args=args)
+
+
+# Создаем экземпляр для использования в генерации и задачах рендеринга
+render_single_flight = RenderSingleFlight()
@@ -0,0 +1,100 @@
+"""
+Event loop для асинхронного режима рендеринга в воркерах Celery.
+
+Задача Celery только ставит корутину рендеринга в event loop фонового
+потока и освобождается, поэтому один процесс воркера держит одновременно
+до RENDER_ASYNC_CONCURRENCY рендеров, ожидающих ответа по сети.
+Когда лимит исчерпан, постановка блокирует процесс - воркер перестает
+забирать новые задачи из брокера.
+"""
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Optional
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRenderExecutor:
+    """Фоновый event loop с ограничением числа рендеров в полете."""
+
+    def __init__(self):
+        self.concurrency = settings.RENDER_ASYNC_CONCURRENCY
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def submit(self, coroutine_factory: Callable[[], Coroutine[Any, Any, Any]]) -> Future:
+        """
+        Ставит корутину в фоновый event loop.
+
+        Блокирует вызывающий поток, пока не освободится слот.
+
+        Args:
+            coroutine_factory: Функция, создающая корутину рендеринга
+        """
+        self._slots.acquire()
+        try:
+            loop = self._ensure_loop()
+            future = asyncio.run_coroutine_threadsafe(coroutine_factory(), loop)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_flight += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    @property
+    def in_flight(self) -> int:
+        """Количество рендеров, выполняющихся сейчас."""
+        return self._in_flight
+
+    def drain(self, timeout: float):
+        """Ожидает завершения рендеров в полете, но не дольше timeout секунд."""
+        deadline = time.monotonic() + timeout
+        while self._in_flight and time.monotonic() < deadline:
+            time.sleep(0.5)
+        if self._in_flight:
+            logger.warning(f"Stopping with {self._in_flight} async renders in flight")
+
+    def reset(self):
+        """Забывает event loop родителя после fork процесса воркера."""
+        self._loop = None
+        self._thread = None
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+        self._in_flight = 0
+
+    def _on_done(self, future: Future):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+        if not future.cancelled() and future.exception() is not None:
+            logger.error(f"Async render failed: {future.exception()}")
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None and self._thread.is_alive():
+            return self._loop
+
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='async-render-loop',
+                    daemon=True
+                )
+                self._thread.start()
+                logger.info(f"Started async render loop (concurrency {self.concurrency})")
+        return self._loop
+
+
+# Создаем экземпляр для использования в задачах рендеринга
+async_render_executor = AsyncRenderExecutor()
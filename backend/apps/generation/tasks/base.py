@@ -1,19 +1,29 @@
 """
 Базовый класс для задач рендеринга.
 """
+import asyncio
+import hashlib
 import logging
+import tempfile
 from datetime import datetime
 from celery import Task
-from celery.exceptions import MaxRetriesExceededError, SoftTimeLimitExceeded
+from celery.exceptions import MaxRetriesExceededError, Retry, SoftTimeLimitExceeded
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from asgiref.sync import sync_to_async
 import requests
 from pathlib import Path
 from django.conf import settings
+from django.core.cache import cache
 
-from apps.generation.models import RenderTask, GeneratedDocument
-from infrastructure.minio_client import minio_client
-from infrastructure.renderers.render_client import RendererClient, RendererError
+from apps.generation.models import RenderTask, RenderBatch, GeneratedDocument
+from apps.generation.services.render_payload import render_payload_store
+from apps.generation.services.page_merger import page_merger
+from apps.generation.services.render_quota import render_quota
+from apps.generation.services.single_flight import render_single_flight
+from infrastructure.minio_client import minio_client, ChecksumReader
+from infrastructure.renderers.render_client import RendererClient, AsyncRendererClient, RendererError
+from .async_executor import async_render_executor
+from .progress import ProgressReporter, TASK_EVENT, batch_group, task_group, ws_publisher
 
 logger = logging.getLogger(__name__)
 
@@ -32,75 +42,125 @@ class RenderTaskBase(Task):
     
     def on_failure(self, exc, task_id, args, kwargs, einfo):
         """Обработка ошибки задачи."""
-        render_task_id = args[0]
+        # merge_pages получает результаты страниц первым аргументом, а ID задачи - именованным
+        self._handle_final_failure(kwargs.get('task_id') or args[0], exc)
+    
+    def _handle_final_failure(self, render_task_id, exc):
+        """Отмечает задачу как завершившуюся с ошибкой после всех повторов."""
         try:
-            render_task = RenderTask.objects.get(id=render_task_id)
-            render_task.mark_as_failed(str(exc))
+            progress = ProgressReporter(render_task_id)
+            progress.failed(str(exc))
+            render_task = progress.task
+            
+            if render_task.batch_id:
+                RenderBatch.record_result(render_task.batch_id, success=False)
+                self._send_batch_update(render_task.batch_id)
             
-            # Отправляем WebSocket уведомление
-            self._send_ws_update(render_task_id, {
-                'status': 'failed',
-                'error': str(exc),
-                'progress': render_task.progress
-            })
+            self._finish_followers(render_task, error=str(exc))
             
             logger.error(f"Render task {render_task_id} failed: {exc}")
         except Exception as e:
             logger.error(f"Failed to update render task {render_task_id} on failure: {e}")
     
-    def _update_progress(self, task_id, progress):
-        """Обновляет прогресс задачи."""
+    def _finish_followers(self, render_task, document=None, error=None):
+        """
+        Завершает задачи, присоединившиеся к рендерингу (single-flight),
+        результатом ведущей задачи: тем же документом или той же ошибкой.
+        """
+        render_single_flight.finish(render_task)
+        
+        finished = 0
+        for follower in RenderTask.objects.filter(leader=render_task, status='pending'):
+            try:
+                finished += finish_follower(follower, document=document, error=error)
+            except Exception as e:
+                logger.error(f"Failed to finish render task {follower.id} attached to {render_task.id}: {e}")
+        
+        if finished:
+            logger.info(f"Render task {render_task.id} finished {finished} attached task(s)")
+    
+    def _acquire_quota(self, task_id):
+        """
+        Занимает слоты задачи в лимитах одновременных рендеров.
+        
+        Если слотов нет, задача откладывается: она переотправляется с тем же
+        ID через RENDER_QUOTA_RETRY_DELAY секунд, не расходуя попытки на ошибки.
+        
+        Raises:
+            Retry: Задача отложена
+        """
+        render_task = RenderTask.objects.only('id', 'user_id', 'request_ip', 'template_id').get(id=task_id)
+        acquired, scope, position = render_quota.acquire(render_task)
+        if acquired:
+            return
+        
+        logger.info(f"Render task {task_id} deferred by {scope} quota, queue position {position}")
+        self._send_ws_update(task_id, {
+            'status': 'pending',
+            'progress': 0,
+            'queue_position': position
+        })
+        
+        delay = settings.RENDER_QUOTA_RETRY_DELAY
+        signature = self.signature_from_request(self.request, countdown=delay, retries=self.request.retries)
+        signature.apply_async()
+        raise Retry(when=delay, sig=signature)
+    
+    def _update_progress(self, task_id, progress, force=False):
+        """
+        Обновляет прогресс задачи, вызываемой из нескольких процессов (страницы).
+        
+        Обновления объединяются общим для всех процессов интервалом
+        RENDER_PROGRESS_INTERVAL_MS; force записывает прогресс сразу.
+        """
         try:
-            render_task = RenderTask.objects.get(id=task_id)
-            render_task.update_progress(progress)
-            
-            self._send_ws_update(task_id, {
-                'status': render_task.status,
-                'progress': progress
-            })
+            interval = max(1, -(-settings.RENDER_PROGRESS_INTERVAL_MS // 1000))
+            if force or cache.add(f"render_progress_throttle_{task_id}", 1, interval):
+                ProgressReporter(task_id).update(progress, force=True)
         except Exception as e:
             logger.error(f"Failed to update render task {task_id} progress: {e}")
     
-    def _send_ws_update(self, task_id, data):
-        """Отправляет обновление статуса через WebSocket."""
-        try:
-            async_to_sync(self.channel_layer.group_send)(
-                f"render_task_{task_id}",
-                {
-                    'type': 'render_task_update',
-                    'message': data
-                }
-            )
-        except Exception as e:
-            logger.error(f"Failed to send WebSocket update: {e}")
+    def _send_ws_update(self, task_id, data, wait=False, batch_id=None):
+        """Отправляет обновление статуса через WebSocket (не дожидаясь отправки, если не wait)."""
+        ws_publisher.publish_task(task_id, data, batch_id=batch_id, wait=wait)
+    
+    async def _send_ws_update_async(self, task_id, data, batch_id=None):
+        """Отправляет обновление статуса через WebSocket из event loop."""
+        message = dict(data, task_id=str(task_id))
+        groups = [task_group(task_id)]
+        if batch_id and message['status'] in ('done', 'failed'):
+            groups.append(batch_group(batch_id))
+        
+        for group in groups:
+            try:
+                await self.channel_layer.group_send(group, {'type': TASK_EVENT, 'message': message})
+            except Exception as e:
+                logger.error(f"Failed to send WebSocket update: {e}")
+    
+    def _send_batch_update(self, batch_id):
+        """Отправляет агрегированный прогресс пакета через WebSocket."""
+        send_batch_update(batch_id)
     
     def _create_document_record(self, task_id, file_bytes, file_name, content_type):
-        """Создает запись документа в БД."""
+        """
+        Создает запись документа в БД.
+        
+        file_bytes может быть BytesIO или ChecksumReader - во втором случае
+        документ передается в MinIO потоком, без буферизации целиком.
+        """
         try:
-            render_task = RenderTask.objects.get(id=task_id)
-            template_name = render_task.template.name
-            
-            # Генерируем имя файла
-            timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-            safe_template_name = template_name.replace(' ', '_')
-            file_name = f"{safe_template_name}_{timestamp}.{file_name.split('.')[-1]}"
-            
-            # Загружаем файл в MinIO
-            object_name, url = minio_client.upload_file(
-                file_obj=file_bytes,
-                folder=f"documents/{task_id}",
-                filename=file_name,
-                content_type=content_type,
-                bucket_type='documents'
-            )
+            render_task = RenderTask.objects.select_related('template').get(id=task_id)
+            file_name = self._document_file_name(render_task, file_name)
+            url, size_bytes, checksum = self._upload_document(task_id, file_bytes, file_name, content_type)
             
             # Создаем запись документа
             document = GeneratedDocument.objects.create(
                 task=render_task,
                 file=url,
-                size_bytes=len(file_bytes.getvalue()) if hasattr(file_bytes, 'getvalue') else file_bytes.getbuffer().nbytes,
+                size_bytes=size_bytes,
                 file_name=file_name,
-                content_type=content_type
+                content_type=content_type,
+                checksum=checksum
             )
             
             return document
@@ -109,12 +169,72 @@ class RenderTaskBase(Task):
             logger.error(f"Failed to create document record: {e}")
             raise
     
+    @staticmethod
+    def _document_file_name(render_task, file_name):
+        """Генерирует имя файла документа по имени шаблона."""
+        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+        safe_template_name = render_task.template.name.replace(' ', '_')
+        return f"{safe_template_name}_{timestamp}.{file_name.split('.')[-1]}"
+    
+    @staticmethod
+    def _upload_document(task_id, file_bytes, file_name, content_type):
+        """
+        Загружает документ в MinIO.
+        
+        Returns:
+            tuple: (url, size_bytes, checksum)
+        """
+        if isinstance(file_bytes, ChecksumReader):
+            # Размер и хеш считаются по мере чтения потока
+            object_name, url = minio_client.upload_stream(
+                stream=file_bytes,
+                folder=f"documents/{task_id}",
+                filename=file_name,
+                content_type=content_type,
+                bucket_type='documents'
+            )
+            
+            if not file_bytes.size:
+                minio_client.delete_file(object_name, 'documents')
+                raise RendererError("Empty response from renderer")
+            
+            return url, file_bytes.size, file_bytes.checksum
+        
+        # Загружаем файл в MinIO
+        object_name, url = minio_client.upload_file(
+            file_obj=file_bytes,
+            folder=f"documents/{task_id}",
+            filename=file_name,
+            content_type=content_type,
+            bucket_type='documents'
+        )
+        buffer = file_bytes.getbuffer()
+        size_bytes = buffer.nbytes
+        checksum = hashlib.sha256(buffer).hexdigest()
+        del buffer
+        
+        return url, size_bytes, checksum
+    
     def _render_document(self, task_id, html, options, format_type, renderer_url=None):
         """
         Общая логика рендеринга документа.
+        
+        В асинхронном режиме рендеринг ставится в фоновый event loop,
+        а задача Celery сразу освобождает процесс для следующей задачи.
         """
+        self._acquire_quota(task_id)
+        
+        if settings.RENDER_ASYNC_MODE:
+            async_render_executor.submit(
+                lambda: self._render_document_async(task_id, html, options, format_type, renderer_url)
+            )
+            return None
+        
         logger.info(f"Starting {format_type.upper()} rendering for task {task_id}")
         
+        # HTML мог быть передан по ссылке (см. RenderPayloadStore)
+        html = render_payload_store.resolve(task_id, html)
+        
         # Добавляем логирование HTML (только начало и конец, чтобы не засорять логи)
         html_preview = html[:500] + "..." if len(html) > 500 else html
         logger.debug(f"HTML for rendering (preview):\n{html_preview}")
@@ -128,60 +248,228 @@ class RenderTaskBase(Task):
             logger.info(f"Full HTML saved to: {debug_file}")
         
         render_task = RenderTask.objects.get(id=task_id)
+        progress = ProgressReporter(task_id, render_task)
         client = RendererClient(format_type, renderer_url=renderer_url)
         
         try:
-            # Обновляем статус
-            render_task.mark_as_processing()
-            
-            # Отправляем WebSocket уведомление
-            self._send_ws_update(task_id, {
-                'status': 'processing',
-                'progress': render_task.progress
-            })
+            # Обновляем статус и отправляем WebSocket уведомление
+            progress.processing()
             
-            # Рендерим документ - используем правильное имя метода render
-            rendered_data, content_type = client.render(html, options)
-            
-            # Сохраняем результат
-            if not rendered_data:
-                raise RendererError("Empty response from renderer")
+            if settings.RENDER_STREAM_UPLOADS:
+                # Передаем ответ рендерера в MinIO потоком
+                with client.render_stream(html, options) as (chunks, content_type):
+                    document = self._create_document_record(
+                        task_id=task_id,
+                        file_bytes=ChecksumReader(chunks),
+                        file_name=f"document.{format_type}",
+                        content_type=content_type
+                    )
+            else:
+                # Рендерим документ - используем правильное имя метода render
+                rendered_data, content_type = client.render(html, options)
+                
+                # Сохраняем результат
+                if not rendered_data or not rendered_data.getbuffer().nbytes:
+                    raise RendererError("Empty response from renderer")
+                
+                # Создаем запись документа в БД
+                document = self._create_document_record(
+                    task_id=task_id,
+                    file_bytes=rendered_data,
+                    file_name=f"document.{format_type}",
+                    content_type=content_type  # Используем возвращенный content_type
+                )
             
-            # Создаем запись документа в БД
-            document = self._create_document_record(
-                task_id=task_id,
-                file_bytes=rendered_data,
-                file_name=f"document.{format_type}",
-                content_type=content_type  # Используем возвращенный content_type
-            )
+            # Обновляем статус задачи и отправляем WebSocket уведомление
+            progress.done(document.file)
+            render_payload_store.discard(task_id)
             
-            # Обновляем статус задачи
-            render_task.mark_as_done()
+            if render_task.batch_id:
+                self._send_batch_update(render_task.batch_id)
             
-            # Отправляем WebSocket уведомление
-            self._send_ws_update(task_id, {
-                'status': 'done',
-                'document_url': document.file,
-                'progress': 100
-            })
+            self._finish_followers(render_task, document=document)
             
             logger.info(f"Document rendered successfully: {document.file}")
             return document.file
             
         except Exception as e:
             logger.error(f"Error rendering document: {e}")
-            render_task.mark_as_failed(str(e))
             
-            # Отправляем WebSocket уведомление
-            self._send_ws_update(task_id, {
-                'status': 'failed',
-                'error': str(e),
-                'progress': render_task.progress
-            })
+            # До последней попытки задача не failed: ее отметит _handle_final_failure
+            if self.request.retries < self.max_retries:
+                progress.retrying(str(e))
             
             # Повторяем задачу, если не превышен лимит повторов
             raise self.retry(exc=e)
     
+    async def _render_document_async(self, task_id, html, options, format_type, renderer_url=None):
+        """
+        Асинхронный вариант _render_document.
+        
+        Ответ рендерера пишется в SpooledTemporaryFile (в памяти до размера
+        части MinIO, дальше на диск) и загружается в MinIO в потоке.
+        Повторы выполняются здесь же, без возврата задачи в брокер.
+        """
+        logger.info(f"Starting async {format_type.upper()} rendering for task {task_id}")
+        
+        try:
+            html = await sync_to_async(render_payload_store.resolve)(task_id, html)
+            render_task = await RenderTask.objects.select_related('template').aget(id=task_id)
+            client = await sync_to_async(AsyncRendererClient)(format_type, renderer_url=renderer_url)
+        except Exception as e:
+            logger.error(f"Error preparing async render for task {task_id}: {e}")
+            await sync_to_async(self._handle_final_failure)(task_id, e)
+            return None
+        
+        await sync_to_async(render_task.mark_as_processing)()
+        await self._send_ws_update_async(task_id, {
+            'status': 'processing',
+            'progress': render_task.progress
+        })
+        
+        for attempt in range(self.max_retries + 1):
+            try:
+                with tempfile.SpooledTemporaryFile(max_size=settings.MINIO_PART_SIZE) as buffer:
+                    content_type = await client.render_to_file(html, options, buffer)
+                    buffer.seek(0)
+                    
+                    file_name = self._document_file_name(render_task, f"document.{format_type}")
+                    reader = ChecksumReader(iter(lambda: buffer.read(RendererClient.STREAM_CHUNK_SIZE), b''))
+                    url, size_bytes, checksum = await asyncio.to_thread(
+                        self._upload_document, task_id, reader, file_name, content_type
+                    )
+                
+                document = await GeneratedDocument.objects.acreate(
+                    task=render_task,
+                    file=url,
+                    size_bytes=size_bytes,
+                    file_name=file_name,
+                    content_type=content_type,
+                    checksum=checksum
+                )
+                break
+                
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Async render of task {task_id} failed after {attempt + 1} attempts: {e}")
+                    await sync_to_async(self._handle_final_failure)(task_id, e)
+                    return None
+                
+                delay = self.default_retry_delay * (attempt + 1)
+                logger.warning(f"Retrying async render of task {task_id} in {delay}s: {e}")
+                await asyncio.sleep(delay)
+        
+        await sync_to_async(render_task.mark_as_done)()
+        await sync_to_async(render_payload_store.discard)(task_id)
+        
+        await self._send_ws_update_async(task_id, {
+            'status': 'done',
+            'document_url': document.file,
+            'progress': 100
+        }, batch_id=render_task.batch_id)
+        
+        if render_task.batch_id:
+            await sync_to_async(self._send_batch_update)(render_task.batch_id)
+        
+        await sync_to_async(self._finish_followers)(render_task, document=document)
+        
+        logger.info(f"Document rendered successfully: {document.file}")
+        return document.file
+    
+    def _render_page(self, task_id, page_index, page_count, html, options, format_type, renderer_url=None):
+        """
+        Рендерит одну страницу и сохраняет ее во временный объект MinIO.
+        
+        Ошибка после всех повторов не роняет задачу, а возвращается как
+        результат: решение о судьбе документа принимает merge_pages, поэтому
+        задача рендеринга помечается ошибочной ровно один раз.
+        """
+        self._acquire_quota(task_id)
+        
+        try:
+            html = render_payload_store.resolve(task_id, html, page_index=page_index)
+            
+            if RenderTask.objects.filter(id=task_id, status='pending').update(status='processing'):
+                self._send_ws_update(task_id, {'status': 'processing', 'progress': 0})
+            
+            client = RendererClient(format_type, renderer_url=renderer_url)
+            with client.render_stream(html, options) as (chunks, content_type):
+                reader = ChecksumReader(chunks)
+                object_name, _ = minio_client.upload_stream(
+                    stream=reader,
+                    folder=f"documents/{task_id}/pages",
+                    filename=f"{page_index:04d}.{format_type}",
+                    content_type=content_type,
+                    bucket_type='documents'
+                )
+            
+            if not reader.size:
+                minio_client.delete_file(object_name, 'documents')
+                raise RendererError("Empty response from renderer")
+            
+            self._update_page_progress(task_id, page_count)
+            return {'index': page_index, 'object_name': object_name}
+            
+        except Exception as e:
+            if self.request.retries < self.max_retries:
+                raise self.retry(exc=e, countdown=self.default_retry_delay * (self.request.retries + 1))
+            
+            logger.error(f"Page {page_index} of task {task_id} failed: {e}")
+            return {'index': page_index, 'error': str(e)}
+    
+    def _update_page_progress(self, task_id, page_count):
+        """Обновляет прогресс по числу готовых страниц (последние 10% - склейка)."""
+        key = f"render_pages_done_{task_id}"
+        cache.add(key, 0, settings.RENDER_HTML_BLOB_TIMEOUT)
+        try:
+            done = cache.incr(key)
+        except ValueError:
+            return
+        self._update_progress(task_id, int(done * 90 / page_count), force=done >= page_count)
+    
+    def _merge_pages(self, task_id, results, format_type):
+        """
+        Собирает документ из страниц: PDF склеивается, остальные форматы
+        упаковываются в ZIP. Временные объекты страниц удаляются в любом случае.
+        """
+        results = sorted(results, key=lambda result: result['index'])
+        object_names = [result['object_name'] for result in results if 'object_name' in result]
+        
+        try:
+            errors = [f"страница {result['index'] + 1}: {result['error']}" for result in results if 'error' in result]
+            if errors:
+                raise RendererError(f"Ошибка постраничного рендеринга ({'; '.join(errors)})")
+            
+            with tempfile.SpooledTemporaryFile(max_size=settings.MINIO_PART_SIZE) as output:
+                content_type = page_merger.merge(object_names, format_type, output)
+                output.seek(0)
+                
+                extension = format_type if content_type != 'application/zip' else 'zip'
+                document = self._create_document_record(
+                    task_id=task_id,
+                    file_bytes=ChecksumReader(iter(lambda: output.read(RendererClient.STREAM_CHUNK_SIZE), b'')),
+                    file_name=f"document.{extension}",
+                    content_type=content_type
+                )
+            
+            progress = ProgressReporter(task_id)
+            progress.done(document.file)
+            render_task = progress.task
+            render_payload_store.discard(task_id, page_count=len(results))
+            
+            if render_task.batch_id:
+                self._send_batch_update(render_task.batch_id)
+            
+            self._finish_followers(render_task, document=document)
+            
+            logger.info(f"Merged {len(results)} pages into {document.file}")
+            return document.file
+            
+        finally:
+            for object_name in object_names:
+                minio_client.delete_file(object_name, 'documents')
+            cache.delete(f"render_pages_done_{task_id}")
+    
     def _handle_render_error(self, task_id, error):
         """Обрабатывает ошибки рендерера."""
         try:
@@ -218,4 +506,75 @@ class RenderTaskBase(Task):
                 raise MaxRetriesExceededError(f"Max retries exceeded: {str(error)}")
         except MaxRetriesExceededError:
             logger.error(f"Max retries exceeded for task {task_id}")
-            raise 
\ No newline at end of file
+            raise 
+
+
+class BatchTaskBase(RenderTaskBase):
+    """
+    Базовый класс задачи подготовки пакета.
+    
+    Аргумент задачи - ID пакета, а не задачи рендеринга, поэтому ошибка
+    завершает пакет: необработанные задачи отмечаются failed, иначе пакет
+    навсегда остался бы в обработке.
+    """
+    abstract = True
+    
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        """Завершает пакет с ошибкой."""
+        from apps.generation.services.document_generation_service import DocumentGenerationService
+        
+        batch_id = kwargs.get('batch_id') or args[0]
+        try:
+            batch = RenderBatch.objects.get(id=batch_id)
+            DocumentGenerationService._fail_batch(batch, str(exc))
+            self._send_batch_update(batch_id)
+            
+            logger.error(f"Batch {batch_id} failed: {exc}")
+        except Exception as e:
+            logger.error(f"Failed to update batch {batch_id} on failure: {e}")
+
+
+def send_batch_update(batch_id):
+    """Отправляет агрегированный прогресс пакета через WebSocket."""
+    try:
+        batch = RenderBatch.objects.get(id=batch_id)
+        ws_publisher.publish_batch(batch_id, {
+            'status': batch.status,
+            'total': batch.total,
+            'completed': batch.completed,
+            'failed': batch.failed,
+            'progress': batch.progress,
+        })
+    except Exception as e:
+        logger.error(f"Failed to send batch WebSocket update: {e}")
+
+
+def finish_follower(follower, document=None, error=None) -> bool:
+    """
+    Завершает присоединившуюся задачу документом или ошибкой ведущей
+    и отправляет события задачи и пакета.
+    
+    Returns:
+        bool: False, если задачу уже завершили или перезапустили
+    """
+    from apps.generation.services.document_generation_service import DocumentGenerationService
+    
+    if not DocumentGenerationService.settle_follower(follower, document=document, error=error):
+        return False
+    
+    if document is not None:
+        ws_publisher.publish_task(follower.id, {
+            'status': 'done',
+            'document_url': document.file,
+            'progress': 100
+        }, batch_id=follower.batch_id)
+    else:
+        ws_publisher.publish_task(follower.id, {
+            'status': 'failed',
+            'error': error,
+            'progress': follower.progress
+        }, batch_id=follower.batch_id)
+    
+    if follower.batch_id:
+        send_batch_update(follower.batch_id)
+    return True
\ No newline at end of file
@@ -7,6 +7,8 @@ from django.utils import timezone
 from celery import shared_task
 
 from apps.generation.models import RenderTask
+from apps.generation.services.single_flight import render_single_flight
+from apps.generation.tasks.base import finish_follower
 from apps.templates.models.template import Asset
 from infrastructure.minio_client import minio_client
 
@@ -58,4 +60,52 @@ def cleanup_deleted():
     
     return {
         'assets_deleted': asset_count,
+    }
+
+
+@shared_task(ignore_result=True)
+def reap_single_flight_followers():
+    """
+    Завершает задачи, присоединившиеся к рендерингу, который их не завершил.
+    
+    Если ведущая задача уже завершилась, присоединившаяся получает ее документ
+    или ошибку. Если ведущая больше не выполняется (воркер убит, рендер потерян
+    при остановке, истек RENDER_SINGLE_FLIGHT_TTL), задача рендерится заново.
+    Выполняется по расписанию через Celery Beat.
+    """
+    from apps.generation.services.document_generation_service import DocumentGenerationService
+    
+    finished = 0
+    restarted = 0
+    
+    followers = RenderTask.objects.filter(
+        status='pending',
+        leader__isnull=False
+    ).select_related('leader')
+    
+    for follower in followers.iterator():
+        leader = follower.leader
+        try:
+            if leader.status == 'done':
+                document = leader.documents.order_by('-created_at').first()
+                if document is not None:
+                    finished += finish_follower(follower, document=document)
+                else:
+                    finished += finish_follower(follower, error='Документ ведущей задачи не найден')
+            elif render_single_flight.is_leading(leader) is not False:
+                # Ведущая выполняется (или Redis недоступен) - ждем ее
+                continue
+            elif leader.status == 'failed':
+                finished += finish_follower(follower, error=leader.error or 'Ошибка ведущей задачи')
+            else:
+                restarted += DocumentGenerationService.restart_follower(follower)
+        except Exception as e:
+            logger.error(f"Error reaping render task {follower.id} attached to {leader.id}: {e}")
+    
+    if finished or restarted:
+        logger.info(f"Reaped attached render tasks: {finished} finished, {restarted} restarted")
+    
+    return {
+        'finished': finished,
+        'restarted': restarted,
     }
\ No newline at end of file
@@ -0,0 +1,26 @@
+"""
+Задачи Celery для проверки экземпляров микросервисов рендеринга.
+"""
+import logging
+from celery import shared_task
+
+from apps.templates.models import Format
+from infrastructure.renderers.balancer import renderer_balancer
+from infrastructure.renderers.render_client import RendererClient
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task(ignore_result=True)
+def check_renderers():
+    """
+    Проверяет health endpoint всех экземпляров рендереров.
+    
+    Недоступные экземпляры исключаются из балансировки до того, как на них
+    попадут задачи рендеринга. Выполняется по расписанию через Celery Beat.
+    """
+    for format_name in Format.objects.values_list('name', flat=True):
+        for url in RendererClient.get_renderer_urls(format_name):
+            result = renderer_balancer.check_health(url)
+            if result['status'] != 'available':
+                logger.warning(f"Renderer {url} ({format_name}) is {result['status']}: {result['message'][:200]}")
@@ -0,0 +1,227 @@
+"""
+Отчет о прогрессе задач рендеринга.
+
+Частые обновления прогресса (страницы, части ответа) объединяются: в БД
+пишется не больше одного обновления за RENDER_PROGRESS_INTERVAL_MS, а
+строка задачи не перечитывается перед каждой записью. Переходы статуса
+(processing, done, failed) записываются и публикуются сразу.
+
+События WebSocket отправляются из event loop фонового потока в порядке
+публикации: задача не ждет group_send и не создает event loop на каждое
+событие, как async_to_sync.
+
+Группы Channels:
+- render_task_<id> - все события задачи;
+- render_batch_<id> - прогресс пакета и итоговые события его задач, чтобы
+  за пакетом можно было следить через одно соединение.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from apps.generation.models import RenderTask
+from apps.generation.services.render_quota import render_quota
+
+logger = logging.getLogger(__name__)
+
+# Типы событий (имена обработчиков в consumers)
+TASK_EVENT = 'render_task_update'
+BATCH_EVENT = 'render_batch_update'
+
+
+def task_group(task_id) -> str:
+    """Группа Channels событий задачи рендеринга."""
+    return f"render_task_{task_id}"
+
+
+def batch_group(batch_id) -> str:
+    """Группа Channels событий пакета генерации."""
+    return f"render_batch_{batch_id}"
+
+
+class WebSocketPublisher:
+    """Неблокирующая отправка событий в группы Channels из процесса воркера."""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def publish(self, group: str, event_type: str, message: Dict[str, Any], wait: bool = False):
+        """
+        Ставит событие в очередь отправки.
+
+        Args:
+            group: Группа Channels
+            event_type: Тип события (имя обработчика в consumer)
+            message: Данные события
+            wait: Дождаться отправки (не дольше RENDER_PROGRESS_FLUSH_TIMEOUT)
+        """
+        sent = threading.Event() if wait else None
+        try:
+            loop = self._ensure_loop()
+            with self._lock:
+                self._pending += 1
+            loop.call_soon_threadsafe(self._queue.put_nowait, (group, {'type': event_type, 'message': message}, sent))
+        except Exception as e:
+            logger.error(f"Failed to queue WebSocket update: {e}")
+            return
+
+        if sent is not None and not sent.wait(settings.RENDER_PROGRESS_FLUSH_TIMEOUT):
+            logger.warning(f"WebSocket update to {group} not sent in {settings.RENDER_PROGRESS_FLUSH_TIMEOUT}s")
+
+    def publish_task(self, task_id, data: Dict[str, Any], batch_id=None, wait: bool = False):
+        """
+        Публикует событие задачи; итоговое событие задачи пакета
+        дублируется в группу пакета.
+        """
+        message = dict(data, task_id=str(task_id))
+        self.publish(task_group(task_id), TASK_EVENT, message, wait=wait)
+        if batch_id and message.get('status') in ('done', 'failed'):
+            self.publish(batch_group(batch_id), TASK_EVENT, message, wait=wait)
+
+    def publish_batch(self, batch_id, data: Dict[str, Any]):
+        """Публикует агрегированный прогресс пакета."""
+        self.publish(batch_group(batch_id), BATCH_EVENT, dict(data, batch_id=str(batch_id)))
+
+    def drain(self, timeout: float):
+        """Ожидает отправки событий из очереди, но не дольше timeout секунд."""
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if self._pending:
+            logger.warning(f"Stopping with {self._pending} WebSocket updates not sent")
+
+    def reset(self):
+        """Забывает event loop родителя после fork процесса воркера."""
+        self._loop = None
+        self._thread = None
+        self._queue = None
+        self._pending = 0
+
+    async def _consume(self):
+        channel_layer = get_channel_layer()
+        while True:
+            group, event, sent = await self._queue.get()
+            try:
+                await channel_layer.group_send(group, event)
+            except Exception as e:
+                logger.error(f"Failed to send WebSocket update: {e}")
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                if sent is not None:
+                    sent.set()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is not None and self._thread.is_alive():
+            return self._loop
+
+        with self._lock:
+            if self._loop is None or not self._thread.is_alive():
+                loop = asyncio.new_event_loop()
+                self._queue = asyncio.Queue()
+                loop.create_task(self._consume())
+                self._thread = threading.Thread(target=loop.run_forever, name='ws-publisher', daemon=True)
+                self._thread.start()
+                self._loop = loop
+        return self._loop
+
+
+class ProgressReporter:
+    """
+    Прогресс одной задачи рендеринга.
+
+    Держит строку задачи в памяти; промежуточный прогресс объединяется
+    и записывается одним UPDATE не чаще RENDER_PROGRESS_INTERVAL_MS.
+    """
+
+    def __init__(self, task_id, render_task: Optional[RenderTask] = None, publisher: Optional[WebSocketPublisher] = None):
+        self.task_id = task_id
+        self.render_task = render_task
+        self.publisher = publisher or ws_publisher
+        self._flushed_at = 0.0
+        self._pending: Optional[int] = None
+
+    @property
+    def task(self) -> RenderTask:
+        """Строка задачи (загружается один раз)."""
+        if self.render_task is None:
+            self.render_task = RenderTask.objects.get(id=self.task_id)
+        return self.render_task
+
+    def update(self, progress: int, force: bool = False):
+        """
+        Обновляет прогресс; запись и событие откладываются до конца интервала.
+
+        Args:
+            progress: Прогресс в процентах
+            force: Записать сразу (последнее промежуточное значение)
+        """
+        self._pending = min(max(progress, 0), 100)
+        interval = settings.RENDER_PROGRESS_INTERVAL_MS / 1000
+        if force or time.monotonic() - self._flushed_at >= interval:
+            self.flush()
+
+    def flush(self):
+        """Записывает отложенный прогресс и публикует его."""
+        if self._pending is None:
+            return
+
+        progress, self._pending = self._pending, None
+        self._flushed_at = time.monotonic()
+
+        # Страницы завершаются в любом порядке - прогресс только растет
+        updated = RenderTask.objects.filter(id=self.task_id, progress__lt=progress).update(progress=progress)
+        if not updated:
+            return
+
+        if self.render_task is not None:
+            self.render_task.progress = progress
+        self.publish({'status': 'processing', 'progress': progress})
+
+    def processing(self):
+        """Отмечает начало рендеринга."""
+        self.task.mark_as_processing()
+        self.publish({'status': 'processing', 'progress': self.task.progress})
+
+    def done(self, document_url: Optional[str]):
+        """Отмечает задачу выполненной; событие отправляется до возврата."""
+        self._pending = None
+        self.task.mark_as_done()
+        self.publish({'status': 'done', 'document_url': document_url, 'progress': 100}, wait=True)
+
+    def failed(self, error: str):
+        """Отмечает задачу завершившейся с ошибкой; событие отправляется до возврата."""
+        self._pending = None
+        self.task.mark_as_failed(error)
+        self.publish({'status': 'failed', 'error': error, 'progress': self.task.progress}, wait=True)
+
+    def retrying(self, error: str):
+        """
+        Ошибка попытки, после которой будет повтор.
+
+        Задача остается в обработке (failed - только после последней попытки),
+        иначе присоединившиеся задачи и подписчики пакета приняли бы ее за
+        окончательно упавшую. Слоты квот на время ожидания повтора освобождаются.
+        """
+        self._pending = None
+        self.task.error = error
+        self.task.save(update_fields=['error'])
+        render_quota.release(self.task)
+        self.publish({'status': 'processing', 'error': error, 'retrying': True, 'progress': self.task.progress})
+
+    def publish(self, data: Dict[str, Any], wait: bool = False):
+        """Публикует событие задачи без записи в БД."""
+        batch_id = self.render_task.batch_id if self.render_task is not None else None
+        self.publisher.publish_task(self.task_id, data, batch_id=batch_id, wait=wait)
+
+
+# Создаем экземпляр для использования в задачах рендеринга
+ws_publisher = WebSocketPublisher()
@@ -2,22 +2,60 @@
 Задачи Celery для рендеринга документов.
 """
 from celery import shared_task
-from .base import RenderTaskBase
+from .base import RenderTaskBase, BatchTaskBase
+
+
+@shared_task(bind=True, base=RenderTaskBase, time_limit=180)
+def prepare_document(self, task_id):
+    """Шаблонизирует документ и запускает задачу рендеринга его формата."""
+    from apps.generation.services.document_generation_service import DocumentGenerationService
+    
+    task = DocumentGenerationService.process_task(task_id)
+    
+    # Документ мог быть переиспользован без рендеринга
+    if task.status == 'done':
+        document = task.documents.order_by('-created_at').first()
+        self._send_ws_update(task_id, {
+            'status': 'done',
+            'document_url': document.file if document else None,
+            'progress': 100
+        }, batch_id=task.batch_id)
+
+
+@shared_task(bind=True, base=BatchTaskBase)
+def prepare_batch(self, batch_id):
+    """Шаблонизирует все документы пакета и запускает их рендеринг."""
+    from apps.generation.services.document_generation_service import DocumentGenerationService
+    
+    batch = DocumentGenerationService.process_batch(batch_id)
+    self._send_batch_update(batch.id)
 
 
 @shared_task(bind=True, base=RenderTaskBase, time_limit=180, max_retries=3, autoretry_for=(RuntimeError,))
 def render_pdf(self, task_id, html, options, format_type='pdf', renderer_url=None):
-    """Генерирует PDF документ."""
+    """Генерирует PDF документ. html=None - HTML передан по ссылке."""
     return self._render_document(task_id, html, options, format_type, renderer_url)
 
 
 @shared_task(bind=True, base=RenderTaskBase, time_limit=180, max_retries=3, autoretry_for=(RuntimeError,))
 def render_png(self, task_id, html, options, format_type='png', renderer_url=None):
-    """Генерирует PNG документ."""
+    """Генерирует PNG документ. html=None - HTML передан по ссылке."""
     return self._render_document(task_id, html, options, format_type, renderer_url)
 
 
 @shared_task(bind=True, base=RenderTaskBase, time_limit=180, max_retries=3, autoretry_for=(RuntimeError,))
 def render_svg(self, task_id, html, options, format_type='svg', renderer_url=None):
-    """Генерирует SVG документ."""
-    return self._render_document(task_id, html, options, format_type, renderer_url)
\ No newline at end of file
+    """Генерирует SVG документ. html=None - HTML передан по ссылке."""
+    return self._render_document(task_id, html, options, format_type, renderer_url)
+
+
+@shared_task(bind=True, base=RenderTaskBase, time_limit=180, max_retries=3)
+def render_page(self, task_id, page_index, page_count, html, options, format_type, renderer_url=None):
+    """Рендерит одну страницу документа в постраничном режиме."""
+    return self._render_page(task_id, page_index, page_count, html, options, format_type, renderer_url)
+
+
+@shared_task(bind=True, base=RenderTaskBase, time_limit=600)
+def merge_pages(self, results, task_id, format_type):
+    """Склеивает отрендеренные страницы в итоговый документ."""
+    return self._merge_pages(task_id, results, format_type)
@@ -0,0 +1,93 @@
+"""
+Маршрутизация задач Celery по очередям.
+
+Очереди разделены по классу приоритета и формату, чтобы ночной пакет или
+медленный формат не задерживали интерактивные запросы:
+- interactive / batch - подготовка документов (шаблонизация);
+- render.<format>.<priority> - рендеринг (или render.<priority> без
+  разделения по форматам, см. CELERY_QUEUE_PER_FORMAT);
+- maintenance - периодические задачи обслуживания.
+
+Каждый пул воркеров (CELERY_WORKER_POOLS) слушает свой набор очередей
+и масштабируется независимо.
+"""
+from typing import Dict, List, Optional
+from django.conf import settings
+
+
+class RenderQueues:
+    """Имена очередей для задач генерации."""
+
+    INTERACTIVE = 'interactive'
+    BATCH = 'batch'
+    MAINTENANCE = 'maintenance'
+
+    PRIORITIES = (INTERACTIVE, BATCH)
+
+    # Форматы, для которых заводятся отдельные очереди рендеринга
+    FORMATS = ('pdf', 'png', 'svg')
+
+    # Задачи с постоянной очередью
+    STATIC_ROUTES = {
+        'apps.generation.tasks.render.prepare_document': INTERACTIVE,
+        'apps.generation.tasks.render.prepare_batch': BATCH,
+        'apps.templates.tasks.render_template_task': INTERACTIVE,
+        'apps.generation.tasks.cleanup.cleanup_deleted': MAINTENANCE,
+        'apps.generation.tasks.health.check_renderers': MAINTENANCE,
+        'apps.generation.tasks.cleanup.reap_single_flight_followers': MAINTENANCE,
+    }
+
+    # Задачи рендеринга без явно указанной очереди
+    RENDER_TASKS = {
+        'apps.generation.tasks.render.render_pdf': 'pdf',
+        'apps.generation.tasks.render.render_png': 'png',
+        'apps.generation.tasks.render.render_svg': 'svg',
+    }
+
+    @classmethod
+    def normalize(cls, priority: Optional[str]) -> str:
+        """Возвращает известный класс приоритета (по умолчанию interactive)."""
+        return priority if priority in cls.PRIORITIES else cls.INTERACTIVE
+
+    @classmethod
+    def prepare_queue(cls, priority: Optional[str]) -> str:
+        """Очередь подготовки документа (шаблонизации)."""
+        return cls.normalize(priority)
+
+    @classmethod
+    def render_queue(cls, format_type: str, priority: Optional[str]) -> str:
+        """Очередь рендеринга формата."""
+        priority = cls.normalize(priority)
+        if settings.CELERY_QUEUE_PER_FORMAT:
+            return f"render.{format_type.lower()}.{priority}"
+        return f"render.{priority}"
+
+    @classmethod
+    def pool_queues(cls, pool: str) -> List[str]:
+        """Очереди, которые слушает пул воркеров (для аргумента -Q)."""
+        config = settings.CELERY_WORKER_POOLS[pool]
+        queues = list(config.get('queues', []))
+
+        for priority in config.get('priorities', []):
+            queues.append(cls.prepare_queue(priority))
+            if settings.CELERY_QUEUE_PER_FORMAT:
+                queues += [cls.render_queue(format_type, priority) for format_type in cls.FORMATS]
+            else:
+                queues.append(cls.render_queue('', priority))
+
+        return queues
+
+
+def route_task(name, args, kwargs, options, task=None, **kw) -> Optional[Dict[str, str]]:
+    """
+    Роутер Celery (CELERY_TASK_ROUTES).
+
+    Очередь, явно переданная в apply_async, имеет приоритет над маршрутом.
+    """
+    if name in RenderQueues.STATIC_ROUTES:
+        return {'queue': RenderQueues.STATIC_ROUTES[name]}
+
+    if name in RenderQueues.RENDER_TASKS:
+        return {'queue': RenderQueues.render_queue(RenderQueues.RENDER_TASKS[name], RenderQueues.INTERACTIVE)}
+
+    return None
@@ -197,7 +197,7 @@ class TemplateDetailSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'name', 'description', 'is_public', 
             'format', 'unit', 'pages', 'global_fields',
-            'permissions', 'global_assets'
+            'permissions', 'global_assets', 'dedupe_renders', 'render_mode'
         ]
         read_only_fields = ['id']
     
@@ -234,7 +234,7 @@ class TemplateCreateSerializer(serializers.ModelSerializer):
         model = Template
         fields = [
             'name', 'format', 'unit', 'description', 'html',
-            'is_public'
+            'is_public', 'dedupe_renders', 'render_mode'
         ]
 
 
@@ -85,6 +85,9 @@ template_nested_routes = [
     # Генерация документа
     path('generate/', import_string('apps.generation.api.views.GenerateDocumentViewSet').as_view({'post': 'generate'}), name='template-generate'),
     
+    # Пакетная генерация документов
+    path('generate/batch/', import_string('apps.generation.api.views.GenerateDocumentViewSet').as_view({'post': 'generate_batch'}), name='template-generate-batch'),
+    
     # Получение полей для генерации
     path('fields/', import_string('apps.generation.api.views.GenerateDocumentViewSet').as_view({'get': 'get_template_fields'}), name='template-get-fields'),
     
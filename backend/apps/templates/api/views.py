@@ -32,7 +32,10 @@ from apps.templates.api.permissions import (
 )
 from apps.templates.services.template_version_service import template_version_service
 from apps.templates.services.asset_helper import asset_helper
+from apps.templates.services.template_cache import TemplateCache
 from infrastructure.minio_client import minio_client
+from infrastructure.renderers.balancer import renderer_balancer
+from infrastructure.renderers.render_client import RendererClient
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +73,16 @@ class FormatViewSet(viewsets.ReadOnlyModelViewSet):
         settings_data = format_obj.expected_settings.all()
         serializer = FormatSettingSerializer(settings_data, many=True)
         return Response(serializer.data)
+    
+    @action(detail=True, methods=['get'], url_path='renderer-stats')
+    def renderer_stats(self, request, pk=None):
+        """Статистика запросов и состояние circuit breaker экземпляров рендерера формата."""
+        format_obj = self.get_object()
+        renderer_urls = RendererClient.get_renderer_urls(format_obj.name)
+        return Response({
+            'format': format_obj.name,
+            'endpoints': renderer_balancer.stats(renderer_urls)
+        })
 
 
 class TemplateViewSet(RevisionMixin, viewsets.ModelViewSet):
@@ -202,9 +215,16 @@ class TemplateViewSet(RevisionMixin, viewsets.ModelViewSet):
     def fields(self, request, pk=None):
         """Получение всех полей шаблона (глобальных и локальных)."""
         template = self.get_object()
-        fields = template.fields.all()
-        serializer = FieldSerializer(fields, many=True)
-        return Response(serializer.data)
+        return Response(TemplateCache.get_fields(template))
+    
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsTemplateViewerOrBetter])
+    def structure(self, request, pk=None):
+        """Структура шаблона: формат, страницы и поля (из кеша; ?version= - снимок версии полей)."""
+        template = self.get_object()
+        version = request.query_params.get('version')
+        if version is not None and not version.isdigit():
+            return Response({'error': 'version должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(TemplateCache.get_template_structure(template.id, int(version) if version else None))
     
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated, IsTemplateViewerOrBetter])
     def permissions(self, request, pk=None):
@@ -226,8 +246,7 @@ class TemplateViewSet(RevisionMixin, viewsets.ModelViewSet):
     def fields_for_generation(self, request, pk=None):
         """Получение полей для генерации документа."""
         template = self.get_object()
-        fields = template.fields.all().order_by('page', 'order')
-        return Response(FieldSerializer(fields, many=True).data)
+        return Response(TemplateCache.get_fields(template))
 
 
 class PageViewSet(viewsets.ModelViewSet):
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class TemplatesConfig(AppConfig):
     name = 'apps.templates'
-    verbose_name = 'Шаблоны' 
\ No newline at end of file
+    verbose_name = 'Шаблоны'
+    
+    def ready(self):
+        """Регистрирует сигналы инвалидации кешей."""
+        from apps.templates import signals  # noqa: F401
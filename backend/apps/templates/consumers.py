@@ -8,6 +8,8 @@ class TemplateRenderConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         self.template_id = self.scope['url_route']['kwargs']['template_id']
         self.template_group_name = f'template_{self.template_id}'
+        self.watchers = set()
+        self.finished_tasks = set()
         
         # Проверяем существование шаблона
         if not await self.template_exists():
@@ -23,6 +25,10 @@ class TemplateRenderConsumer(AsyncWebsocketConsumer):
         await self.accept()
 
     async def disconnect(self, close_code):
+        # Останавливаем ожидание запущенных рендеров
+        for watcher in getattr(self, 'watchers', ()):
+            watcher.cancel()
+        
         # Отсоединяемся от группы
         await self.channel_layer.group_discard(
             self.template_group_name,
@@ -36,17 +42,29 @@ class TemplateRenderConsumer(AsyncWebsocketConsumer):
         if action == 'start_render':
             # Запускаем рендеринг
             render_service = TemplateRenderService()
-            await render_service.render_template(
+            watcher = await render_service.render_template(
                 self.template_id,
                 self.template_group_name
             )
+            if watcher:
+                self.watchers.add(watcher)
+                watcher.add_done_callback(self.watchers.discard)
 
     async def render_progress(self, event):
+        message = event['message']
+        
+        # Итоговое событие приходит от задачи и от резервной проверки - отправляем один раз
+        if message['status'] == 'completed' or message['status'].startswith('error'):
+            if message['task_id'] in self.finished_tasks:
+                return
+            self.finished_tasks.add(message['task_id'])
+        
         # Отправляем прогресс клиенту
         await self.send(text_data=json.dumps({
             'type': 'progress',
-            'progress': event['progress'],
-            'status': event['status']
+            'task_id': message['task_id'],
+            'progress': message['progress'],
+            'status': message['status']
         }))
 
     @database_sync_to_async
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='dedupe_renders',
+            field=models.BooleanField(default=True, help_text='Переиспользовать ранее сгенерированный документ для идентичных запросов'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0003_template_dedupe_renders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='template',
+            name='render_mode',
+            field=models.CharField(choices=[('document', 'Одним документом'), ('per_page', 'Постранично')], default='document', help_text='Рендерить страницы параллельно с последующей склейкой', max_length=20),
+        ),
+    ]
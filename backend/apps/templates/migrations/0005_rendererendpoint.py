@@ -0,0 +1,34 @@
+# Generated by Django 4.2.8 on 2026-10-16 23:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('templates', '0004_template_render_mode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RendererEndpoint',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('url', models.URLField(help_text='Внутренний URL экземпляра рендерера')),
+                ('is_active', models.BooleanField(default=True, help_text='Участвует в балансировке?')),
+                ('format', models.ForeignKey(help_text='Для какого формата', on_delete=django.db.models.deletion.CASCADE, related_name='endpoints', to='templates.format')),
+            ],
+            options={
+                'verbose_name': 'Экземпляр рендерера',
+                'verbose_name_plural': 'Экземпляры рендереров',
+                'ordering': ['format', 'url'],
+                'unique_together': {('format', 'url')},
+            },
+        ),
+    ]
@@ -2,7 +2,7 @@
 Импорты моделей для приложения шаблонов.
 """
 # Сначала импортируем базовые модели
-from apps.templates.models.unit_format import Unit, Format, FormatSetting
+from apps.templates.models.unit_format import Unit, Format, FormatSetting, RendererEndpoint
 
 # Затем модели, которые зависят от базовых
 from apps.templates.models.template import (
@@ -18,7 +18,7 @@ from apps.templates.models.template import (
 
 # Делаем все доступным на уровне пакета
 __all__ = [
-    'Unit', 'Format', 'FormatSetting',
+    'Unit', 'Format', 'FormatSetting', 'RendererEndpoint',
     'Template', 'Page', 'TemplatePermission', 'PageSettings',
     'Field', 'FieldChoice', 'Asset', 'FieldVersion'
 ] 
\ No newline at end of file
@@ -38,6 +38,20 @@ class Template(BaseModel):
     )
     description = models.TextField(blank=True, help_text="Описание шаблона")
     html = models.TextField(blank=True, help_text="Base HTML шаблона")
+    dedupe_renders = models.BooleanField(
+        default=True,
+        help_text="Переиспользовать ранее сгенерированный документ для идентичных запросов"
+    )
+    RENDER_MODE_CHOICES = [
+        ('document', 'Одним документом'),
+        ('per_page', 'Постранично'),
+    ]
+    render_mode = models.CharField(
+        max_length=20,
+        choices=RENDER_MODE_CHOICES,
+        default='document',
+        help_text="Рендерить страницы параллельно с последующей склейкой"
+    )
     
     class Meta:
         verbose_name = "Шаблон"
@@ -47,6 +47,32 @@ class Format(BaseModel):
         return self.name
 
 
+class RendererEndpoint(BaseModel):
+    """
+    Дополнительный экземпляр микросервиса рендеринга формата.
+    
+    Запросы распределяются между Format.render_url и активными
+    экземплярами по числу запросов в работе.
+    """
+    format = models.ForeignKey(
+        Format,
+        on_delete=models.CASCADE,
+        related_name="endpoints",
+        help_text="Для какого формата"
+    )
+    url = models.URLField(help_text="Внутренний URL экземпляра рендерера")
+    is_active = models.BooleanField(default=True, help_text="Участвует в балансировке?")
+    
+    class Meta:
+        verbose_name = "Экземпляр рендерера"
+        verbose_name_plural = "Экземпляры рендереров"
+        ordering = ['format', 'url']
+        unique_together = ['format', 'url']
+    
+    def __str__(self):
+        return f"{self.format.name} - {self.url}"
+
+
 class FormatSetting(BaseModel):
     """
     Настройка для формата.
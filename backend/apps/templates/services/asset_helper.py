@@ -2,10 +2,11 @@
 Хелпер для работы с ассетами шаблонов.
 """
 import logging
-from typing import Optional, List, Dict, BinaryIO, Union
+from typing import Optional, List, Dict, BinaryIO, Union, Any
 from pathlib import Path
 from io import BytesIO
 from django.conf import settings
+from django.core.cache import cache
 from apps.templates.models.template import Asset, Template
 from infrastructure.helpers.file_helper import FileHelper
 
@@ -15,6 +16,10 @@ logger = logging.getLogger(__name__)
 class AssetHelper(FileHelper):
     """Централизованный сервис для управления ассетами шаблонов."""
     
+    # Время жизни карты ассетов в кеше. Должно быть заметно меньше срока
+    # действия подписанных ссылок (24 часа), которые хранятся в карте
+    ASSET_MAP_CACHE_TIMEOUT = getattr(settings, 'ASSET_MAP_CACHE_TIMEOUT', 3600)
+    
     @classmethod
     def upload_asset(
         cls,
@@ -158,14 +163,93 @@ class AssetHelper(FileHelper):
         Returns:
             str: URL ассета или пустую строку, если не найден
         """
-        asset = cls.find_asset(template_id, asset_name, page_id)
-        if asset and asset.file:
-            # Используем метод базового класса
-            return cls.get_presigned_url(asset.file, 'templates')
+        asset_map = cls.get_asset_map(template_id)
+        url = cls.resolve_asset_url(asset_map, asset_name, page_id)
+        if url:
+            return url
         
         cls.log_error(f"Asset not found: {asset_name} in template {template_id}", level='warning')
         return ""
     
+    @classmethod
+    def get_asset_map(cls, template_id: str, version: Any = None) -> Dict[str, Dict]:
+        """
+        Получает карту подписанных URL всех ассетов шаблона.
+        
+        Карта загружается одним запросом и кешируется для версии шаблона
+        (updated_at). При загрузке или удалении ассета кеш сбрасывается сигналом.
+        
+        Args:
+            template_id: ID шаблона
+            version: (optional) Версия шаблона (updated_at), если уже известна
+            
+        Returns:
+            Dict: {"global": {имя: url}, "pages": {page_id: {имя: url}}}
+        """
+        if version is None:
+            version = Template.objects.filter(id=template_id).values_list('updated_at', flat=True).first()
+            if version is None:
+                cls.log_error(f"Template not found: {template_id}", level='warning')
+                return {"global": {}, "pages": {}}
+        
+        version_key = version.isoformat() if hasattr(version, 'isoformat') else str(version)
+        cache_key = cls._asset_map_cache_key(template_id)
+        
+        cached = cache.get(cache_key)
+        if cached and cached.get('version') == version_key:
+            return cached['assets']
+        
+        asset_map = {"global": {}, "pages": {}}
+        assets = Asset.objects.filter(
+            template_id=template_id
+        ).only('name', 'file', 'page_id').order_by('created_at')
+        
+        for asset in assets:
+            if asset.page_id is None:
+                names = asset_map["global"]
+            else:
+                names = asset_map["pages"].setdefault(str(asset.page_id), {})
+            
+            # При дублировании имени побеждает первый загруженный ассет
+            if asset.name not in names and asset.file:
+                names[asset.name] = cls.get_presigned_url(asset.file, 'templates')
+        
+        cache.set(
+            cache_key,
+            {'version': version_key, 'assets': asset_map},
+            cls.ASSET_MAP_CACHE_TIMEOUT
+        )
+        return asset_map
+    
+    @staticmethod
+    def resolve_asset_url(asset_map: Dict[str, Dict], asset_name: str, page_id: Optional[str] = None) -> Optional[str]:
+        """
+        Находит URL ассета в карте: ассеты страницы перекрывают глобальные.
+        
+        Args:
+            asset_map: Карта из get_asset_map
+            asset_name: Имя ассета
+            page_id: (optional) ID страницы
+            
+        Returns:
+            URL или None, если ассет не найден
+        """
+        if page_id:
+            url = asset_map["pages"].get(str(page_id), {}).get(asset_name)
+            if url:
+                return url
+        
+        return asset_map["global"].get(asset_name)
+    
+    @classmethod
+    def invalidate_asset_map(cls, template_id: str):
+        """Сбрасывает закешированную карту ассетов шаблона."""
+        cache.delete(cls._asset_map_cache_key(template_id))
+    
+    @staticmethod
+    def _asset_map_cache_key(template_id: str) -> str:
+        return f"template_asset_map_{template_id}"
+    
     @classmethod
     def list_template_assets(cls, template_id: str, include_page_assets: bool = True) -> Dict[str, List[Dict]]:
         """
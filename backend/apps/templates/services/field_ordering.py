@@ -7,6 +7,7 @@ from django.core.exceptions import ValidationError
 from django.db.models import Max
 
 from apps.templates.models.template import Field
+from apps.templates.services.template_cache import TemplateCache
 
 
 class FieldOrderingService:
@@ -52,6 +53,9 @@ class FieldOrderingService:
             if field.order != i:
                 field.order = i
                 field.save(update_fields=['order'])
+        
+        # update() не отправляет сигналы - сбрасываем кеш шаблона явно
+        TemplateCache.invalidate_template_cache(template_id)
     
     @staticmethod
     def get_field_order(template_id: str, page_id: Optional[str] = None) -> Dict[str, int]:
@@ -126,6 +130,9 @@ class FieldOrderingService:
             
             # Устанавливаем новый порядок для поля
             Field.objects.filter(id=field_id).update(order=new_position)
+            
+            # update() не отправляет сигналы - сбрасываем кеш шаблона явно
+            TemplateCache.invalidate_template_cache(template_id)
     
     @staticmethod
     def get_next_order(template_id: str, page_id: Optional[str] = None) -> int:
@@ -0,0 +1,150 @@
+"""
+Скомпилированная схема полей шаблона.
+
+Поля и варианты выбора загружаются двумя запросами, а схема кешируется
+в поколении шаблона (TemplateCache) и сбрасывается вместе с остальными
+кешами шаблона. Валидация данных и структура полей для API строятся из
+схемы в памяти, без запросов к БД.
+"""
+import logging
+from typing import Any, Dict, List
+from django.db.models import Prefetch
+
+from apps.templates.models.template import Template, FieldChoice
+from apps.templates.services.template_cache import TemplateCache
+
+logger = logging.getLogger(__name__)
+
+
+class FieldSchema:
+    """Поля шаблона в порядке отображения с множествами допустимых значений."""
+
+    def __init__(self, fields: List[Dict[str, Any]]):
+        self.fields = fields
+        self.keys = {field['key'] for field in fields}
+        self.required_keys = {field['key'] for field in fields if field['required']}
+
+        # Допустимые значения полей choices (строками, как их сравнивает валидация)
+        self.allowed_values = [
+            {str(choice['value']) for choice in field['choices']} if field['type'] == 'choices' else None
+            for field in fields
+        ]
+
+    def validate(self, data: Dict[str, Any]) -> List[Dict[str, str]]:
+        """
+        Валидирует данные за один проход по полям.
+
+        Returns:
+            List[Dict[str, str]]: Список ошибок
+        """
+        errors = []
+
+        # Проверяем обязательные поля и допустимые значения
+        for field, allowed in zip(self.fields, self.allowed_values):
+            key = field['key']
+            value = data.get(key)
+
+            if field['required'] and (value is None or str(value).strip() == ''):
+                errors.append({
+                    'field': key,
+                    'label': field['label'],
+                    'error': 'Обязательное поле отсутствует или пустое'
+                })
+                continue
+
+            if value is not None and allowed is not None and str(value) not in allowed:
+                choices_info = [f"{choice['label']} ({choice['value']})" for choice in field['choices']]
+                errors.append({
+                    'field': key,
+                    'label': field['label'],
+                    'error': f'Значение должно быть одним из: {", ".join(choices_info)}'
+                })
+
+        # Проверяем на лишние поля
+        for extra_key in data.keys() - self.keys:
+            errors.append({
+                'field': extra_key,
+                'label': extra_key,
+                'error': 'Поле не существует в шаблоне'
+            })
+
+        return errors
+
+    def structure(self) -> Dict[str, Any]:
+        """
+        Структура полей для API: глобальные поля и поля по индексам страниц.
+
+        Returns:
+            Dict: {'global_fields': [...], 'page_fields': {'<index>': [...]}}
+        """
+        global_fields = []
+        page_fields = {}
+
+        for field in self.fields:
+            field_data = self._field_data(field)
+            if field['page_index'] is None:
+                global_fields.append(field_data)
+            else:
+                page_fields.setdefault(str(field['page_index']), []).append(field_data)
+
+        return {
+            'global_fields': global_fields,
+            'page_fields': page_fields
+        }
+
+    @staticmethod
+    def _field_data(field: Dict[str, Any]) -> Dict[str, Any]:
+        field_data = {
+            'key': field['key'],
+            'label': field['label'],
+            'type': field['type'],
+            'required': field['required'],
+            'placeholder': field['placeholder'],
+            'help_text': field['help_text'],
+        }
+
+        if field['default_value']:
+            field_data['default_value'] = field['default_value']
+
+        if field['type'] == 'choices' and field['choices']:
+            field_data['choices'] = [dict(choice) for choice in field['choices']]
+
+        return field_data
+
+
+class FieldSchemaCache:
+    """Построение и кеширование схем полей шаблонов."""
+
+    @classmethod
+    def get(cls, template: Template) -> FieldSchema:
+        """Возвращает схему полей текущего поколения шаблона."""
+        return FieldSchema(TemplateCache.get_or_build(template.id, 'field_schema', lambda: cls.build(template)))
+
+    @staticmethod
+    def build(template: Template) -> List[Dict[str, Any]]:
+        """Загружает поля шаблона с вариантами выбора (два запроса)."""
+        fields = template.fields.select_related('page').prefetch_related(
+            Prefetch('choices', queryset=FieldChoice.objects.order_by('order'))
+        ).order_by('page__index', 'order')
+
+        return [
+            {
+                'key': field.key,
+                'label': field.label,
+                'type': field.type,
+                'required': field.is_required,
+                'placeholder': field.placeholder,
+                'help_text': field.help_text,
+                'default_value': field.default_value,
+                'page_index': field.page.index if field.page else None,
+                'choices': [
+                    {'label': choice.label, 'value': choice.value, 'order': choice.order}
+                    for choice in field.choices.all()
+                ],
+            }
+            for field in fields
+        ]
+
+
+# Создаем экземпляр для использования в валидации и API
+field_schema_cache = FieldSchemaCache()
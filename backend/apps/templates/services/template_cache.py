@@ -1,90 +1,145 @@
 """
 Сервис кеширования шаблонов.
+
+Все кешированные представления шаблона (структура, список полей, схема
+полей) хранятся под ключами с номером поколения шаблона. Сигналы изменения
+шаблона, страниц, полей, вариантов выбора и ассетов увеличивают поколение -
+одна операция вместо поиска и удаления ключей; старые записи истекают сами.
 """
-import json
-from typing import Dict, Any, Optional
+import time
+from typing import Any, Callable, Dict, List, Optional
 from django.core.cache import cache
-from django.core.cache.utils import make_template_fragment_key
+from django.db import transaction
+from django.db.models import Prefetch
 
-from apps.templates.models import Template, FieldVersion
+from apps.templates.models import Template, Page, Field, FieldChoice, FieldVersion
 
 
 class TemplateCache:
     """Сервис кеширования шаблонов."""
-    
+
     CACHE_TIMEOUT = 3600  # 1 час
-    
-    @staticmethod
-    def get_template_structure(template_id: str, version: Optional[int] = None) -> Dict[str, Any]:
+
+    @classmethod
+    def generation(cls, template_id) -> int:
+        """Текущее поколение кеша шаблона."""
+        key = cls._generation_key(template_id)
+        value = cache.get(key)
+        if value is None:
+            # Начальное значение - время в мс: если счетчик вытеснен из Redis,
+            # новое поколение не совпадет ни с одним из прежних
+            cache.add(key, int(time.time() * 1000), None)
+            value = cache.get(key)
+        return value
+
+    @classmethod
+    def bump(cls, template_id):
+        """Делает недействительными все кешированные представления шаблона."""
+        key = cls._generation_key(template_id)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Счетчика еще нет - кешированных представлений тоже
+            cache.add(key, int(time.time() * 1000), None)
+
+    @classmethod
+    def get_or_build(cls, template_id, kind: str, builder: Callable[[], Any], suffix: str = '') -> Any:
+        """
+        Возвращает представление шаблона из кеша текущего поколения или строит его.
+
+        Args:
+            template_id: ID шаблона
+            kind: Вид представления (часть ключа)
+            builder: Функция построения при промахе
+            suffix: Уточнение ключа (например, версия)
+        """
+        cache_key = f"template_{kind}_{template_id}_{cls.generation(template_id)}{suffix}"
+
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        value = builder()
+        cache.set(cache_key, value, cls.CACHE_TIMEOUT)
+        return value
+
+    @classmethod
+    def get_template_structure(cls, template_id: str, version: Optional[int] = None) -> Dict[str, Any]:
         """
         Получает структуру шаблона из кеша.
-        
+
         Args:
             template_id: ID шаблона
             version: Номер версии (None для текущей)
-            
+
         Returns:
             Dict[str, Any]: Структура шаблона
         """
-        cache_key = f"template_structure_{template_id}_{version or 'latest'}"
-        
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return json.loads(cached_data)
-        
-        # Загружаем из БД
-        template = Template.objects.select_related(
-            'format', 'unit'
-        ).prefetch_related(
-            'pages__fields', 'fields'
-        ).get(id=template_id)
-        
-        structure = TemplateCache._build_structure(template, version)
-        
-        # Кешируем
-        cache.set(cache_key, json.dumps(structure), TemplateCache.CACHE_TIMEOUT)
-        
-        return structure
-    
-    @staticmethod
-    def invalidate_template_cache(template_id: str):
+        return cls.get_or_build(
+            template_id,
+            'structure',
+            lambda: cls._build_structure(template_id, version),
+            suffix=f"_{version or 'latest'}"
+        )
+
+    @classmethod
+    def get_fields(cls, template: Template) -> List[Dict[str, Any]]:
+        """Сериализованные поля шаблона (FieldSerializer) в порядке страниц и полей."""
+        from apps.templates.api.serializers import FieldSerializer
+
+        def build():
+            fields = template.fields.select_related('page').prefetch_related(
+                Prefetch('choices', queryset=FieldChoice.objects.order_by('order'))
+            ).order_by('page', 'order')
+            return FieldSerializer(fields, many=True).data
+
+        return cls.get_or_build(template.id, 'fields', build)
+
+    @classmethod
+    def invalidate_template_cache(cls, template_id: str):
         """
-        Инвалидирует кеш шаблона.
-        
+        Инвалидирует кеш шаблона после фиксации текущей транзакции.
+
+        Иначе параллельный запрос успел бы закешировать в новом поколении
+        еще не зафиксированное состояние.
+
         Args:
             template_id: ID шаблона
         """
-        # Получаем все ключи кеша для этого шаблона
-        pattern = f"template_structure_{template_id}_*"
-        
-        # Django не поддерживает wildcard delete, поэтому используем альтернативный подход
-        cache.delete_many([
-            f"template_structure_{template_id}_latest",
-            *[f"template_structure_{template_id}_{i}" for i in range(1, 100)]
-        ])
-    
-    @staticmethod
-    def _build_structure(template: Template, version: Optional[int] = None) -> Dict[str, Any]:
+        transaction.on_commit(lambda: cls.bump(template_id))
+
+    @classmethod
+    def _build_structure(cls, template_id: str, version: Optional[int] = None) -> Dict[str, Any]:
         """
         Строит структуру данных для кеша.
-        
+
         Args:
-            template: Объект шаблона
+            template_id: ID шаблона
             version: Номер версии (None для текущей)
-            
+
         Returns:
             Dict[str, Any]: Структура шаблона
         """
         if version:
             # Получаем структуру из версии
             field_version = FieldVersion.objects.filter(
-                template=template,
+                template_id=template_id,
                 version_number=version
             ).first()
-            
+
             if field_version:
                 return field_version.fields_snapshot
-        
+
+        # Загружаем шаблон, страницы, поля и варианты выбора четырьмя запросами
+        template = Template.objects.select_related(
+            'format', 'unit'
+        ).prefetch_related(
+            Prefetch('pages', queryset=Page.objects.order_by('index')),
+            Prefetch('fields', queryset=Field.objects.order_by('order').prefetch_related(
+                Prefetch('choices', queryset=FieldChoice.objects.order_by('order'))
+            )),
+        ).get(id=template_id)
+
         # Строим текущую структуру
         structure = {
             'id': str(template.id),
@@ -102,29 +157,26 @@ class TemplateCache:
             'pages': [],
             'global_fields': []
         }
-        
-        # Добавляем страницы
-        for page in template.pages.all().order_by('index'):
-            page_data = {
+
+        page_fields = {}
+        for field in template.fields.all():
+            page_fields.setdefault(field.page_id, []).append(cls._serialize_field(field))
+
+        # Добавляем страницы с их полями
+        for page in template.pages.all():
+            structure['pages'].append({
                 'id': str(page.id),
                 'index': page.index,
                 'width': float(page.width),
                 'height': float(page.height),
-                'fields': []
-            }
-            
-            # Добавляем поля страницы
-            for field in page.fields.all().order_by('order'):
-                page_data['fields'].append(TemplateCache._serialize_field(field))
-            
-            structure['pages'].append(page_data)
-        
+                'fields': page_fields.get(page.id, [])
+            })
+
         # Добавляем глобальные поля
-        for field in template.fields.filter(page__isnull=True).order_by('order'):
-            structure['global_fields'].append(TemplateCache._serialize_field(field))
-        
+        structure['global_fields'] = page_fields.get(None, [])
+
         return structure
-    
+
     @staticmethod
     def _serialize_field(field) -> Dict[str, Any]:
         """Сериализует поле для кеша."""
@@ -138,18 +190,28 @@ class TemplateCache:
             'placeholder': field.placeholder,
             'help_text': field.help_text,
         }
-        
+
         if field.default_value:
             field_data['default_value'] = field.default_value
-        
-        if field.type == 'choices' and field.choices.exists():
+
+        # choices предзагружены и упорядочены по order
+        choices = list(field.choices.all())
+        if field.type == 'choices' and choices:
             field_data['choices'] = [
                 {
                     'label': choice.label,
                     'value': choice.value,
                     'order': choice.order
                 }
-                for choice in field.choices.all().order_by('order')
+                for choice in choices
             ]
-        
-        return field_data 
\ No newline at end of file
+
+        return field_data
+
+    @staticmethod
+    def _generation_key(template_id) -> str:
+        return f"template_generation_{template_id}"
+
+
+# Создаем экземпляр для удобного использования
+template_cache = TemplateCache()
@@ -1,42 +1,88 @@
+import asyncio
+import logging
+from celery.result import AsyncResult
+from channels.db import database_sync_to_async
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
-from django.db import transaction
+from asgiref.sync import sync_to_async
 from apps.templates.models import Template, Page
 
+logger = logging.getLogger(__name__)
+
+
 class TemplateRenderService:
+    """
+    Рендеринг шаблона с прогрессом через WebSocket.
+
+    Задача Celery сама отправляет прогресс в группу шаблона, consumer только
+    ждет событий. Состояние задачи в result backend проверяется редко
+    (с экспоненциальной задержкой) - лишь на случай, если задача завершилась,
+    не успев отправить итоговое событие (воркер убит, лимит времени).
+    """
+
+    # Задержка между проверками result backend (секунды)
+    POLL_INITIAL_DELAY = 0.5
+    POLL_MAX_DELAY = 5
+
+    # Через сколько секунд ожидание рендеринга прекращается
+    WATCH_TIMEOUT = 300
+
     def __init__(self):
         self.channel_layer = get_channel_layer()
 
     async def render_template(self, template_id, group_name):
+        """
+        Запускает рендеринг шаблона.
+
+        Returns:
+            asyncio.Task: Фоновое ожидание завершения (None, если шаблон не найден)
+        """
         # Получаем шаблон
         template = await self._get_template(template_id)
         if not template:
-            return
+            return None
+
+        # Импортируем здесь, чтобы избежать циклических импортов
+        from apps.templates.tasks import render_template_task
+
+        # Запускаем задачу рендеринга; прогресс она отправит в группу сама
+        task = await sync_to_async(render_template_task.delay)(template_id, group_name)
 
         # Отправляем начальный статус
-        await self._send_progress(group_name, 0, 'started')
+        await self._send_progress(group_name, task.id, 0, 'started')
 
-        try:
-            # Импортируем здесь, чтобы избежать циклических импортов
-            from apps.templates.tasks import render_template_task
-            
-            # Запускаем задачу рендеринга
-            task = render_template_task.delay(template_id)
-            
-            # Отслеживаем прогресс
-            while not task.ready():
-                progress = task.info.get('progress', 0)
-                status = task.info.get('status', 'processing')
-                await self._send_progress(group_name, progress, status)
-                
-                if task.failed():
-                    raise Exception(task.result)
-
-            # Отправляем финальный статус
-            await self._send_progress(group_name, 100, 'completed')
-
-        except Exception as e:
-            await self._send_progress(group_name, 0, f'error: {str(e)}')
+        # Ожидание не должно блокировать consumer, иначе он не получит события группы
+        return asyncio.ensure_future(self.watch_render(task.id, group_name))
+
+    async def watch_render(self, task_id, group_name):
+        """
+        Резервная проверка завершения задачи через result backend.
+
+        Итоговое событие отправляется повторно и после события задачи -
+        consumer пропускает повторы по task_id.
+        """
+        delay = self.POLL_INITIAL_DELAY
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.WATCH_TIMEOUT
+
+        while loop.time() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.POLL_MAX_DELAY)
+
+            result = AsyncResult(task_id)
+            try:
+                state = await sync_to_async(lambda: result.state, thread_sensitive=False)()
+            except Exception as e:
+                logger.warning(f"Failed to read state of template render {task_id}: {e}")
+                continue
+
+            if state == 'SUCCESS':
+                await self._send_progress(group_name, task_id, 100, 'completed')
+                return
+            if state in ('FAILURE', 'REVOKED'):
+                await self._send_progress(group_name, task_id, 0, f'error: {result.result}')
+                return
+
+        await self._send_progress(group_name, task_id, 0, 'error: превышено время ожидания рендеринга')
 
     def render(self, template):
         """
@@ -50,27 +96,30 @@ class TemplateRenderService:
             'pages': template.pages.count()
         }
 
-    async def _send_progress(self, group_name, progress, status):
+    @staticmethod
+    def progress_event(task_id, progress, status):
+        """Событие прогресса для группы шаблона."""
+        return {
+            'task_id': str(task_id),
+            'progress': progress,
+            'status': status
+        }
+
+    async def _send_progress(self, group_name, task_id, progress, status):
         await self.channel_layer.group_send(
             group_name,
             {
                 'type': 'render_progress',
-                'progress': progress,
-                'status': status
+                'message': self.progress_event(task_id, progress, status)
             }
         )
 
-    @transaction.atomic
+    @database_sync_to_async
     def _get_template(self, template_id):
         try:
             return Template.objects.select_related(
                 'format',
                 'format__unit'
-            ).prefetch_related(
-                'pages',
-                'pages__fields',
-                'pages__assets'
             ).get(id=template_id)
         except Template.DoesNotExist:
             return None
- 
\ No newline at end of file
@@ -3,15 +3,22 @@
 
 Использует облегченную версию Jinja2 с ограниченным набором функций.
 """
+import hashlib
 import logging
 import re
-from typing import Dict, Any, Optional, List
-from jinja2 import Environment, DictLoader, Template, sandbox, exceptions
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Callable, Tuple
+from django.conf import settings
+from jinja2 import Environment, DictLoader, Template, sandbox, exceptions, pass_context
 from jinja2.sandbox import SandboxedEnvironment
 from .asset_helper import asset_helper
 
 logger = logging.getLogger(__name__)
 
+# Имя переменной Jinja-контекста, в которой передается контекст рендеринга
+RENDER_CONTEXT_VAR = '_render_context'
+
 
 class TemplateProcessingError(Exception):
     """Исключение, возникающее при ошибках обработки шаблонов."""
@@ -40,6 +47,123 @@ class LimitedSandboxEnvironment(SandboxedEnvironment):
         return super().call_binop(context, operator, left, right)
 
 
+class RenderContext:
+    """
+    Контекст одного вызова render_template.
+    
+    Передается через переменные Jinja-контекста, а не через состояние
+    рендерера, поэтому параллельные рендеры в разных потоках не видят
+    данные друг друга.
+    """
+    
+    __slots__ = ('template_id', 'page_id', 'asset_map')
+    
+    def __init__(self, template_id=None, page_id=None, asset_map=None):
+        self.template_id = str(template_id) if template_id else None
+        self.page_id = str(page_id) if page_id else None
+        # Карта ассетов шаблона, загружается один раз на рендер
+        self.asset_map = asset_map
+
+
+class CompiledTemplateCache:
+    """
+    Ограниченный LRU-кеш скомпилированных Jinja-шаблонов.
+    
+    Ключ состоит из ID шаблона, ID страницы и хеша HTML, поэтому измененный HTML
+    никогда не попадет на устаревшую запись. Явная инвалидация по ID нужна,
+    чтобы не держать в памяти старые версии страниц.
+    """
+    
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[Optional[str], Optional[str], str], Template]" = OrderedDict()
+        self._lock = threading.Lock()
+        
+        # Статистика
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    @staticmethod
+    def make_key(html: str, template_id=None, page_id=None) -> Tuple[Optional[str], Optional[str], str]:
+        """Формирует ключ кеша из ID шаблона/страницы и хеша содержимого."""
+        digest = hashlib.sha1(html.encode('utf-8')).hexdigest()
+        return (
+            str(template_id) if template_id else None,
+            str(page_id) if page_id else None,
+            digest
+        )
+    
+    def get_or_compile(self, key: Tuple, compile_func: Callable[[], Template]) -> Template:
+        """
+        Возвращает скомпилированный шаблон из кеша или компилирует его.
+        
+        Args:
+            key: Ключ из make_key
+            compile_func: Функция компиляции при промахе
+        """
+        with self._lock:
+            compiled = self._entries.get(key)
+            if compiled is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return compiled
+            self.misses += 1
+        
+        # Компилируем вне блокировки, чтобы не задерживать другие потоки
+        compiled = compile_func()
+        
+        with self._lock:
+            self._entries[key] = compiled
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        
+        return compiled
+    
+    def invalidate(self, template_id=None, page_id=None) -> int:
+        """
+        Удаляет записи шаблона или страницы.
+        
+        Returns:
+            int: Количество удаленных записей
+        """
+        template_id = str(template_id) if template_id else None
+        page_id = str(page_id) if page_id else None
+        
+        with self._lock:
+            stale = [
+                key for key in self._entries
+                if (template_id and key[0] == template_id) or (page_id and key[1] == page_id)
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        
+        return len(stale)
+    
+    def clear(self):
+        """Полностью очищает кеш."""
+        with self._lock:
+            self._entries.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Возвращает статистику кеша."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
 class TemplateRenderer:
     """
     Сервис для рендеринга HTML-шаблонов с подстановкой пользовательских данных.
@@ -64,17 +188,26 @@ class TemplateRenderer:
         # Добавляем функцию для работы с ассетами
         self.environment.globals['asset'] = self._asset_function
         
-        # Храним контекст для доступа к template_id и page_id
-        self._template_id = None
-        self._page_id = None
+        # Кеш скомпилированных шаблонов
+        self.compiled_cache = CompiledTemplateCache(
+            maxsize=getattr(settings, 'TEMPLATE_COMPILED_CACHE_SIZE', 256)
+        )
     
-    def _asset_function(self, asset_name):
+    @pass_context
+    def _asset_function(self, context, asset_name):
         """Функция для получения URL ассета внутри шаблона."""
-        if not self._template_id:
+        render_context = context.get(RENDER_CONTEXT_VAR)
+        if render_context is None or not render_context.template_id:
             logger.warning("asset() called without template_id")
             return ""
         
-        url = asset_helper.get_asset_url(self._template_id, asset_name, self._page_id)
+        if render_context.asset_map is None:
+            render_context.asset_map = asset_helper.get_asset_map(render_context.template_id)
+        
+        url = asset_helper.resolve_asset_url(render_context.asset_map, asset_name, render_context.page_id)
+        if not url:
+            logger.warning(f"Asset not found: {asset_name} in template {render_context.template_id}")
+            return ""
         return url
     
     def validate_template(self, html: str) -> List[Dict[str, Any]]:
@@ -141,7 +274,8 @@ class TemplateRenderer:
         
         return sorted(list(fields))
     
-    def render_template(self, html: str, data: Dict[str, Any], template_id=None, page_id=None) -> str:
+    def render_template(self, html: str, data: Dict[str, Any], template_id=None, page_id=None,
+                        asset_map: Optional[Dict[str, Dict]] = None) -> str:
         """
         Рендерит HTML-шаблон с подстановкой данных.
         
@@ -150,6 +284,8 @@ class TemplateRenderer:
             data: Словарь с данными для подстановки
             template_id: ID шаблона для обработки ассетов
             page_id: (optional) ID страницы для поиска локальных ассетов
+            asset_map: (optional) Карта ассетов из asset_helper.get_asset_map,
+                чтобы не загружать ее заново для каждой страницы документа
             
         Returns:
             str: Отрендеренный HTML
@@ -158,15 +294,20 @@ class TemplateRenderer:
             TemplateProcessingError: В случае ошибки рендеринга
         """
         try:
-            # Устанавливаем контекст для функции asset
-            self._template_id = template_id
-            self._page_id = page_id
-            
-            # Создаем шаблон из строки
-            template = self.environment.from_string(html)
+            # Берем скомпилированный шаблон из кеша или компилируем
+            cache_key = self.compiled_cache.make_key(html, template_id, page_id)
+            template = self.compiled_cache.get_or_compile(
+                cache_key,
+                lambda: self.environment.from_string(html)
+            )
             
-            # Рендерим с переданными данными
-            rendered_html = template.render(**data)
+            # Рендерим с переданными данными и контекстом для функции asset.
+            # Экземпляр рендерера не хранит состояние вызова, поэтому
+            # render_template можно вызывать из нескольких потоков одновременно
+            rendered_html = template.render({
+                **data,
+                RENDER_CONTEXT_VAR: RenderContext(template_id, page_id, asset_map)
+            })
             
             return rendered_html
             
@@ -182,10 +323,14 @@ class TemplateRenderer:
         except Exception as e:
             logger.error(f"Template rendering error: {e}")
             raise TemplateProcessingError(f"Ошибка рендеринга шаблона: {str(e)}")
-        finally:
-            # Очищаем контекст
-            self._template_id = None
-            self._page_id = None
+    
+    def invalidate_cache(self, template_id=None, page_id=None) -> int:
+        """Инвалидирует скомпилированные шаблоны шаблона или страницы."""
+        return self.compiled_cache.invalidate(template_id=template_id, page_id=page_id)
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Возвращает статистику кеша скомпилированных шаблонов."""
+        return self.compiled_cache.stats()
 
 
 # Синглтон-инстанс для удобного импорта
@@ -0,0 +1,90 @@
+"""
+Сигналы приложения шаблонов.
+
+Инвалидируют кеши, зависящие от содержимого шаблонов.
+"""
+import logging
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from apps.templates.models.template import Template, Page, Asset, Field, FieldChoice
+from apps.templates.models.unit_format import Format, RendererEndpoint
+from apps.templates.services.templating import template_renderer
+from apps.templates.services.asset_helper import asset_helper
+from apps.templates.services.template_cache import TemplateCache
+from infrastructure.renderers.render_client import RendererClient
+
+logger = logging.getLogger(__name__)
+
+
+def _html_may_have_changed(update_fields) -> bool:
+    """Сохранение без html в update_fields не меняет HTML."""
+    return update_fields is None or 'html' in update_fields
+
+
+@receiver(post_save, sender=Template)
+@receiver(post_delete, sender=Template)
+def invalidate_template_compiled_cache(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает скомпилированные страницы шаблона при изменении Template.html."""
+    if _html_may_have_changed(update_fields):
+        removed = template_renderer.invalidate_cache(template_id=instance.id)
+        if removed:
+            logger.debug(f"Invalidated {removed} compiled templates for template {instance.id}")
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+def invalidate_page_compiled_cache(sender, instance, update_fields=None, **kwargs):
+    """Сбрасывает скомпилированную страницу при изменении Page.html."""
+    if _html_may_have_changed(update_fields):
+        removed = template_renderer.invalidate_cache(page_id=instance.id)
+        if removed:
+            logger.debug(f"Invalidated {removed} compiled templates for page {instance.id}")
+
+
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+def invalidate_asset_map(sender, instance, **kwargs):
+    """Сбрасывает карту ассетов шаблона при загрузке, изменении или удалении ассета."""
+    asset_helper.invalidate_asset_map(instance.template_id)
+
+
+@receiver(post_save, sender=Template)
+@receiver(post_delete, sender=Template)
+def invalidate_template_cache(sender, instance, **kwargs):
+    """Сбрасывает кешированные представления шаблона (структура, поля, схема полей)."""
+    TemplateCache.invalidate_template_cache(instance.id)
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=Field)
+@receiver(post_delete, sender=Field)
+@receiver(post_save, sender=Asset)
+@receiver(post_delete, sender=Asset)
+def invalidate_template_cache_by_part(sender, instance, **kwargs):
+    """Сбрасывает кешированные представления шаблона при изменении его страницы, поля или ассета."""
+    TemplateCache.invalidate_template_cache(instance.template_id)
+
+
+@receiver(post_save, sender=FieldChoice)
+@receiver(post_delete, sender=FieldChoice)
+def invalidate_template_cache_by_choice(sender, instance, **kwargs):
+    """Сбрасывает кешированные представления шаблона при изменении варианта выбора."""
+    template_id = Field.all_objects.filter(id=instance.field_id).values_list('template_id', flat=True).first()
+    if template_id:
+        TemplateCache.invalidate_template_cache(template_id)
+
+
+@receiver(post_save, sender=Format)
+@receiver(post_delete, sender=Format)
+def invalidate_renderer_url(sender, instance, **kwargs):
+    """Сбрасывает закешированные URL рендерера при изменении формата."""
+    RendererClient.invalidate_renderer_url(instance.name)
+
+
+@receiver(post_save, sender=RendererEndpoint)
+@receiver(post_delete, sender=RendererEndpoint)
+def invalidate_renderer_endpoints(sender, instance, **kwargs):
+    """Сбрасывает закешированные URL рендерера при изменении экземпляров формата."""
+    RendererClient.invalidate_renderer_url(instance.format.name)
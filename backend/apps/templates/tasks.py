@@ -2,12 +2,24 @@ from celery import shared_task
 from django.db import transaction
 from apps.templates.models import Template
 from apps.templates.services.template_render_service import TemplateRenderService
+from apps.generation.tasks.progress import ws_publisher
 
 @shared_task(bind=True)
-def render_template_task(self, template_id):
+def render_template_task(self, template_id, group_name=None):
     """
     Задача для асинхронного рендеринга шаблона.
+
+    Прогресс отправляется в группу WebSocket group_name, а не в result backend.
     """
+    def send_progress(progress, status, wait=False):
+        if group_name:
+            ws_publisher.publish(
+                group_name,
+                'render_progress',
+                TemplateRenderService.progress_event(self.request.id, progress, status),
+                wait=wait
+            )
+
     try:
         # Получаем шаблон
         template = Template.objects.select_related(
@@ -23,35 +35,17 @@ def render_template_task(self, template_id):
         renderer = TemplateRenderService()
 
         # Обновляем прогресс
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'progress': 0,
-                'status': 'initializing'
-            }
-        )
+        send_progress(0, 'initializing')
 
         # Рендерим шаблон
         result = renderer.render(template)
 
-        # Обновляем прогресс
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'progress': 100,
-                'status': 'completed'
-            }
-        )
+        # Итоговое событие отправляем до завершения задачи
+        send_progress(100, 'completed', wait=True)
 
         return result
 
     except Exception as e:
         # Обновляем прогресс с ошибкой
-        self.update_state(
-            state='FAILURE',
-            meta={
-                'progress': 0,
-                'status': f'error: {str(e)}'
-            }
-        )
-        raise 
\ No newline at end of file
+        send_progress(0, f'error: {str(e)}', wait=True)
+        raise
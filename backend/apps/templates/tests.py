@@ -0,0 +1,211 @@
+"""
+Тесты сервисов шаблонов.
+
+Не используют БД, запускаются через manage.py test apps.templates.tests.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.templates.services.templating import TemplateRenderer
+from apps.templates.services.template_render_service import TemplateRenderService
+
+
+class TemplateRendererConcurrencyTest(SimpleTestCase):
+    """Параллельный рендеринг одного шаблона через общий кеш скомпилированных шаблонов."""
+
+    THREADS = 16
+    ITERATIONS = 200
+
+    HTML = (
+        '<p>{{ name }}</p>'
+        '{% if vip %}<b>VIP {{ number }}</b>{% else %}<i>{{ number }}</i>{% endif %}'
+        '<img src="{{ asset(\'logo\') }}">'
+    )
+
+    def setUp(self):
+        self.renderer = TemplateRenderer()
+
+    @staticmethod
+    def expected(data, logo_url):
+        badge = f"<b>VIP {data['number']}</b>" if data['vip'] else f"<i>{data['number']}</i>"
+        return f"<p>{data['name']}</p>{badge}<img src=\"{logo_url}\">"
+
+    def test_parallel_renders_see_only_own_data(self):
+        """Каждый поток получает HTML со своими данными и своей картой ассетов."""
+        barrier = threading.Barrier(self.THREADS)
+
+        def worker(thread_index):
+            logo_url = f"https://assets.example/{thread_index}.png"
+            asset_map = {'global': {'logo': logo_url}, 'pages': {}}
+            barrier.wait()
+
+            mismatches = []
+            for iteration in range(self.ITERATIONS):
+                data = {
+                    'name': f"user-{thread_index}-{iteration}",
+                    'number': thread_index * self.ITERATIONS + iteration,
+                    'vip': iteration % 2 == 0,
+                }
+                html = self.renderer.render_template(
+                    self.HTML, data,
+                    template_id='template-1', page_id='page-1', asset_map=asset_map
+                )
+                if html != self.expected(data, logo_url):
+                    mismatches.append((data, html))
+            return mismatches
+
+        with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+            results = list(executor.map(worker, range(self.THREADS)))
+
+        for thread_index, mismatches in enumerate(results):
+            self.assertEqual(mismatches, [], f"Thread {thread_index} got foreign output")
+
+        # Все потоки рендерили одну запись кеша
+        stats = self.renderer.cache_stats()
+        self.assertEqual(stats['size'], 1)
+        self.assertEqual(stats['hits'] + stats['misses'], self.THREADS * self.ITERATIONS)
+
+    def test_invalidation_during_parallel_renders(self):
+        """Инвалидация кеша во время рендеринга не ломает результаты потоков."""
+        stop = threading.Event()
+
+        def invalidator():
+            while not stop.is_set():
+                self.renderer.invalidate_cache(template_id='template-1')
+
+        def worker(thread_index):
+            asset_map = {'global': {'logo': f"/{thread_index}.png"}, 'pages': {}}
+            for iteration in range(self.ITERATIONS // 4):
+                data = {'name': f"{thread_index}:{iteration}", 'number': iteration, 'vip': False}
+                html = self.renderer.render_template(
+                    self.HTML, data, template_id='template-1', asset_map=asset_map
+                )
+                if html != self.expected(data, f"/{thread_index}.png"):
+                    return False
+            return True
+
+        thread = threading.Thread(target=invalidator)
+        thread.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+                results = list(executor.map(worker, range(self.THREADS)))
+        finally:
+            stop.set()
+            thread.join()
+
+        self.assertTrue(all(results))
+
+
+class TemplateRenderWatchTest(SimpleTestCase):
+    """Ожидание рендеринга шаблона: число обращений к result backend ограничено backoff."""
+
+    RENDER_DURATION = 0.6
+
+    def setUp(self):
+        self.channel_layer = mock.Mock()
+        self.channel_layer.group_send = mock.AsyncMock()
+        patcher = mock.patch(
+            'apps.templates.services.template_render_service.get_channel_layer',
+            return_value=self.channel_layer
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.service = TemplateRenderService()
+        # Укороченное расписание с тем же удвоением задержки
+        self.service.POLL_INITIAL_DELAY = 0.02
+        self.service.POLL_MAX_DELAY = 0.16
+        self.service.WATCH_TIMEOUT = 5
+
+    def max_backend_reads(self, duration):
+        """Сколько проверок успеет сделать watch_render за duration по расписанию backoff."""
+        reads, elapsed, delay = 0, 0.0, self.service.POLL_INITIAL_DELAY
+        while elapsed < duration:
+            elapsed += delay
+            reads += 1
+            delay = min(delay * 2, self.service.POLL_MAX_DELAY)
+        return reads
+
+    def patch_async_result(self, finished_at):
+        """AsyncResult, состояние которого становится SUCCESS в момент finished_at."""
+        reads = []
+
+        def state(_):
+            reads.append(time.monotonic())
+            return 'SUCCESS' if time.monotonic() >= finished_at else 'PENDING'
+
+        result_class = mock.Mock()
+        type(result_class.return_value).state = property(state)
+        patcher = mock.patch('apps.templates.services.template_render_service.AsyncResult', result_class)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return reads
+
+    def sent_events(self):
+        return [call.args[1]['message'] for call in self.channel_layer.group_send.call_args_list]
+
+    async def test_watch_render_reads_follow_backoff(self):
+        reads = self.patch_async_result(time.monotonic() + self.RENDER_DURATION)
+
+        cpu_started = time.process_time()
+        await self.service.watch_render('task-1', 'template_group')
+        cpu_used = time.process_time() - cpu_started
+
+        # Задержки не короче расписания, поэтому чтений не больше, чем в нем
+        self.assertGreaterEqual(len(reads), 1)
+        self.assertLessEqual(len(reads), self.max_backend_reads(self.RENDER_DURATION) + 1)
+
+        # Интервалы между чтениями растут до POLL_MAX_DELAY, а не опрашивают в цикле
+        intervals = [later - earlier for earlier, later in zip(reads, reads[1:])]
+        self.assertTrue(all(interval >= self.service.POLL_INITIAL_DELAY * 0.9 for interval in intervals))
+
+        # Ожидание не занимает процессор
+        self.assertLess(cpu_used, self.RENDER_DURATION / 2)
+
+        self.assertEqual(self.sent_events(), [
+            {'task_id': 'task-1', 'progress': 100, 'status': 'completed'}
+        ])
+
+    async def test_render_template_does_not_block_consumer(self):
+        reads = self.patch_async_result(time.monotonic() + self.RENDER_DURATION)
+
+        task = mock.Mock(id='task-2')
+        with mock.patch.object(TemplateRenderService, '_get_template', mock.AsyncMock(return_value=object())), \
+                mock.patch('apps.templates.tasks.render_template_task') as render_task:
+            render_task.delay.return_value = task
+            watcher = await self.service.render_template('template-1', 'template_group')
+
+        # Задача запущена, начальный статус отправлен, ожидание идет в фоне
+        render_task.delay.assert_called_once_with('template-1', 'template_group')
+        self.assertFalse(watcher.done())
+        self.assertEqual(self.sent_events(), [
+            {'task_id': 'task-2', 'progress': 0, 'status': 'started'}
+        ])
+
+        await asyncio.wait_for(watcher, timeout=self.service.WATCH_TIMEOUT)
+
+        self.assertLessEqual(len(reads), self.max_backend_reads(self.RENDER_DURATION) + 1)
+        self.assertEqual(self.sent_events()[-1], {'task_id': 'task-2', 'progress': 100, 'status': 'completed'})
+
+    async def test_failed_render_stops_polling(self):
+        reads = []
+
+        def state(_):
+            reads.append(time.monotonic())
+            return 'FAILURE'
+
+        result_class = mock.Mock()
+        type(result_class.return_value).state = property(state)
+        result_class.return_value.result = 'renderer unavailable'
+        with mock.patch('apps.templates.services.template_render_service.AsyncResult', result_class):
+            await self.service.watch_render('task-3', 'template_group')
+
+        self.assertEqual(len(reads), 1)
+        self.assertEqual(self.sent_events(), [
+            {'task_id': 'task-3', 'progress': 0, 'status': 'error: renderer unavailable'}
+        ])
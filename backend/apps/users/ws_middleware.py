@@ -0,0 +1,47 @@
+"""
+Аутентификация WebSocket соединений.
+
+Браузер не может передать заголовок Authorization при открытии WebSocket,
+поэтому access-токен JWT (как в REST API) передается параметром ?token=.
+Без токена используется сессия Django (AuthMiddlewareStack).
+"""
+import logging
+from urllib.parse import parse_qs
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+
+logger = logging.getLogger(__name__)
+
+
+@database_sync_to_async
+def get_user_from_token(raw_token):
+    """Возвращает пользователя access-токена или AnonymousUser."""
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+    
+    try:
+        token = AccessToken(raw_token)
+        return get_user_model().objects.get(**{api_settings.USER_ID_FIELD: token[api_settings.USER_ID_CLAIM]})
+    except (TokenError, KeyError, get_user_model().DoesNotExist) as e:
+        logger.info(f"WebSocket JWT authentication failed: {e}")
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """Подставляет в scope пользователя из параметра ?token=."""
+    
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode('utf-8'))
+        token = (query.get('token') or [None])[0]
+        if token:
+            scope = dict(scope, user=await get_user_from_token(token))
+        return await super().__call__(scope, receive, send)
+
+
+def JWTAuthMiddlewareStack(inner):
+    """Сессия Django, затем JWT из параметра строки подключения."""
+    return AuthMiddlewareStack(JWTAuthMiddleware(inner))
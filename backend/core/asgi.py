@@ -5,25 +5,27 @@ ASGI конфигурация для Самодизайн проекта.
 """
 import os
 from django.core.asgi import get_asgi_application
-from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
-from django.urls import path
-from apps.templates.consumers import TemplateRenderConsumer
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
-# Получаем стандартный Django ASGI application
+# Получаем стандартный Django ASGI application (до импорта consumers - они используют модели)
 django_asgi_app = get_asgi_application()
 
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from django.urls import path  # noqa: E402
+from apps.generation.routing import websocket_urlpatterns as generation_websocket_urlpatterns  # noqa: E402
+from apps.templates.consumers import TemplateRenderConsumer  # noqa: E402
+from apps.users.ws_middleware import JWTAuthMiddlewareStack  # noqa: E402
+
 # Настраиваем маршрутизацию для разных протоколов
 application = ProtocolTypeRouter({
     # HTTP
     "http": django_asgi_app,
     
-    # WebSocket с поддержкой аутентификации
-    "websocket": AuthMiddlewareStack(
+    # WebSocket с поддержкой аутентификации (сессия или JWT в ?token=)
+    "websocket": JWTAuthMiddlewareStack(
         URLRouter([
             path('ws/templates/<int:template_id>/render/', TemplateRenderConsumer.as_asgi()),
-        ])
+        ] + generation_websocket_urlpatterns)
     ),
-})
\ No newline at end of file
+})
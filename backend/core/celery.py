@@ -3,6 +3,7 @@
 """
 import os
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from django.conf import settings
 from celery.schedules import crontab
 
@@ -27,6 +28,40 @@ app.conf.beat_schedule = {
     },
 }
 
+if settings.RENDERER_HEALTH_INTERVAL:
+    app.conf.beat_schedule['check-renderers'] = {
+        'task': 'apps.generation.tasks.health.check_renderers',
+        'schedule': settings.RENDERER_HEALTH_INTERVAL,
+        'args': (),
+    }
+
+if settings.RENDER_SINGLE_FLIGHT_TTL and settings.RENDER_SINGLE_FLIGHT_REAP_INTERVAL:
+    app.conf.beat_schedule['reap-single-flight-followers'] = {
+        'task': 'apps.generation.tasks.cleanup.reap_single_flight_followers',
+        'schedule': settings.RENDER_SINGLE_FLIGHT_REAP_INTERVAL,
+        'args': (),
+    }
+
+@worker_process_init.connect
+def reset_renderer_sessions(**kwargs):
+    """Дочерний процесс воркера не должен делить сокеты и event loop с родителем."""
+    from infrastructure.renderers.render_client import RendererSessionPool
+    from apps.generation.tasks.async_executor import async_render_executor
+    from apps.generation.tasks.progress import ws_publisher
+    RendererSessionPool.close_all()
+    async_render_executor.reset()
+    ws_publisher.reset()
+
+
+@worker_process_shutdown.connect
+def drain_async_renders(**kwargs):
+    """Дожидается рендеров асинхронного режима и отправки WebSocket-событий перед остановкой процесса."""
+    from apps.generation.tasks.async_executor import async_render_executor
+    from apps.generation.tasks.progress import ws_publisher
+    async_render_executor.drain(timeout=settings.CELERY_TASK_TIME_LIMIT)
+    ws_publisher.drain(timeout=settings.RENDER_PROGRESS_FLUSH_TIMEOUT)
+
+
 @app.task(bind=True)
 def debug_task(self):
     """Диагностическая задача для проверки работоспособности Celery."""
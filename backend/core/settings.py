@@ -118,6 +118,52 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+# Модули задач: пакет tasks не импортирует их сам, а периодические задачи
+# должны быть зарегистрированы в воркере до первого вызова из beat
+CELERY_IMPORTS = (
+    'apps.generation.tasks.render',
+    'apps.generation.tasks.cleanup',
+    'apps.generation.tasks.health',
+)
+
+# Маршрутизация задач по очередям (см. apps/generation/tasks/routing.py)
+CELERY_TASK_ROUTES = ('apps.generation.tasks.routing.route_task',)
+
+# Отдельная очередь рендеринга для каждого формата (render.pdf.interactive и т.д.)
+CELERY_QUEUE_PER_FORMAT = os.environ.get('CELERY_QUEUE_PER_FORMAT', 'True').lower() == 'true'
+
+# Пулы воркеров: очереди и границы автомасштабирования (--autoscale=max,min).
+# Очередь celery остается у maintenance для задач без маршрута
+CELERY_WORKER_POOLS = {
+    'interactive': {
+        'priorities': ['interactive'],
+        'min': int(os.environ.get('CELERY_INTERACTIVE_MIN_CONCURRENCY', '2')),
+        'max': int(os.environ.get('CELERY_INTERACTIVE_MAX_CONCURRENCY', '8')),
+    },
+    'batch': {
+        'priorities': ['batch'],
+        'min': int(os.environ.get('CELERY_BATCH_MIN_CONCURRENCY', '1')),
+        'max': int(os.environ.get('CELERY_BATCH_MAX_CONCURRENCY', '4')),
+    },
+    'maintenance': {
+        'queues': ['maintenance', 'celery'],
+        'min': 1,
+        'max': int(os.environ.get('CELERY_MAINTENANCE_MAX_CONCURRENCY', '1')),
+    },
+}
+
+# Сколько задач в очереди приходится на один процесс воркера при расчете подсказки масштабирования
+CELERY_QUEUE_TARGET_PER_WORKER = int(os.environ.get('CELERY_QUEUE_TARGET_PER_WORKER', '10'))
+
+# Общий кеш для API и воркеров Celery (инвалидация через сигналы должна
+# быть видна во всех процессах)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': f'redis://{REDIS_HOST}:{REDIS_PORT}/3',
+        'KEY_PREFIX': 'samodes',
+    }
+}
 
 # REST Framework
 REST_FRAMEWORK = {
@@ -159,6 +205,9 @@ CHANNEL_LAYERS = {
     },
 }
 
+# Максимум подписок (задач и пакетов) одного мультиплексированного WebSocket
+WS_MAX_SUBSCRIPTIONS = int(os.environ.get('WS_MAX_SUBSCRIPTIONS', '500'))
+
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -182,6 +231,45 @@ USE_TZ = True
 # Asset upload settings
 MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
 
+# Размер LRU-кеша скомпилированных Jinja-шаблонов (на процесс)
+TEMPLATE_COMPILED_CACHE_SIZE = int(os.environ.get('TEMPLATE_COMPILED_CACHE_SIZE', '256'))
+
+# Время жизни кеша карты ассетов шаблона (секунды)
+ASSET_MAP_CACHE_TIMEOUT = int(os.environ.get('ASSET_MAP_CACHE_TIMEOUT', '3600'))
+
+# Лимиты одновременных рендеров (0 - без ограничения). Задачи сверх лимита
+# откладываются и ждут своей очереди, а не отклоняются
+RENDER_QUOTA_PER_USER = int(os.environ.get('RENDER_QUOTA_PER_USER', '20'))
+RENDER_QUOTA_PER_ANON_IP = int(os.environ.get('RENDER_QUOTA_PER_ANON_IP', '5'))
+RENDER_QUOTA_PER_TEMPLATE = int(os.environ.get('RENDER_QUOTA_PER_TEMPLATE', '50'))
+RENDER_QUOTA_RETRY_DELAY = int(os.environ.get('RENDER_QUOTA_RETRY_DELAY', '5'))  # Интервал повторной проверки отложенной задачи
+RENDER_QUOTA_SLOT_TTL = int(os.environ.get('RENDER_QUOTA_SLOT_TTL', '1800'))  # Слот не освобожденной задачи истекает
+
+# Redis для координации задач рендеринга (квоты, объединение одинаковых рендеров)
+RENDER_COORDINATION_REDIS_URL = os.environ.get('RENDER_COORDINATION_REDIS_URL', f'redis://{REDIS_HOST}:{REDIS_PORT}/4')
+
+# Время, в течение которого готовый документ переиспользуется для идентичных запросов (секунды, 0 - отключено)
+RENDER_DEDUP_TTL = int(os.environ.get('RENDER_DEDUP_TTL', '86400'))
+
+# Одинаковые задачи, пришедшие во время рендеринга, ждут его результата вместо повторного
+# рендеринга. Время ожидания ведущей задачи (секунды, 0 - отключено)
+RENDER_SINGLE_FLIGHT_TTL = int(os.environ.get('RENDER_SINGLE_FLIGHT_TTL', '1800'))
+
+# Как часто проверять присоединившиеся задачи, которые ведущая не завершила (секунды, 0 - отключено)
+RENDER_SINGLE_FLIGHT_REAP_INTERVAL = int(os.environ.get('RENDER_SINGLE_FLIGHT_REAP_INTERVAL', '60'))
+
+# Шаблонизация документа в воркере Celery: API только создает задачу
+GENERATION_ASYNC_TEMPLATING = os.environ.get('GENERATION_ASYNC_TEMPLATING', 'True').lower() == 'true'
+
+# Максимальное количество документов в одном пакете генерации
+GENERATION_BATCH_MAX_ROWS = int(os.environ.get('GENERATION_BATCH_MAX_ROWS', '5000'))
+
+# HTML больше этого размера передается воркеру через Redis, а не аргументом задачи (байты, 0 - всегда)
+RENDER_HTML_INLINE_MAX_BYTES = int(os.environ.get('RENDER_HTML_INLINE_MAX_BYTES', str(256 * 1024)))
+
+# Время жизни HTML задачи в Redis (секунды)
+RENDER_HTML_BLOB_TIMEOUT = int(os.environ.get('RENDER_HTML_BLOB_TIMEOUT', '3600'))
+
 # Frontend URL для сброса пароля
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:5173')
 
@@ -251,6 +339,47 @@ MINIO_PUBLIC_URL = f"http://localhost/{MINIO_BUCKET_TEMPLATES}"
 # В продакшене будет домен, в разработке - localhost через nginx
 MINIO_PUBLIC_BASE_URL = os.environ.get('MINIO_PUBLIC_BASE_URL', 'http://localhost')
 
+# Подписанный URL переиспользуется из кеша, пока до истечения его срока
+# остается больше этого запаса (секунды)
+PRESIGNED_URL_SAFETY_MARGIN = int(os.environ.get('PRESIGNED_URL_SAFETY_MARGIN', '3600'))
+
+# Асинхронный режим рендеринга: процесс воркера держит несколько рендеров одновременно
+RENDER_ASYNC_MODE = os.environ.get('RENDER_ASYNC_MODE', 'False').lower() == 'true'
+RENDER_ASYNC_CONCURRENCY = int(os.environ.get('RENDER_ASYNC_CONCURRENCY', '16'))
+
+# Промежуточный прогресс задачи пишется в БД и WebSocket не чаще этого интервала (мс);
+# события о завершении задачи ждут отправки не дольше FLUSH_TIMEOUT секунд
+RENDER_PROGRESS_INTERVAL_MS = int(os.environ.get('RENDER_PROGRESS_INTERVAL_MS', '500'))
+RENDER_PROGRESS_FLUSH_TIMEOUT = int(os.environ.get('RENDER_PROGRESS_FLUSH_TIMEOUT', '5'))
+
+# HTTP-клиент микросервисов рендеринга
+RENDERER_POOL_SIZE = int(os.environ.get('RENDERER_POOL_SIZE', '10'))
+RENDERER_CONNECT_TIMEOUT = float(os.environ.get('RENDERER_CONNECT_TIMEOUT', '5'))
+RENDERER_READ_TIMEOUT = float(os.environ.get('RENDERER_READ_TIMEOUT', '180'))  # Соответствует таймауту Celery
+RENDERER_MAX_RETRIES = int(os.environ.get('RENDERER_MAX_RETRIES', '3'))
+RENDERER_RETRY_BACKOFF = float(os.environ.get('RENDERER_RETRY_BACKOFF', '0.5'))
+RENDERER_URL_CACHE_TIMEOUT = int(os.environ.get('RENDERER_URL_CACHE_TIMEOUT', '3600'))
+
+# Балансировка между экземплярами рендерера: после RENDERER_CIRCUIT_FAILURES ошибок
+# подряд экземпляр исключается на RENDERER_CIRCUIT_RESET секунд
+RENDERER_CIRCUIT_FAILURES = int(os.environ.get('RENDERER_CIRCUIT_FAILURES', '5'))
+RENDERER_CIRCUIT_RESET = int(os.environ.get('RENDERER_CIRCUIT_RESET', '30'))
+RENDERER_HEALTH_TIMEOUT = float(os.environ.get('RENDERER_HEALTH_TIMEOUT', '5'))
+RENDERER_HEALTH_INTERVAL = int(os.environ.get('RENDERER_HEALTH_INTERVAL', '30'))  # 0 - без периодических проверок
+RENDERER_STATS_TTL = int(os.environ.get('RENDERER_STATS_TTL', '86400'))  # Окно статистики экземпляров
+
+# Размер части multipart-загрузки в MinIO (не меньше 5 МБ)
+MINIO_PART_SIZE = int(os.environ.get('MINIO_PART_SIZE', str(8 * 1024 * 1024)))
+
+# Файлы от этого размера загружаются multipart-загрузкой параллельно
+MINIO_MULTIPART_THRESHOLD = int(os.environ.get('MINIO_MULTIPART_THRESHOLD', str(16 * 1024 * 1024)))
+MINIO_UPLOAD_WORKERS = int(os.environ.get('MINIO_UPLOAD_WORKERS', '4'))
+MINIO_PART_RETRIES = int(os.environ.get('MINIO_PART_RETRIES', '3'))
+MINIO_RETRY_BACKOFF = float(os.environ.get('MINIO_RETRY_BACKOFF', '0.5'))
+
+# Потоковая передача документа от рендерера в MinIO без буферизации целиком
+RENDER_STREAM_UPLOADS = os.environ.get('RENDER_STREAM_UPLOADS', 'True').lower() == 'true'
+
 # Для совместимости с существующим кодом
 CEPH_ENDPOINT_URL = MINIO_ENDPOINT_URL
 CEPH_ACCESS_KEY = MINIO_ACCESS_KEY
@@ -31,6 +31,7 @@ api_v1_urls = [
     path('templates/', include('apps.templates.api.template_urls')),
     path('tasks/', include('apps.generation.api.tasks_urls')),
     path('documents/', include('apps.generation.api.document_urls')),
+    path('batches/', include('apps.generation.api.batch_urls')),
     
     # Служебные эндпоинты
     path('health/', include('apps.common.api.health_urls')),
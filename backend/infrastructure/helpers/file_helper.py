@@ -2,12 +2,15 @@
 Хелпер для работы с файлами.
 """
 import logging
-from typing import BinaryIO, Optional, Union, Tuple
+import threading
+import time
+from typing import BinaryIO, Optional, Union, Tuple, Dict, Any
 from pathlib import Path
 from io import BytesIO
 from datetime import timedelta
 from urllib.parse import urlparse, urlunparse
 from django.conf import settings
+from django.core.cache import cache
 
 from infrastructure.helpers.base_helper import BaseHelper
 from infrastructure.minio_client import minio_client
@@ -15,6 +18,82 @@ from infrastructure.minio_client import minio_client
 logger = logging.getLogger(__name__)
 
 
+class PresignedUrlCache:
+    """
+    Кеш подписанных URL в общем кеше Django.
+    
+    Ссылка переиспользуется, пока до истечения ее срока действия остается
+    больше запаса PRESIGNED_URL_SAFETY_MARGIN. Запись удаляется из кеша
+    автоматически в момент, когда остаток срока становится меньше запаса.
+    """
+    
+    _lock = threading.Lock()
+    _hits = 0
+    _misses = 0
+    
+    @classmethod
+    def safety_margin(cls, expires: timedelta) -> int:
+        """Запас в секундах; не больше половины срока действия ссылки."""
+        margin = getattr(settings, 'PRESIGNED_URL_SAFETY_MARGIN', 3600)
+        return int(min(margin, expires.total_seconds() / 2))
+    
+    @staticmethod
+    def make_key(bucket: str, object_name: str, expires: timedelta) -> str:
+        return f"presigned_url:{bucket}:{object_name}:{int(expires.total_seconds())}"
+    
+    @classmethod
+    def get(cls, bucket: str, object_name: str, expires: timedelta) -> Optional[str]:
+        """Возвращает закешированный URL, если он еще достаточно долго действителен."""
+        try:
+            entry = cache.get(cls.make_key(bucket, object_name, expires))
+        except Exception as e:
+            logger.warning(f"Presigned URL cache unavailable: {e}")
+            entry = None
+        
+        if entry and entry['expires_at'] - time.time() > cls.safety_margin(expires):
+            cls._record(hit=True)
+            return entry['url']
+        
+        cls._record(hit=False)
+        return None
+    
+    @classmethod
+    def set(cls, bucket: str, object_name: str, expires: timedelta, url: str, signed_at: float):
+        """Сохраняет URL до момента, когда остаток срока станет меньше запаса."""
+        expires_at = signed_at + expires.total_seconds()
+        timeout = int(expires_at - time.time()) - cls.safety_margin(expires)
+        if timeout <= 0:
+            return
+        
+        try:
+            cache.set(
+                cls.make_key(bucket, object_name, expires),
+                {'url': url, 'expires_at': expires_at},
+                timeout
+            )
+        except Exception as e:
+            logger.warning(f"Presigned URL cache unavailable: {e}")
+    
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        """Статистика попаданий в кеш текущего процесса."""
+        with cls._lock:
+            total = cls._hits + cls._misses
+            return {
+                'hits': cls._hits,
+                'misses': cls._misses,
+                'hit_rate': round(cls._hits / total, 4) if total else 0.0,
+            }
+    
+    @classmethod
+    def _record(cls, hit: bool):
+        with cls._lock:
+            if hit:
+                cls._hits += 1
+            else:
+                cls._misses += 1
+
+
 class FileHelper(BaseHelper):
     """
     Базовый класс для хелперов, работающих с файлами.
@@ -24,7 +103,11 @@ class FileHelper(BaseHelper):
     
     @classmethod
     def get_presigned_url(cls, file_path: str, bucket_type: str, expires: timedelta = timedelta(hours=24)) -> str:
-        """Генерирует подписанный URL для объекта в хранилище."""
+        """
+        Генерирует подписанный URL для объекта в хранилище.
+        
+        Готовые URL кешируются по bucket и имени объекта (см. PresignedUrlCache).
+        """
         if not file_path:
             return ""
         
@@ -60,6 +143,13 @@ class FileHelper(BaseHelper):
             # DEBUG: добавляем логирование
             logger.debug(f"get_presigned_url: path={path}, object_name={object_name}")
             
+            # Переиспользуем ранее подписанный URL, если он еще действителен
+            cached_url = PresignedUrlCache.get(bucket, object_name, expires)
+            if cached_url:
+                return cached_url
+            
+            signed_at = time.time()
+            
             # Генерируем подписанный URL для MinIO
             presigned_url = minio_client.client.presigned_get_object(
                 bucket_name=bucket,
@@ -84,10 +174,12 @@ class FileHelper(BaseHelper):
                 url_parts[2] = path
                 public_url = urlunparse(url_parts)
             
+            PresignedUrlCache.set(bucket, object_name, expires, public_url, signed_at)
+            
             return public_url
             
         except Exception as e:
-            cls.log_error(f"Ошибка генерации presigned URL: {e}", exc_info=True)
+            cls.log_error("Ошибка генерации presigned URL", e)
             return file_path
     
     @classmethod
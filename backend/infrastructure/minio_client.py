@@ -1,13 +1,18 @@
 """
 MinIO клиент для работы с файловым хранилищем.
 """
+import io
 import os
+import time
 import uuid
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from pathlib import Path
-from typing import BinaryIO, Dict, Optional, Tuple, Union
+from typing import BinaryIO, Dict, Iterable, Optional, Tuple, Union
 from django.conf import settings
 from minio import Minio
+from minio.datatypes import Part
 from minio.error import S3Error
 from datetime import timedelta
 
@@ -19,6 +24,47 @@ class MinioClientError(Exception):
     pass
 
 
+class ChecksumReader:
+    """
+    Файлоподобная обертка над потоком чанков.
+    
+    Отдает данные через read() по мере поступления и считает размер
+    и SHA-256 на лету, не накапливая весь файл в памяти.
+    """
+    
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._buffer = bytearray()
+        self._sha256 = hashlib.sha256()
+        self._eof = False
+        self.size = 0
+    
+    def read(self, size: int = -1) -> bytes:
+        while not self._eof and (size < 0 or len(self._buffer) < size):
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self._eof = True
+                break
+            if chunk:
+                self._buffer.extend(chunk)
+        
+        if size < 0 or size > len(self._buffer):
+            size = len(self._buffer)
+        
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        
+        self.size += len(data)
+        self._sha256.update(data)
+        return data
+    
+    @property
+    def checksum(self) -> str:
+        """SHA-256 прочитанных данных."""
+        return self._sha256.hexdigest()
+
+
 class MinioClient:
     """Клиент для работы с MinIO хранилищем."""
     
@@ -92,8 +138,10 @@ class MinioClient:
                 file_obj.seek(0)
             
             # Определяем размер файла
-            if hasattr(file_obj, 'getvalue'):
-                length = len(file_obj.getvalue())
+            if hasattr(file_obj, 'getbuffer'):
+                # memoryview без копирования содержимого BytesIO
+                with file_obj.getbuffer() as buffer:
+                    length = buffer.nbytes
             elif hasattr(file_obj, 'size'):
                 length = file_obj.size
             else:
@@ -103,32 +151,182 @@ class MinioClient:
                 length = file_obj.tell()
                 file_obj.seek(current_pos)  # Return to original position
             
-            # Загружаем файл в MinIO
+            # Загружаем файл в MinIO; большие файлы - параллельной multipart-загрузкой
             try:
-                self.client.put_object(
-                    Bucket=bucket,
-                    Key=object_name,
-                    Data=file_obj,
-                    Length=length,
-                    ContentType=content_type
-                )
+                if length >= settings.MINIO_MULTIPART_THRESHOLD:
+                    self._multipart_upload(bucket, object_name, file_obj, content_type)
+                else:
+                    self.client.put_object(
+                        bucket,
+                        object_name,
+                        file_obj,
+                        length,
+                        content_type=content_type or 'application/octet-stream'
+                    )
                 logger.info(f"Файл {filename} успешно загружен в {bucket}/{object_name}")
             except S3Error as e:
                 logger.error(f"Ошибка загрузки файла в MinIO: {e}")
                 raise
             
             # Формируем URL объекта
-            if bucket_type == 'documents':
-                object_url = f"generated-documents/{object_name}"
-            else:
-                object_url = f"{bucket_type}-assets/{object_name}"
-            
-            return object_name, object_url
+            return object_name, self._object_url(bucket_type, object_name)
             
         except S3Error as e:
             logger.error(f"Error uploading to MinIO: {e}")
             raise MinioClientError(f"Failed to upload file: {str(e)}")
     
+    def upload_stream(
+        self,
+        stream: BinaryIO,
+        folder: str = '',
+        filename: Optional[str] = None,
+        content_type: Optional[str] = None,
+        bucket_type: str = 'documents',
+        part_size: Optional[int] = None
+    ) -> Tuple[str, str]:
+        """
+        Загружает поток неизвестной длины в MinIO.
+        
+        Данные читаются частями по part_size и отправляются параллельной
+        multipart-загрузкой, поэтому в памяти одновременно находится не больше
+        MINIO_UPLOAD_WORKERS + 1 частей. Объекты меньше одной части
+        загружаются одним запросом.
+        
+        Args:
+            stream: Объект с методом read() (например, ChecksumReader)
+            folder: Папка для сохранения
+            filename: Имя файла (если None, будет сгенерировано)
+            content_type: MIME тип
+            bucket_type: 'templates' или 'documents'
+            part_size: Размер части (по умолчанию MINIO_PART_SIZE)
+            
+        Returns:
+            Tuple[str, str]: (object_name, public_url)
+        """
+        if filename is None:
+            filename = f"{uuid.uuid4()}"
+        
+        bucket = self.templates_bucket if bucket_type == 'templates' else self.documents_bucket
+        object_name = f"{folder}/{filename}" if folder else filename
+        
+        try:
+            self._multipart_upload(bucket, object_name, stream, content_type, part_size)
+            logger.info(f"Поток {filename} загружен в {bucket}/{object_name}")
+            
+            return object_name, self._object_url(bucket_type, object_name)
+            
+        except S3Error as e:
+            logger.error(f"Error streaming upload to MinIO: {e}")
+            raise MinioClientError(f"Failed to upload stream: {str(e)}")
+    
+    def _multipart_upload(
+        self,
+        bucket: str,
+        object_name: str,
+        stream: BinaryIO,
+        content_type: Optional[str] = None,
+        part_size: Optional[int] = None
+    ):
+        """
+        Загружает поток частями параллельно из пула потоков.
+        
+        Части читаются последовательно, а отправляются параллельно; число
+        частей в полете ограничено MINIO_UPLOAD_WORKERS. Каждая часть
+        повторяется отдельно, при неудаче загрузка отменяется целиком,
+        чтобы в bucket не оставались незавершенные части.
+        """
+        part_size = part_size or settings.MINIO_PART_SIZE
+        workers = max(1, settings.MINIO_UPLOAD_WORKERS)
+        content_type = content_type or 'application/octet-stream'
+        
+        data = self._read_part(stream, part_size)
+        if len(data) < part_size:
+            # Объект помещается в одну часть
+            self.client.put_object(bucket, object_name, io.BytesIO(data), len(data), content_type=content_type)
+            return
+        
+        upload_id = self.client._create_multipart_upload(
+            bucket, object_name, {'Content-Type': content_type}
+        )
+        
+        try:
+            etags = {}
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='minio-upload') as executor:
+                in_flight = set()
+                part_number = 1
+                
+                while data:
+                    if len(in_flight) >= workers:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            number, etag = future.result()
+                            etags[number] = etag
+                    
+                    in_flight.add(executor.submit(
+                        self._upload_part_with_retry, bucket, object_name, upload_id, part_number, data
+                    ))
+                    part_number += 1
+                    data = self._read_part(stream, part_size)
+                
+                for future in in_flight:
+                    number, etag = future.result()
+                    etags[number] = etag
+            
+            parts = [Part(number, etags[number]) for number in sorted(etags)]
+            self.client._complete_multipart_upload(bucket, object_name, upload_id, parts)
+            logger.debug(f"Multipart upload of {bucket}/{object_name} completed: {len(parts)} parts")
+            
+        except Exception:
+            try:
+                self.client._abort_multipart_upload(bucket, object_name, upload_id)
+            except Exception as e:
+                logger.warning(f"Error aborting multipart upload {upload_id}: {e}")
+            raise
+    
+    def _upload_part_with_retry(
+        self,
+        bucket: str,
+        object_name: str,
+        upload_id: str,
+        part_number: int,
+        data: bytes
+    ) -> Tuple[int, str]:
+        """Загружает одну часть, повторяя ее с экспоненциальной задержкой."""
+        attempts = settings.MINIO_PART_RETRIES + 1
+        
+        for attempt in range(1, attempts + 1):
+            try:
+                etag = self.client._upload_part(bucket, object_name, data, None, upload_id, part_number)
+                return part_number, etag
+            except Exception as e:
+                if attempt == attempts:
+                    logger.error(f"Part {part_number} of {object_name} failed after {attempts} attempts: {e}")
+                    raise
+                
+                delay = settings.MINIO_RETRY_BACKOFF * 2 ** (attempt - 1)
+                logger.warning(f"Retrying part {part_number} of {object_name} in {delay}s: {e}")
+                time.sleep(delay)
+    
+    @staticmethod
+    def _read_part(stream: BinaryIO, part_size: int) -> bytes:
+        """Читает из потока ровно part_size байт или остаток до конца."""
+        chunks = []
+        remaining = part_size
+        while remaining > 0:
+            chunk = stream.read(remaining)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(chunks)
+    
+    @staticmethod
+    def _object_url(bucket_type: str, object_name: str) -> str:
+        """Формирует URL объекта для хранения в БД."""
+        if bucket_type == 'documents':
+            return f"generated-documents/{object_name}"
+        return f"{bucket_type}-assets/{object_name}"
+    
     def download_file(self, object_name: str, bucket_type: str = 'templates') -> bytes:
         """
         Загружает файл из MinIO.
@@ -0,0 +1,192 @@
+"""
+Балансировка запросов между экземплярами микросервисов рендеринга.
+
+Состояние балансировщика хранится в Redis (кеш Django) и общее для всех
+процессов воркеров и API:
+- число запросов в работе на каждом экземпляре (least-outstanding-requests);
+- circuit breaker: после RENDERER_CIRCUIT_FAILURES ошибок подряд экземпляр
+  исключается из балансировки на RENDERER_CIRCUIT_RESET секунд, затем
+  получает пробный запрос;
+- статистика запросов, ошибок и задержки по каждому экземпляру.
+"""
+import hashlib
+import logging
+import random
+import time
+from typing import Any, Dict, Iterable, List, Optional
+import requests
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+class RendererLease:
+    """Запрос, занявший экземпляр рендерера. Освобождается ровно один раз."""
+
+    def __init__(self, balancer: 'RendererBalancer', url: str):
+        self.balancer = balancer
+        self.url = url
+        self.started = time.monotonic()
+        self.released = False
+
+    def release(self, ok: bool, trip: bool = True, error: Optional[str] = None):
+        """
+        Освобождает экземпляр и записывает результат запроса.
+
+        Args:
+            ok: Запрос выполнен успешно
+            trip: Ошибка говорит о неисправности экземпляра (учитывается circuit breaker)
+            error: Текст ошибки для статистики
+        """
+        if self.released:
+            return
+        self.released = True
+        self.balancer.record(self.url, ok, trip, time.monotonic() - self.started, error)
+
+
+class RendererBalancer:
+    """Выбор экземпляра рендерера, circuit breaker и статистика."""
+
+    def acquire(self, urls: List[str], exclude: Iterable[str] = ()) -> RendererLease:
+        """
+        Выбирает экземпляр с наименьшим числом запросов в работе.
+
+        Экземпляры с открытым circuit breaker пропускаются; если открыты все,
+        запрос все равно отправляется - отказ без попытки хуже пробного запроса.
+
+        Args:
+            urls: URL экземпляров формата
+            exclude: URL, уже не ответившие в рамках этого запроса
+        """
+        candidates = [url for url in urls if url not in exclude] or list(urls)
+
+        if len(candidates) == 1:
+            url = candidates[0]
+        else:
+            state = self._get_many(
+                [self._key('outstanding', url) for url in candidates]
+                + [self._key('open', url) for url in candidates]
+            )
+            closed = [url for url in candidates if not state.get(self._key('open', url))]
+            pool = closed or candidates
+
+            # Перемешиваем, чтобы равные по нагрузке экземпляры выбирались поровну
+            random.shuffle(pool)
+            url = min(pool, key=lambda url: state.get(self._key('outstanding', url)) or 0)
+
+        try:
+            self._incr(self._key('outstanding', url), 1, self._outstanding_timeout())
+        except Exception as e:
+            logger.warning(f"Failed to track outstanding request for {url}: {e}")
+        return RendererLease(self, url)
+
+    def record(self, url: str, ok: bool, trip: bool, elapsed: float, error: Optional[str] = None):
+        """Записывает результат запроса к экземпляру."""
+        try:
+            self._incr(self._key('outstanding', url), -1, self._outstanding_timeout())
+            self._incr(self._key('requests', url), 1, settings.RENDERER_STATS_TTL)
+            self._incr(self._key('latency_ms', url), int(elapsed * 1000), settings.RENDERER_STATS_TTL)
+
+            if ok:
+                cache.delete(self._key('failures', url))
+                return
+
+            self._incr(self._key('errors', url), 1, settings.RENDERER_STATS_TTL)
+            if error:
+                cache.set(self._key('last_error', url), error[:500], settings.RENDERER_STATS_TTL)
+
+            if trip:
+                failures = self._incr(self._key('failures', url), 1, settings.RENDERER_STATS_TTL)
+                if failures >= settings.RENDERER_CIRCUIT_FAILURES:
+                    self.open_circuit(url, f"{failures} consecutive failures")
+        except Exception as e:
+            # Сбой Redis не должен влиять на результат рендеринга
+            logger.warning(f"Failed to record renderer stats for {url}: {e}")
+
+    def open_circuit(self, url: str, reason: str):
+        """Исключает экземпляр из балансировки на RENDERER_CIRCUIT_RESET секунд."""
+        if cache.add(self._key('open', url), reason, settings.RENDERER_CIRCUIT_RESET):
+            logger.warning(f"Renderer {url} ejected for {settings.RENDERER_CIRCUIT_RESET}s: {reason}")
+
+    def stats(self, urls: List[str]) -> List[Dict[str, Any]]:
+        """Возвращает состояние и статистику экземпляров."""
+        kinds = ('outstanding', 'requests', 'errors', 'latency_ms', 'failures', 'open', 'last_error')
+        state = self._get_many([self._key(kind, url) for url in urls for kind in kinds])
+
+        result = []
+        for url in urls:
+            value = {kind: state.get(self._key(kind, url)) for kind in kinds}
+            requests_count = value['requests'] or 0
+            result.append({
+                'url': url,
+                'circuit': 'open' if value['open'] else 'closed',
+                'outstanding': max(value['outstanding'] or 0, 0),
+                'requests': requests_count,
+                'errors': value['errors'] or 0,
+                'error_rate': round((value['errors'] or 0) / requests_count, 4) if requests_count else 0,
+                'avg_latency_ms': round((value['latency_ms'] or 0) / requests_count) if requests_count else None,
+                'consecutive_failures': value['failures'] or 0,
+                'last_error': value['last_error'],
+            })
+        return result
+
+    @staticmethod
+    def health_url(url: str) -> str:
+        """
+        Возвращает URL проверки здоровья экземпляра.
+
+        Health endpoint - тот же URL с заменой последнего сегмента на health.
+        """
+        url_parts = url.split('/')
+        url_parts[-1] = 'health'
+        return '/'.join(url_parts)
+
+    def check_health(self, url: str) -> Dict[str, str]:
+        """
+        Проверяет доступность экземпляра; недоступный экземпляр исключается
+        из балансировки, не дожидаясь ошибок рендеринга.
+        """
+        try:
+            response = requests.get(self.health_url(url), timeout=settings.RENDERER_HEALTH_TIMEOUT)
+            status = 'available' if response.ok else 'error'
+            message = response.text if not response.ok else "Сервис доступен"
+        except Exception as e:
+            status = 'unavailable'
+            message = f"Ошибка подключения: {str(e)}"
+
+        if status != 'available':
+            self.open_circuit(url, f"health check: {message[:200]}")
+
+        return {'url': url, 'status': status, 'message': message}
+
+    @staticmethod
+    def _key(kind: str, url: str) -> str:
+        return f"renderer_{kind}_{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}"
+
+    @staticmethod
+    def _outstanding_timeout() -> int:
+        # Счетчик зависшего запроса (убитый воркер) обнуляется не позже двух таймаутов чтения
+        return int(settings.RENDERER_READ_TIMEOUT * 2)
+
+    @staticmethod
+    def _incr(key: str, delta: int, timeout: int) -> int:
+        cache.add(key, 0, timeout)
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            # Ключ истек между add и incr
+            cache.set(key, delta, timeout)
+            return delta
+
+    @staticmethod
+    def _get_many(keys: List[str]) -> Dict[str, Any]:
+        try:
+            return cache.get_many(keys)
+        except Exception as e:
+            logger.warning(f"Failed to read renderer balancer state: {e}")
+            return {}
+
+
+# Создаем экземпляр для использования клиентами рендеринга
+renderer_balancer = RendererBalancer()
@@ -3,12 +3,23 @@
 
 Обеспечивает унифицированный интерфейс для различных типов рендеринга (PDF, PNG, SVG).
 """
+import asyncio
 import io
 import json
 import logging
+import threading
+import httpx
 import requests
-from typing import Tuple, Dict, Any, BinaryIO, Union, Optional
+from asgiref.sync import sync_to_async
+from contextlib import contextmanager
+from typing import Tuple, Dict, Any, BinaryIO, Iterator, List, Union, Optional
+from urllib.parse import urlsplit
 from django.conf import settings
+from django.core.cache import cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from infrastructure.renderers.balancer import renderer_balancer, RendererLease
 
 logger = logging.getLogger(__name__)
 
@@ -18,6 +29,86 @@ class RendererError(Exception):
     pass
 
 
+class RendererResponseError(RendererError):
+    """Рендерер ответил статусом ошибки."""
+    
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RendererSessionPool:
+    """
+    Пул HTTP-сессий к микросервисам рендеринга.
+    
+    Одна keep-alive сессия на хост рендерера в пределах процесса, чтобы не
+    открывать новое TCP-соединение на каждый документ. Повторяются только
+    безопасные ошибки: отказ в соединении и ответы 502/503/504 (рендеринг
+    не имеет побочных эффектов). Таймаут чтения не повторяется, чтобы
+    не удваивать время долгого рендеринга.
+    """
+    
+    RETRY_STATUSES = (502, 503, 504)
+    
+    _sessions: Dict[str, requests.Session] = {}
+    _lock = threading.Lock()
+    
+    @classmethod
+    def get_session(cls, url: str) -> requests.Session:
+        """Возвращает сессию для хоста рендерера, создавая ее при первом обращении."""
+        parts = urlsplit(url)
+        host = f"{parts.scheme}://{parts.netloc}"
+        
+        session = cls._sessions.get(host)
+        if session is not None:
+            return session
+        
+        with cls._lock:
+            session = cls._sessions.get(host)
+            if session is None:
+                session = cls._create_session()
+                cls._sessions[host] = session
+                logger.debug(f"Created pooled renderer session for {host}")
+        return session
+    
+    @staticmethod
+    def timeout() -> Tuple[float, float]:
+        """Таймауты (connect, read) для запросов к рендереру."""
+        return settings.RENDERER_CONNECT_TIMEOUT, settings.RENDERER_READ_TIMEOUT
+    
+    @classmethod
+    def close_all(cls):
+        """Закрывает все сессии (например, после fork воркера)."""
+        with cls._lock:
+            for session in cls._sessions.values():
+                session.close()
+            cls._sessions.clear()
+    
+    @classmethod
+    def _create_session(cls) -> requests.Session:
+        retries = settings.RENDERER_MAX_RETRIES
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            status_forcelist=cls.RETRY_STATUSES,
+            allowed_methods=frozenset(['GET', 'POST']),
+            backoff_factor=settings.RENDERER_RETRY_BACKOFF,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.RENDERER_POOL_SIZE,
+            max_retries=retry,
+        )
+        
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+
 class RendererClient:
     """
     Клиент для взаимодействия с микросервисами рендеринга.
@@ -25,26 +116,29 @@ class RendererClient:
     Поддерживает различные форматы: PDF, PNG, SVG.
     """
     
+    # Размер чанка при потоковом чтении ответа рендерера
+    STREAM_CHUNK_SIZE = 64 * 1024
+    
+    # Разделитель страниц в HTML документа; по нему рендерер сопоставляет
+    # страницы с options['pages'] и переключает размер страницы
+    PAGE_SEPARATOR = '<!-- page-break -->'
+    
     def __init__(self, format_type: str, renderer_url: Optional[str] = None):
         """
         Инициализирует клиент для указанного формата.
         
         Args:
             format_type: Тип формата ('pdf', 'png', 'svg')
-            renderer_url: (optional) URL рендерера
+            renderer_url: (optional) URL рендерера; без него запросы
+                распределяются между всеми экземплярами формата
         """
         self.format_type = format_type.lower()
         
-        # Если URL не передан, пытаемся найти формат в БД
-        if renderer_url:
-            self.renderer_url = renderer_url
-        else:
-            from apps.templates.models import Format
-            try:
-                fmt = Format.objects.get(name=format_type)
-                self.renderer_url = fmt.render_url
-            except Format.DoesNotExist:
-                raise ValueError(f"Format '{format_type}' not found in database")
+        # Если URL не передан, берем экземпляры из формата (с кешированием)
+        self.renderer_urls = [renderer_url] if renderer_url else self.get_renderer_urls(format_type)
+        
+        # URL экземпляра, выбранного для последнего запроса
+        self.renderer_url = self.renderer_urls[0]
         
         # Устанавливаем content_type
         if self.format_type == 'pdf':
@@ -56,6 +150,51 @@ class RendererClient:
         
         logger.debug(f"Initialized {self.format_type} renderer client with URL: {self.renderer_url}")
     
+    @staticmethod
+    def get_renderer_urls(format_type: str) -> List[str]:
+        """
+        Возвращает URL всех экземпляров рендерера формата: Format.render_url
+        и активные RendererEndpoint.
+        
+        Значение кешируется и сбрасывается сигналом при сохранении Format
+        или RendererEndpoint.
+        
+        Raises:
+            ValueError: Если формат не найден
+        """
+        cache_key = RendererClient._renderer_url_cache_key(format_type)
+        renderer_urls = cache.get(cache_key)
+        if renderer_urls:
+            return renderer_urls
+        
+        from apps.templates.models import Format, RendererEndpoint
+        try:
+            renderer_urls = [Format.objects.values_list('render_url', flat=True).get(name=format_type)]
+        except Format.DoesNotExist:
+            raise ValueError(f"Format '{format_type}' not found in database")
+        
+        endpoints = RendererEndpoint.objects.filter(
+            format__name=format_type, is_active=True
+        ).values_list('url', flat=True)
+        renderer_urls += [url for url in endpoints if url not in renderer_urls]
+        
+        cache.set(cache_key, renderer_urls, settings.RENDERER_URL_CACHE_TIMEOUT)
+        return renderer_urls
+    
+    @staticmethod
+    def get_renderer_url(format_type: str) -> str:
+        """Возвращает основной URL рендерера формата (Format.render_url)."""
+        return RendererClient.get_renderer_urls(format_type)[0]
+    
+    @staticmethod
+    def invalidate_renderer_url(format_type: str):
+        """Сбрасывает закешированные URL рендерера формата."""
+        cache.delete(RendererClient._renderer_url_cache_key(format_type))
+    
+    @staticmethod
+    def _renderer_url_cache_key(format_type: str) -> str:
+        return f"renderer_urls_{format_type}"
+    
     def render(self, html: str, options: Dict[str, Any]) -> Tuple[BinaryIO, str]:
         """
         Выполняет рендеринг HTML в указанный формат.
@@ -70,65 +209,254 @@ class RendererClient:
         Raises:
             RendererError: В случае ошибки рендеринга
         """
+        response, _ = self._request(html, options, stream=False)
+        
+        # Возвращаем байты документа и content-type
+        return io.BytesIO(response.content), response.headers.get('Content-Type')
+    
+    @contextmanager
+    def render_stream(self, html: str, options: Dict[str, Any]) -> Iterator[Tuple[Iterator[bytes], str]]:
+        """
+        Выполняет рендеринг с потоковым чтением ответа.
+        
+        Документ не загружается в память целиком: вызывающий код читает
+        его чанками, пока открыт контекст. Соединение возвращается в пул
+        при выходе из контекста.
+        
+        Returns:
+            Iterator[Tuple[Iterator[bytes], str]]: (итератор чанков, content_type)
+        
+        Raises:
+            RendererError: В случае ошибки рендеринга
+        """
+        response, lease = self._request(html, options, stream=True)
+        try:
+            yield self._iter_chunks(response, lease), response.headers.get('Content-Type')
+        finally:
+            response.close()
+            lease.release(ok=True)
+    
+    def _iter_chunks(self, response: requests.Response, lease: RendererLease) -> Iterator[bytes]:
         try:
-            # Подготавливаем запрос
-            payload = {
-                'html': html,
-                'options': options
-            }
+            yield from response.iter_content(chunk_size=self.STREAM_CHUNK_SIZE)
+        except requests.RequestException as e:
+            logger.error(f"Renderer stream interrupted for {self.format_type}: {e}")
+            lease.release(ok=False, error=str(e))
+            raise RendererError(f"Failed to read {self.format_type} from renderer: {str(e)}") from e
+    
+    def _request(self, html: str, options: Dict[str, Any], stream: bool) -> Tuple[requests.Response, RendererLease]:
+        """
+        Отправляет HTML наименее загруженному экземпляру рендерера и проверяет ответ.
+        
+        Если экземпляр недоступен, запрос переотправляется на следующий.
+        Для потокового ответа экземпляр остается занятым, пока вызывающий
+        код не освободит lease.
+        
+        Raises:
+            RendererError: В случае ошибки рендеринга
+        """
+        failed_urls = set()
+        while True:
+            lease = renderer_balancer.acquire(self.renderer_urls, exclude=failed_urls)
+            self.renderer_url = lease.url
+            try:
+                response = self._send(html, options, stream)
+            except requests.exceptions.ConnectionError as e:
+                lease.release(ok=False, error=str(e))
+                failed_urls.add(lease.url)
+                if len(failed_urls) < len(self.renderer_urls):
+                    logger.warning(f"Renderer {lease.url} unavailable, failing over: {e}")
+                    continue
+                raise self._connection_error(e)
+            except requests.RequestException as e:
+                # Ошибки 4xx вызваны запросом, а не экземпляром
+                response = getattr(e, 'response', None)
+                trip = response is None or response.status_code >= 500
+                lease.release(ok=False, trip=trip, error=str(e))
+                raise self._request_error(e)
+            except Exception as e:
+                lease.release(ok=False, error=str(e))
+                if isinstance(e, RendererError):
+                    raise
+                # Обрабатываем прочие ошибки
+                logger.error(f"Unexpected error while rendering {self.format_type}: {e}")
+                raise RendererError(f"Unexpected error in {self.format_type} rendering: {str(e)}") from e
             
-            # Выполняем запрос к микросервису
-            response = requests.post(
-                self.renderer_url,
-                json=payload,
-                headers={
-                    'Content-Type': 'application/json',
-                    'Accept': self.content_type
-                },
-                timeout=180  # Соответствует таймауту Celery
+            if not stream:
+                lease.release(ok=True)
+            return response, lease
+    
+    def _send(self, html: str, options: Dict[str, Any], stream: bool) -> requests.Response:
+        """Выполняет запрос к выбранному экземпляру рендерера."""
+        # Подготавливаем запрос
+        payload = {
+            'html': html,
+            'options': options
+        }
+        
+        # Выполняем запрос к микросервису через пул keep-alive соединений
+        session = RendererSessionPool.get_session(self.renderer_url)
+        response = session.post(
+            self.renderer_url,
+            json=payload,
+            headers={
+                'Content-Type': 'application/json',
+                'Accept': self.content_type
+            },
+            timeout=RendererSessionPool.timeout(),
+            stream=stream
+        )
+        
+        # Проверяем успешность запроса
+        response.raise_for_status()
+        
+        # Проверяем MIME-тип ответа
+        if not response.headers.get('Content-Type', '').startswith(self.content_type):
+            response.close()
+            raise RendererError(
+                f"Unexpected content type received: {response.headers.get('Content-Type')}"
             )
+        
+        return response
+    
+    def _connection_error(self, error: Exception) -> RendererError:
+        """Формирует ошибку недоступности рендерера."""
+        # Улучшаем сообщение об ошибке подключения
+        logger.error(f"Unable to connect to renderer at {self.renderer_url}: {error}")
+        renderer_error = RendererError(
+            f"Сервис рендеринга {self.format_type} недоступен. "
+            f"Проверьте, что микросервис {self.renderer_url} запущен и доступен."
+        )
+        renderer_error.__cause__ = error
+        return renderer_error
+    
+    def _request_error(self, error: requests.RequestException) -> RendererError:
+        """Формирует ошибку рендеринга с деталями из ответа рендерера."""
+        # Обрабатываем ошибки сетевых запросов
+        logger.error(f"Request error while rendering {self.format_type}: {error}")
+        error_message = str(error)
+        
+        # Если есть ответ от сервера, пытаемся извлечь детали ошибки
+        if getattr(error, 'response', None) is not None:
+            try:
+                error_data = error.response.json()
+                if 'error' in error_data:
+                    error_message = error_data['error']
+                elif 'message' in error_data:
+                    error_message = error_data['message']
+            except (ValueError, json.JSONDecodeError):
+                # Если не удается разобрать JSON, используем текст ответа
+                if error.response.text:
+                    error_message = error.response.text[:200]  # Ограничиваем длину сообщения
+        
+        renderer_error = RendererError(f"Failed to render {self.format_type}: {error_message}")
+        renderer_error.__cause__ = error
+        return renderer_error
+
+
+class AsyncRendererClient(RendererClient):
+    """
+    Неблокирующий клиент рендеринга для асинхронного режима воркеров.
+    
+    Использует общий httpx.AsyncClient на event loop, поэтому один процесс
+    может держать много запросов к рендереру одновременно.
+    """
+    
+    _clients: Dict[int, httpx.AsyncClient] = {}
+    
+    @classmethod
+    def get_http_client(cls) -> httpx.AsyncClient:
+        """Возвращает пул соединений текущего event loop."""
+        loop_id = id(asyncio.get_running_loop())
+        client = cls._clients.get(loop_id)
+        if client is None:
+            connect_timeout, read_timeout = RendererSessionPool.timeout()
+            client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=settings.RENDER_ASYNC_CONCURRENCY,
+                    max_keepalive_connections=settings.RENDERER_POOL_SIZE
+                ),
+                # Повторяются только неудачные подключения
+                transport=httpx.AsyncHTTPTransport(retries=settings.RENDERER_MAX_RETRIES),
+            )
+            cls._clients[loop_id] = client
+        return client
+    
+    @classmethod
+    async def close_http_client(cls):
+        """Закрывает пул соединений текущего event loop."""
+        client = cls._clients.pop(id(asyncio.get_running_loop()), None)
+        if client is not None:
+            await client.aclose()
+    
+    async def render_to_file(self, html: str, options: Dict[str, Any], file_obj: BinaryIO) -> str:
+        """
+        Выполняет рендеринг и записывает ответ в file_obj чанками.
+        
+        Returns:
+            str: content_type ответа
+        
+        Raises:
+            RendererError: В случае ошибки рендеринга
+        """
+        client = self.get_http_client()
+        failed_urls = set()
+        while True:
+            lease = await sync_to_async(renderer_balancer.acquire)(self.renderer_urls, exclude=failed_urls)
+            self.renderer_url = lease.url
+            try:
+                content_type = await self._stream_to_file(client, html, options, file_obj)
+            except httpx.ConnectError as e:
+                await sync_to_async(lease.release)(ok=False, error=str(e))
+                failed_urls.add(lease.url)
+                if len(failed_urls) < len(self.renderer_urls):
+                    logger.warning(f"Renderer {lease.url} unavailable, failing over: {e}")
+                    continue
+                raise self._connection_error(e)
+            except RendererResponseError as e:
+                await sync_to_async(lease.release)(ok=False, trip=e.status_code >= 500, error=str(e))
+                raise
+            except Exception as e:
+                await sync_to_async(lease.release)(ok=False, error=str(e))
+                if isinstance(e, httpx.HTTPError):
+                    logger.error(f"Request error while rendering {self.format_type}: {e}")
+                    raise RendererError(f"Failed to render {self.format_type}: {str(e)}") from e
+                raise
             
-            # Проверяем успешность запроса
-            response.raise_for_status()
-            
-            # Проверяем MIME-тип ответа
-            if not response.headers.get('Content-Type', '').startswith(self.content_type):
-                raise RendererError(
-                    f"Unexpected content type received: {response.headers.get('Content-Type')}"
+            await sync_to_async(lease.release)(ok=True)
+            return content_type
+    
+    async def _stream_to_file(self, client: httpx.AsyncClient, html: str, options: Dict[str, Any],
+                              file_obj: BinaryIO) -> str:
+        """Выполняет запрос к выбранному экземпляру и записывает ответ в file_obj."""
+        async with client.stream(
+            'POST',
+            self.renderer_url,
+            json={'html': html, 'options': options},
+            headers={'Accept': self.content_type}
+        ) as response:
+            if response.is_error:
+                body = (await response.aread()).decode('utf-8', errors='replace')
+                raise RendererResponseError(
+                    f"Failed to render {self.format_type}: {self._error_message(body) or response.status_code}",
+                    status_code=response.status_code
                 )
             
-            # Возвращаем байты документа и content-type
-            return io.BytesIO(response.content), response.headers.get('Content-Type')
-        
-        except requests.exceptions.ConnectionError as e:
-            # Улучшаем сообщение об ошибке подключения
-            logger.error(f"Unable to connect to renderer at {self.renderer_url}: {e}")
-            raise RendererError(
-                f"Сервис рендеринга {self.format_type} недоступен. "
-                f"Проверьте, что микросервис {self.renderer_url} запущен и доступен."
-            ) from e
-        
-        except requests.RequestException as e:
-            # Обрабатываем ошибки сетевых запросов
-            logger.error(f"Request error while rendering {self.format_type}: {e}")
-            error_message = str(e)
+            content_type = response.headers.get('Content-Type', '')
+            if not content_type.startswith(self.content_type):
+                raise RendererError(f"Unexpected content type received: {content_type}")
             
-            # Если есть ответ от сервера, пытаемся извлечь детали ошибки
-            if hasattr(e, 'response') and e.response is not None:
-                try:
-                    error_data = e.response.json()
-                    if 'error' in error_data:
-                        error_message = error_data['error']
-                    elif 'message' in error_data:
-                        error_message = error_data['message']
-                except (ValueError, json.JSONDecodeError):
-                    # Если не удается разобрать JSON, используем текст ответа
-                    if e.response.text:
-                        error_message = e.response.text[:200]  # Ограничиваем длину сообщения
+            async for chunk in response.aiter_bytes(self.STREAM_CHUNK_SIZE):
+                file_obj.write(chunk)
             
-            raise RendererError(f"Failed to render {self.format_type}: {error_message}") from e
-        
-        except Exception as e:
-            # Обрабатываем прочие ошибки
-            logger.error(f"Unexpected error while rendering {self.format_type}: {e}")
-            raise RendererError(f"Unexpected error in {self.format_type} rendering: {str(e)}") from e
\ No newline at end of file
+            return content_type
+    
+    @staticmethod
+    def _error_message(body: str) -> str:
+        """Извлекает текст ошибки из ответа рендерера."""
+        try:
+            error_data = json.loads(body)
+            return error_data.get('error') or error_data.get('message') or body[:200]
+        except (ValueError, AttributeError):
+            return body[:200]
@@ -56,6 +56,11 @@ public class PdfController : ControllerBase
                 return BadRequest(new { error = "Width and height must be positive" });
             }
             
+            if (request.Options.Pages != null && request.Options.Pages.Exists(p => p.Width <= 0 || p.Height <= 0))
+            {
+                return BadRequest(new { error = "Page width and height must be positive" });
+            }
+            
             if (request.Options.Format != "pdf")
             {
                 return BadRequest(new { error = "Only PDF format is supported" });
@@ -68,6 +73,11 @@ public class PdfController : ControllerBase
             
             return File(pdfData, "application/pdf", $"document_{DateTime.Now:yyyyMMddHHmmss}.pdf");
         }
+        catch (ArgumentException ex)
+        {
+            _logger.LogWarning(ex, "Invalid rendering request");
+            return BadRequest(new { error = ex.Message });
+        }
         catch (Exception ex)
         {
             _logger.LogError(ex, "Error during PDF generation");
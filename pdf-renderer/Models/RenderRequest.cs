@@ -1,3 +1,5 @@
+using System.Collections.Generic;
+
 namespace PdfRenderer.Models;
 
 public class RenderRequest
@@ -15,4 +17,16 @@ public class RenderOptions
     public int Dpi { get; set; } = 300;
     public bool CmykSupport { get; set; } = true;
     public float Bleeds { get; set; } = 0;
+
+    /// <summary>
+    /// Размеры и настройки каждой страницы (в порядке страниц в HTML)
+    /// </summary>
+    public List<PageOptions>? Pages { get; set; }
+}
+
+public class PageOptions
+{
+    public required float Width { get; set; }
+    public required float Height { get; set; }
+    public Dictionary<string, string>? Settings { get; set; }
 } 
\ No newline at end of file
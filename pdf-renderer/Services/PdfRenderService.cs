@@ -1,4 +1,5 @@
 using System;
+using System.Globalization;
 using System.IO;
 using System.Text;
 using System.Threading.Tasks;
@@ -15,6 +16,11 @@ namespace PdfRenderer.Services;
 
 public class PdfRenderService
 {
+    /// <summary>
+    /// Разделитель страниц в HTML документа (см. RendererClient.PAGE_SEPARATOR в backend)
+    /// </summary>
+    public const string PageSeparator = "<!-- page-break -->";
+
     private readonly ILogger<PdfRenderService> _logger;
 
     public PdfRenderService(ILogger<PdfRenderService> logger) 
@@ -24,10 +30,56 @@ public class PdfRenderService
     {
         var options = request.Options;
         
+        if (options.Pages is { Count: > 1 })
+        {
+            return RenderPages(request.Html, options);
+        }
+        
+        return RenderPage(request.Html, options, options.Width, options.Height, options.Bleeds);
+    }
+    
+    /// <summary>
+    /// Рендерит многостраничный документ: каждая страница конвертируется
+    /// со своим размером, затем страницы копируются в итоговый PDF
+    /// </summary>
+    private byte[] RenderPages(string html, RenderOptions options)
+    {
+        var parts = html.Split(PageSeparator);
+        if (parts.Length != options.Pages!.Count)
+        {
+            throw new ArgumentException(
+                $"HTML contains {parts.Length} pages, options describe {options.Pages.Count}");
+        }
+        
+        using var memoryStream = new MemoryStream();
+        using (var pdfDocument = new PdfDocument(new PdfWriter(memoryStream)))
+        {
+            for (int i = 0; i < parts.Length; i++)
+            {
+                var page = options.Pages[i];
+                float bleeds = options.Bleeds;
+                if (page.Settings != null && page.Settings.TryGetValue("bleeds", out var pageBleeds)
+                    && float.TryParse(pageBleeds, NumberStyles.Float, CultureInfo.InvariantCulture, out var parsed))
+                {
+                    bleeds = parsed;
+                }
+                
+                byte[] pageData = RenderPage(parts[i], options, page.Width, page.Height, bleeds);
+                
+                using var pageDocument = new PdfDocument(new PdfReader(new MemoryStream(pageData)));
+                pageDocument.CopyPagesTo(1, pageDocument.GetNumberOfPages(), pdfDocument);
+            }
+        }
+        
+        return memoryStream.ToArray();
+    }
+    
+    private byte[] RenderPage(string html, RenderOptions options, float pageWidthUnits, float pageHeightUnits, float bleeds)
+    {
         // Calculate page size including bleeds
-        float width = UnitConverter.ConvertToPoints(options.Width, options.Unit);
-        float height = UnitConverter.ConvertToPoints(options.Height, options.Unit);
-        float bleedPoints = UnitConverter.ConvertToPoints(options.Bleeds, options.Unit);
+        float width = UnitConverter.ConvertToPoints(pageWidthUnits, options.Unit);
+        float height = UnitConverter.ConvertToPoints(pageHeightUnits, options.Unit);
+        float bleedPoints = UnitConverter.ConvertToPoints(bleeds, options.Unit);
         
         // Add bleeds to page size
         float pageWidth = width + (bleedPoints * 2);
@@ -53,7 +105,7 @@ public class PdfRenderService
         }
         
         // Render HTML to PDF
-        using var htmlStream = new MemoryStream(Encoding.UTF8.GetBytes(request.Html));
+        using var htmlStream = new MemoryStream(Encoding.UTF8.GetBytes(html));
         HtmlConverter.ConvertToPdf(htmlStream, pdfDocument, props);
         
         return memoryStream.ToArray();
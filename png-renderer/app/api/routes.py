@@ -5,6 +5,7 @@ from typing import Optional
 from app.models.request import RenderRequest
 from app.models.response import RenderResponse, HealthResponse
 from app.services.renderer import png_renderer
+from app.services.browser_pool import browser_pool
 from app.services.cache import template_cache
 
 router = APIRouter()
@@ -24,7 +25,8 @@ async def render_png(request: RenderRequest):
             width=request.width,
             height=request.height,
             units=request.units,
-            settings_dict=request.settings
+            settings_dict=request.settings,
+            pages=[page.model_dump() for page in request.pages] if request.pages else None
         )
         
         cached_image = template_cache.get_from_cache(cache_key)
@@ -62,6 +64,8 @@ async def render_png(request: RenderRequest):
 @router.get("/health", response_model=HealthResponse)
 async def health_check():
     """
-    Проверка работоспособности сервиса
+    Проверка работоспособности сервиса и состояния пула браузеров
     """
-    return HealthResponse()
\ No newline at end of file
+    pool_stats = browser_pool.stats()
+    status = "ok" if pool_stats["status"] != "degraded" else "degraded"
+    return HealthResponse(status=status, pool=pool_stats)
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Сравнение задержки рендеринга из памяти и через временные файлы
+
+Запуск:
+    python -m app.benchmark --iterations 20
+    python -m app.benchmark --html-file template.html --width 90 --height 50 --units mm
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from app.models.request import RenderRequest
+from app.services.browser_pool import browser_pool
+from app.services.renderer import png_renderer
+
+
+SAMPLE_HTML = """
+<html>
+  <head>
+    <style>
+      body { font-family: sans-serif; margin: 0; padding: 24px; }
+      .card { border: 2px solid #333; border-radius: 8px; padding: 16px; }
+      h1 { margin: 0 0 8px; }
+    </style>
+  </head>
+  <body>
+    <div class="card">
+      <h1>Иван Иванов</h1>
+      <p>Ведущий разработчик</p>
+      <p>+7 900 000-00-00 · ivan@example.com</p>
+    </div>
+  </body>
+</html>
+"""
+
+
+async def measure(request: RenderRequest, in_memory: bool, iterations: int) -> List[float]:
+    """
+    Возвращает время каждого рендера в миллисекундах
+    """
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        _, error = await png_renderer.render_png(request, in_memory=in_memory)
+        if error:
+            raise RuntimeError(error)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def print_summary(name: str, timings: List[float]):
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(
+        f"{name:<8} mean={statistics.mean(timings):8.1f}ms  "
+        f"median={statistics.median(timings):8.1f}ms  p95={p95:8.1f}ms"
+    )
+
+
+async def main(args):
+    html = SAMPLE_HTML
+    if args.html_file:
+        with open(args.html_file, 'r', encoding='utf-8') as f:
+            html = f.read()
+
+    request = RenderRequest(html=html, width=args.width, height=args.height, units=args.units)
+
+    await browser_pool.start()
+    try:
+        # Прогрев, чтобы не учитывать первый запуск страницы
+        await measure(request, in_memory=True, iterations=1)
+        await measure(request, in_memory=False, iterations=1)
+
+        memory = await measure(request, in_memory=True, iterations=args.iterations)
+        files = await measure(request, in_memory=False, iterations=args.iterations)
+    finally:
+        await browser_pool.stop()
+
+    print(f"Iterations: {args.iterations}, HTML size: {len(html)} chars")
+    print_summary("memory", memory)
+    print_summary("file", files)
+    print(f"Difference (mean): {statistics.mean(files) - statistics.mean(memory):.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PNG render latency: memory vs file")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--html-file", default=None)
+    parser.add_argument("--width", type=int, default=800)
+    parser.add_argument("--height", type=int, default=600)
+    parser.add_argument("--units", default="px")
+    asyncio.run(main(parser.parse_args()))
@@ -28,6 +28,9 @@ class Settings(BaseSettings):
     DEFAULT_QUALITY: int = Field(default=90)
     TIMEOUT: int = Field(default=30)  # в секундах
     
+    # Рендеринг из памяти без временных файлов (False - через TEMP_DIR/OUTPUT_DIR)
+    RENDER_IN_MEMORY: bool = Field(default=True)
+    
     # Пути к временным файлам
     TEMP_DIR: str = Field(default="./temp")
     OUTPUT_DIR: str = Field(default="./output")
@@ -40,9 +43,12 @@ class Settings(BaseSettings):
     BROWSER_HEADLESS: bool = Field(default=True)
     BROWSER_ARGS: list = Field(default=["--no-sandbox", "--disable-setuid-sandbox"])
     
-    # Максимальное количество параллельных браузеров
+    # Максимальное количество параллельных браузеров (размер пула)
     MAX_CONCURRENT_BROWSERS: int = Field(default=5)
     
+    # Количество рендеров, после которого браузер из пула пересоздается
+    BROWSER_MAX_RENDERS: int = Field(default=200)
+    
     # Максимальный размер HTML в байтах
     MAX_HTML_SIZE: int = Field(default=10_000_000)  # 10MB
     
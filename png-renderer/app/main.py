@@ -8,6 +8,7 @@ from loguru import logger
 
 from app.config import settings
 from app.api.routes import router as api_router
+from app.services.browser_pool import browser_pool
 
 
 # Настройка логирования
@@ -71,6 +72,9 @@ async def startup_event():
     os.makedirs(settings.OUTPUT_DIR, exist_ok=True)
     os.makedirs(settings.CACHE_DIR, exist_ok=True)
     
+    # Прогреваем пул браузеров
+    await browser_pool.start()
+    
     logger.info(f"Server running at http://{settings.HOST}:{settings.PORT}")
     logger.info(f"Documentation available at http://{settings.HOST}:{settings.PORT}/api/docs")
 
@@ -79,6 +83,9 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     logger.info(f"Shutting down {settings.APP_NAME}")
+    
+    # Закрываем браузеры пула
+    await browser_pool.stop()
 
 
 # Запуск приложения (при прямом выполнении файла)
@@ -1,5 +1,24 @@
-from pydantic import BaseModel, Field, field_validator
-from typing import Dict, Optional, List, Any, Union
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Dict, Optional, List, Any, Tuple, Union
+
+# Разделитель страниц в HTML документа (см. RendererClient.PAGE_SEPARATOR в backend)
+PAGE_SEPARATOR = "<!-- page-break -->"
+
+
+class PageOptions(BaseModel):
+    """
+    Размеры и настройки одной страницы многостраничного документа
+    """
+    width: float
+    height: float
+    settings: Optional[Dict[str, str]] = None
+    
+    @field_validator('width', 'height')
+    def validate_dimensions(cls, v):
+        """Проверка размеров страницы"""
+        if v <= 0:
+            raise ValueError("dimensions must be positive")
+        return v
 
 
 class RenderRequest(BaseModel):
@@ -12,9 +31,9 @@ class RenderRequest(BaseModel):
     # Данные для подстановки (опционально)
     data: Optional[Dict[str, str]] = None
     
-    # Размеры страницы
-    width: int
-    height: int
+    # Размеры страницы (в mm бывают дробными)
+    width: float
+    height: float
     
     # Единицы измерения (px, mm)
     units: str = "px"
@@ -22,6 +41,32 @@ class RenderRequest(BaseModel):
     # Дополнительные настройки
     settings: Optional[Dict[str, str]] = None
     
+    # Размеры и настройки каждой страницы (в порядке страниц в HTML)
+    pages: Optional[List[PageOptions]] = None
+    
+    @model_validator(mode='before')
+    @classmethod
+    def unwrap_options(cls, data: Any) -> Any:
+        """
+        Принимает формат запроса backend: {"html": ..., "options": {...}},
+        где размеры, единицы и настройки передаются внутри options
+        """
+        if not isinstance(data, dict) or 'options' not in data or 'width' in data:
+            return data
+        
+        options = dict(data['options'] or {})
+        options.pop('format', None)
+        unwrapped = {
+            'html': data.get('html'),
+            'width': options.pop('width', None),
+            'height': options.pop('height', None),
+            'units': options.pop('unit', 'px'),
+            'pages': options.pop('pages', None),
+        }
+        if options:
+            unwrapped['settings'] = {key: str(value) for key, value in options.items()}
+        return unwrapped
+    
     @field_validator('units')
     def validate_units(cls, v):
         """Проверка корректности единиц измерения"""
@@ -40,4 +85,25 @@ class RenderRequest(BaseModel):
         """Получение настройки по ключу с значением по умолчанию"""
         if not self.settings:
             return default
-        return self.settings.get(key, default)
\ No newline at end of file
+        return self.settings.get(key, default)
+    
+    def split_pages(self) -> List[Tuple[str, PageOptions]]:
+        """
+        Разбивает документ на страницы с собственными размерами и настройками
+        
+        Настройки страницы дополняют настройки запроса. Для одностраничного
+        документа возвращается одна страница с параметрами запроса.
+        """
+        if not self.pages or len(self.pages) < 2:
+            return [(self.html, PageOptions(width=self.width, height=self.height, settings=self.settings))]
+        
+        parts = self.html.split(PAGE_SEPARATOR)
+        if len(parts) != len(self.pages):
+            raise ValueError(f"HTML contains {len(parts)} pages, options describe {len(self.pages)}")
+        
+        pages = []
+        for html, page in zip(parts, self.pages):
+            settings = dict(self.settings or {})
+            settings.update(page.settings or {})
+            pages.append((html, PageOptions(width=page.width, height=page.height, settings=settings)))
+        return pages
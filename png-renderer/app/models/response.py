@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, Any
 
 
 class RenderResponse(BaseModel):
@@ -15,4 +15,6 @@ class HealthResponse(BaseModel):
     Модель ответа на запрос проверки здоровья
     """
     status: str = "ok"
-    service: str = "png-renderer"
\ No newline at end of file
+    service: str = "png-renderer"
+    # Состояние пула браузеров
+    pool: Optional[Dict[str, Any]] = None
\ No newline at end of file
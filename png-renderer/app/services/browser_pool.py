@@ -0,0 +1,266 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Optional, Dict, Any, AsyncIterator
+from loguru import logger
+from playwright.async_api import async_playwright, Browser, BrowserContext, Playwright
+
+from app.config import settings
+
+
+class PooledBrowser:
+    """
+    Браузер из пула с учетом количества выполненных рендеров
+    """
+
+    def __init__(self, slot: int, browser: Browser):
+        self.slot = slot
+        self.browser = browser
+        self.renders = 0
+        self.started_at = time.time()
+        self.crashed = False
+
+        # Браузер может упасть в любой момент, помечаем его для пересоздания
+        browser.on("disconnected", lambda _: self._on_disconnected())
+
+    def _on_disconnected(self):
+        if not self.crashed:
+            logger.warning(f"Browser in slot {self.slot} disconnected")
+        self.crashed = True
+
+    @property
+    def is_healthy(self) -> bool:
+        """Браузер жив и может принимать новые контексты"""
+        return not self.crashed and self.browser.is_connected()
+
+
+class BrowserPool:
+    """
+    Пул долгоживущих браузеров Playwright
+
+    Браузеры запускаются один раз при старте приложения и переиспользуются
+    между запросами. Каждый запрос получает свежий изолированный контекст.
+    Браузер пересоздается после BROWSER_MAX_RENDERS рендеров или при падении.
+    """
+
+    def __init__(self):
+        """Инициализация пула браузеров"""
+        self.size = settings.MAX_CONCURRENT_BROWSERS
+        self.max_renders = settings.BROWSER_MAX_RENDERS
+        self.browser_type = settings.BROWSER_TYPE
+        self.browser_headless = settings.BROWSER_HEADLESS
+        self.browser_args = settings.BROWSER_ARGS
+
+        self._playwright: Optional[Playwright] = None
+        self._slots: Optional[asyncio.Queue] = None
+        self._browsers: Dict[int, Optional[PooledBrowser]] = {}
+        self._background_tasks: set = set()
+        self._started = False
+
+        # Статистика пула
+        self._total_renders = 0
+        self._recycled = 0
+        self._crashes = 0
+        self._launch_failures = 0
+
+    async def start(self):
+        """
+        Запускает Playwright и прогревает браузеры пула
+        """
+        if self._started:
+            return
+
+        logger.info(f"Starting browser pool: {self.size} x {self.browser_type}")
+        self._playwright = await async_playwright().start()
+        self._slots = asyncio.Queue()
+
+        for slot in range(self.size):
+            try:
+                self._browsers[slot] = await self._launch(slot)
+            except Exception as e:
+                # Слот будет запущен лениво при первом запросе
+                logger.error(f"Error launching browser for slot {slot}: {str(e)}")
+                self._browsers[slot] = None
+                self._launch_failures += 1
+            self._slots.put_nowait(slot)
+
+        self._started = True
+
+    async def stop(self):
+        """
+        Закрывает все браузеры пула и останавливает Playwright
+        """
+        if not self._started:
+            return
+
+        logger.info("Stopping browser pool")
+        self._started = False
+
+        for task in list(self._background_tasks):
+            task.cancel()
+
+        for slot, pooled in self._browsers.items():
+            if pooled:
+                await self._close_browser(pooled)
+            self._browsers[slot] = None
+
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    @asynccontextmanager
+    async def new_context(self, **context_options) -> AsyncIterator[BrowserContext]:
+        """
+        Выдает новый изолированный контекст браузера из пула
+
+        Ожидает свободный слот, если все браузеры заняты.
+
+        Args:
+            context_options: Параметры для browser.new_context (viewport и т.д.)
+        """
+        if not self._started:
+            await self.start()
+
+        slot = await self._slots.get()
+        pooled = None
+        context = None
+
+        try:
+            pooled = await self._ensure_browser(slot)
+            context = await pooled.browser.new_context(**context_options)
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await asyncio.wait_for(context.close(), timeout=5)
+                except Exception as e:
+                    logger.warning(f"Error closing browser context in slot {slot}: {str(e)}")
+
+            if pooled is not None:
+                pooled.renders += 1
+                self._total_renders += 1
+
+            self._release(slot, pooled)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Возвращает состояние пула для health-эндпоинта
+        """
+        if not self._started:
+            return {"status": "not_started", "size": self.size}
+
+        browsers = []
+        for slot in sorted(self._browsers):
+            pooled = self._browsers[slot]
+            browsers.append({
+                "slot": slot,
+                "running": pooled is not None and pooled.is_healthy,
+                "renders": pooled.renders if pooled else 0,
+                "uptime": round(time.time() - pooled.started_at, 1) if pooled else 0,
+            })
+
+        healthy = sum(1 for b in browsers if b["running"])
+
+        return {
+            "status": "ok" if healthy else "degraded",
+            "size": self.size,
+            "healthy": healthy,
+            "available": self._slots.qsize(),
+            "max_renders_per_browser": self.max_renders,
+            "total_renders": self._total_renders,
+            "recycled": self._recycled,
+            "crashes": self._crashes,
+            "launch_failures": self._launch_failures,
+            "browsers": browsers,
+        }
+
+    def _release(self, slot: int, pooled: Optional[PooledBrowser]):
+        """
+        Возвращает слот в пул, при необходимости пересоздавая браузер
+        """
+        if pooled is None or not self._started:
+            self._slots.put_nowait(slot)
+            return
+
+        if not pooled.is_healthy:
+            self._crashes += 1
+            self._schedule_recycle(slot, pooled, reason="crash")
+        elif self.max_renders and pooled.renders >= self.max_renders:
+            self._schedule_recycle(slot, pooled, reason=f"{pooled.renders} renders")
+        else:
+            self._slots.put_nowait(slot)
+
+    def _schedule_recycle(self, slot: int, pooled: PooledBrowser, reason: str):
+        """
+        Пересоздает браузер в фоне, чтобы не задерживать ответ клиенту.
+        Слот возвращается в пул только после запуска нового браузера.
+        """
+        logger.info(f"Recycling browser in slot {slot} ({reason})")
+        self._recycled += 1
+        self._browsers[slot] = None
+
+        task = asyncio.create_task(self._recycle(slot, pooled))
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    async def _recycle(self, slot: int, pooled: PooledBrowser):
+        try:
+            await self._close_browser(pooled)
+            try:
+                self._browsers[slot] = await self._launch(slot)
+            except Exception as e:
+                logger.error(f"Error relaunching browser for slot {slot}: {str(e)}")
+                self._launch_failures += 1
+        finally:
+            self._slots.put_nowait(slot)
+
+    async def _ensure_browser(self, slot: int) -> PooledBrowser:
+        """
+        Возвращает живой браузер слота, запуская его при необходимости
+        """
+        pooled = self._browsers.get(slot)
+        if pooled is not None and pooled.is_healthy:
+            return pooled
+
+        if pooled is not None:
+            self._crashes += 1
+            await self._close_browser(pooled)
+
+        try:
+            pooled = await self._launch(slot)
+        except Exception:
+            self._browsers[slot] = None
+            self._launch_failures += 1
+            raise
+
+        self._browsers[slot] = pooled
+        return pooled
+
+    async def _launch(self, slot: int) -> PooledBrowser:
+        """
+        Запускает новый браузер для слота
+        """
+        # Выбираем тип браузера
+        if self.browser_type == "firefox":
+            browser_type = self._playwright.firefox
+        elif self.browser_type == "webkit":
+            browser_type = self._playwright.webkit
+        else:
+            browser_type = self._playwright.chromium
+
+        browser = await browser_type.launch(
+            headless=self.browser_headless,
+            args=self.browser_args
+        )
+        logger.info(f"Launched browser for slot {slot}")
+        return PooledBrowser(slot, browser)
+
+    async def _close_browser(self, pooled: PooledBrowser):
+        try:
+            await asyncio.wait_for(pooled.browser.close(), timeout=10)
+        except Exception as e:
+            logger.warning(f"Error closing browser in slot {pooled.slot}: {str(e)}")
+
+
+# Создаем экземпляр пула для использования в приложении
+browser_pool = BrowserPool()
@@ -3,7 +3,7 @@ import hashlib
 import json
 import time
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 from loguru import logger
 
 from app.config import settings
@@ -23,8 +23,9 @@ class TemplateCache:
         # Создаем директорию для кэша, если она не существует
         os.makedirs(self.cache_dir, exist_ok=True)
         
-    def get_cache_key(self, html: str, width: int, height: int, units: str, 
-                      settings_dict: Optional[Dict[str, str]] = None) -> str:
+    def get_cache_key(self, html: str, width: float, height: float, units: str, 
+                      settings_dict: Optional[Dict[str, str]] = None,
+                      pages: Optional[List[Dict[str, Any]]] = None) -> str:
         """
         Генерирует ключ кэша на основе параметров рендеринга
         
@@ -34,6 +35,7 @@ class TemplateCache:
             height: Высота
             units: Единицы измерения
             settings_dict: Дополнительные настройки
+            pages: Размеры и настройки страниц
             
         Returns:
             str: Хеш-ключ для кэша
@@ -49,6 +51,9 @@ class TemplateCache:
         if settings_dict:
             params["settings"] = settings_dict
         
+        if pages:
+            params["pages"] = pages
+        
         # Сериализуем параметры
         params_str = json.dumps(params, sort_keys=True)
         
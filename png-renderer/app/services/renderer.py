@@ -1,19 +1,19 @@
 import os
+import time
 import uuid
 import asyncio
+from io import BytesIO
 from pathlib import Path
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, List, Tuple
 from loguru import logger
-from playwright.async_api import async_playwright
+from playwright.async_api import BrowserContext
 from PIL import Image
 
 from app.config import settings
-from app.models.request import RenderRequest
+from app.models.request import RenderRequest, PageOptions
+from app.services.browser_pool import browser_pool
 from app.utils.unit_converter import calculate_dimensions
 
-# Создаем семафор для ограничения количества параллельных браузеров
-browser_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_BROWSERS)
-
 class PngRenderer:
     """
     Сервис для рендеринга HTML в PNG-изображения с использованием Playwright
@@ -25,21 +25,30 @@ class PngRenderer:
         self.output_dir = settings.OUTPUT_DIR
         self.default_dpi = settings.DEFAULT_DPI
         self.timeout = settings.TIMEOUT
-        self.browser_type = settings.BROWSER_TYPE
-        self.browser_headless = settings.BROWSER_HEADLESS
-        self.browser_args = settings.BROWSER_ARGS
 
-    async def render_png(self, request: RenderRequest) -> Tuple[bytes, Optional[str]]:
+    async def render_png(self, request: RenderRequest,
+                         in_memory: Optional[bool] = None) -> Tuple[bytes, Optional[str]]:
         """
         Рендерит HTML в PNG-изображение с ограничением параллельных запросов
         
         Args:
             request: Данные запроса на рендеринг
+            in_memory: Рендерить без временных файлов (по умолчанию RENDER_IN_MEMORY)
             
         Returns:
             Tuple[bytes, Optional[str]]: Бинарные данные изображения и сообщение об ошибке (если есть)
         """
+        if in_memory is None:
+            in_memory = settings.RENDER_IN_MEMORY
+        
+        html_path = None
+        output_path = None
+        
         try:
+            pages = request.split_pages()
+            if len(pages) > 1:
+                return await self._render_multipage(pages, request.units), None
+            
             # Получаем DPI из настроек или используем значение по умолчанию
             dpi = int(request.get_setting('dpi', self.default_dpi))
             
@@ -49,135 +58,212 @@ class PngRenderer:
             # Расчет размера в пикселях
             width, height = self._calculate_dimensions(request.width, request.height, request.units, dpi)
             
-            # Генерируем уникальное имя для файла
-            file_id = str(uuid.uuid4())
-            html_path = os.path.join(self.temp_dir, f"{file_id}.html")
-            output_path = os.path.join(self.output_dir, f"{file_id}.png")
-            
-            # Для больших HTML используем запись по частям
             html_size = len(request.html)
-            if html_size > settings.MAX_HTML_SIZE:  # если больше максимального размера
+            if html_size > settings.MAX_HTML_SIZE:
                 logger.warning(f"Large HTML detected: {html_size/1_000_000:.2f}MB (max: {settings.MAX_HTML_SIZE/1_000_000:.2f}MB)")
-                with open(html_path, 'w', encoding='utf-8') as f:
-                    # Записываем по частям, чтобы не держать всё в памяти
-                    chunk_size = 100_000
-                    for i in range(0, html_size, chunk_size):
-                        f.write(request.html[i:i+chunk_size])
-            else:
-                # Для обычных HTML просто записываем
-                with open(html_path, 'w', encoding='utf-8') as f:
-                    f.write(request.html)
+            
+            if not in_memory:
+                html_path, output_path = self._write_temp_html(request.html)
             
             logger.info(f"Rendering HTML to PNG with dimensions: {width}x{height}px, DPI: {dpi}")
+            started = time.perf_counter()
             
-            # Используем семафор для ограничения количества параллельных браузеров
-            async with browser_semaphore:
-                try:
-                    # Запускаем Playwright и рендерим HTML в PNG с таймаутом
-                    image_bytes = await asyncio.wait_for(
-                        self._render_with_playwright(
-                            html_path=html_path,
-                            width=width,
-                            height=height,
-                            output_path=output_path,
-                            transparent=transparent
-                        ),
-                        timeout=settings.RENDER_TIMEOUT
-                    )
-                except asyncio.TimeoutError:
-                    return bytes(), f"Rendering timeout after {settings.RENDER_TIMEOUT} seconds"
+            # Получаем изолированный контекст из пула браузеров.
+            # Пул ограничивает количество параллельных рендеров (MAX_CONCURRENT_BROWSERS)
+            async with browser_pool.new_context(viewport={'width': width, 'height': height}) as context:
+                # Рендерим HTML в PNG с таймаутом
+                image_bytes = await asyncio.wait_for(
+                    self._render_with_playwright(
+                        context=context,
+                        html=request.html,
+                        transparent=transparent,
+                        html_path=html_path,
+                        output_path=output_path
+                    ),
+                    timeout=settings.RENDER_TIMEOUT
+                )
             
-            # Удаляем временный HTML-файл
-            os.remove(html_path)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            mode = "memory" if in_memory else "file"
+            logger.info(f"PNG rendered in {elapsed_ms:.0f}ms ({mode}, {len(image_bytes)} bytes)")
             
             return image_bytes, None
             
+        except asyncio.TimeoutError:
+            logger.error(f"Rendering timed out after {settings.RENDER_TIMEOUT} seconds")
+            return bytes(), f"Rendering timeout after {settings.RENDER_TIMEOUT} seconds"
+            
         except Exception as e:
             logger.error(f"Error rendering PNG: {str(e)}")
             return bytes(), f"Error rendering PNG: {str(e)}"
+        
+        finally:
+            # Временные файлы удаляются на любом пути выхода, включая таймаут
+            self._remove_temp_files(html_path, output_path)
 
-    async def _render_with_playwright(self, html_path: str, width: int, height: int, 
-                                    output_path: str, transparent: bool) -> bytes:
+    async def _render_multipage(self, pages: List[Tuple[str, PageOptions]], units: str) -> bytes:
         """
-        Рендерит HTML в PNG с использованием Playwright с обработкой таймаутов
+        Рендерит страницы с собственными размерами и склеивает их в одно
+        изображение сверху вниз
+        
+        Все страницы рендерятся в одном контексте браузера из пула: перед
+        каждой страницей меняется только размер viewport. Страницы
+        загружаются из памяти независимо от RENDER_IN_MEMORY.
         """
-        try:
-            async with asyncio.timeout(settings.RENDER_TIMEOUT):
-                async with async_playwright() as p:
-                    # Выбираем тип браузера
-                    if self.browser_type == "firefox":
-                        browser_type = p.firefox
-                    elif self.browser_type == "webkit":
-                        browser_type = p.webkit
-                    else:
-                        browser_type = p.chromium
-                        
-                    # Запускаем браузер
-                    browser = await browser_type.launch(
-                        headless=self.browser_headless, 
-                        args=self.browser_args
-                    )
-                    
-                    # Создаем новый контекст
-                    context = await browser.new_context(
+        started = time.perf_counter()
+        images = []
+        transparent_any = False
+        
+        async with browser_pool.new_context() as context:
+            for index, (html, page_options) in enumerate(pages):
+                settings_dict = page_options.settings or {}
+                dpi = int(settings_dict.get('dpi', self.default_dpi))
+                transparent = settings_dict.get('transparency', 'false').lower() == 'true'
+                transparent_any = transparent_any or transparent
+                
+                width, height = self._calculate_dimensions(page_options.width, page_options.height, units, dpi)
+                logger.info(f"Rendering page {index + 1}/{len(pages)}: {width}x{height}px, DPI: {dpi}")
+                
+                image_bytes = await asyncio.wait_for(
+                    self._render_with_playwright(
+                        context=context,
+                        html=html,
+                        transparent=transparent,
                         viewport={'width': width, 'height': height}
-                    )
-                    
-                    # Открываем новую страницу
-                    page = await context.new_page()
-                    
-                    # Если нужен прозрачный фон
-                    if transparent:
-                        await page.add_style_tag(content="""
-                            html, body {
-                                background-color: transparent !important;
-                            }
-                        """)
-                        
-                    # Загружаем HTML из файла с обработкой таймаута
-                    try:
-                        await page.goto(
-                            f"file://{html_path}", 
-                            wait_until="networkidle", 
-                            timeout=self.timeout * 1000
-                        )
-                    except Exception as e:
-                        logger.error(f"Error loading page: {str(e)}")
-                        # Даже если таймаут, пробуем сделать скриншот того, что успело загрузиться
-                        logger.warning("Trying to capture partial render after timeout")
-                    
-                    # Настройки снимка экрана
-                    screenshot_options = {
-                        'path': output_path,
-                        'full_page': True,
-                        'type': 'png',
-                        'omit_background': transparent
-                    }
-                    
-                    # Делаем снимок экрана
-                    await page.screenshot(**screenshot_options)
-                    
-                    # Закрываем браузер
-                    await browser.close()
-                    
-                    # Читаем сгенерированный файл
-                    with open(output_path, 'rb') as f:
-                        image_bytes = f.read()
-                        
-                    # Удаляем файл
-                    os.remove(output_path)
-                    
-                    return image_bytes
-                    
-        except asyncio.TimeoutError:
-            logger.error(f"Rendering timed out after {settings.RENDER_TIMEOUT} seconds")
-            raise RuntimeError(f"Rendering timeout exceeded ({settings.RENDER_TIMEOUT}s)")
+                    ),
+                    timeout=settings.RENDER_TIMEOUT
+                )
+                images.append(Image.open(BytesIO(image_bytes)))
+        
+        # Склеиваем страницы по вертикали
+        mode = 'RGBA' if transparent_any else 'RGB'
+        background = (0, 0, 0, 0) if transparent_any else (255, 255, 255)
+        canvas = Image.new(mode, (max(image.width for image in images), sum(image.height for image in images)), background)
+        
+        offset = 0
+        for image in images:
+            canvas.paste(image.convert(mode), (0, offset))
+            offset += image.height
+        
+        output = BytesIO()
+        canvas.save(output, format='PNG')
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Multi-page PNG rendered in {elapsed_ms:.0f}ms ({len(pages)} pages, {output.tell()} bytes)")
+        return output.getvalue()
 
-    def _calculate_dimensions(self, width: int, height: int, units: str, dpi: int) -> Tuple[int, int]:
+    async def _render_with_playwright(self, context: BrowserContext, html: str, transparent: bool,
+                                      html_path: Optional[str] = None,
+                                      output_path: Optional[str] = None,
+                                      viewport: Optional[Dict[str, int]] = None) -> bytes:
+        """
+        Рендерит HTML в PNG в контексте браузера из пула
+        
+        Если пути не переданы, HTML загружается напрямую из памяти,
+        а снимок экрана возвращается буфером без записи на диск.
+        """
+        # Открываем новую страницу
+        page = await context.new_page()
+        
+        # Размер страницы многостраничного документа задается для каждой вкладки
+        if viewport:
+            await page.set_viewport_size(viewport)
+        
+        # Загружаем HTML с обработкой таймаута
+        try:
+            if html_path:
+                await page.goto(
+                    f"file://{html_path}", 
+                    wait_until="networkidle", 
+                    timeout=self.timeout * 1000
+                )
+            else:
+                await page.set_content(
+                    html,
+                    wait_until="networkidle",
+                    timeout=self.timeout * 1000
+                )
+        except Exception as e:
+            logger.error(f"Error loading page: {str(e)}")
+            # Даже если таймаут, пробуем сделать скриншот того, что успело загрузиться
+            logger.warning("Trying to capture partial render after timeout")
+        
+        # Если нужен прозрачный фон (после загрузки, иначе стиль потеряется при навигации)
+        if transparent:
+            await page.add_style_tag(content="""
+                html, body {
+                    background-color: transparent !important;
+                }
+            """)
+        
+        # Настройки снимка экрана
+        screenshot_options = {
+            'full_page': True,
+            'type': 'png',
+            'omit_background': transparent
+        }
+        
+        if not output_path:
+            # Делаем снимок экрана сразу в буфер
+            return await page.screenshot(**screenshot_options)
+        
+        # Делаем снимок экрана в файл
+        await page.screenshot(path=output_path, **screenshot_options)
+        
+        # Читаем сгенерированный файл
+        with open(output_path, 'rb') as f:
+            image_bytes = f.read()
+        
+        return image_bytes
+
+    def _write_temp_html(self, html: str) -> Tuple[str, str]:
+        """
+        Записывает HTML во временный файл для файлового режима рендеринга
+        
+        Returns:
+            Tuple[str, str]: Путь к HTML-файлу и путь для PNG-файла
+        """
+        # Генерируем уникальное имя для файла
+        file_id = str(uuid.uuid4())
+        html_path = os.path.join(self.temp_dir, f"{file_id}.html")
+        output_path = os.path.join(self.output_dir, f"{file_id}.png")
+        
+        # Для больших HTML используем запись по частям
+        html_size = len(html)
+        with open(html_path, 'w', encoding='utf-8') as f:
+            if html_size > settings.MAX_HTML_SIZE:
+                # Записываем по частям, чтобы не держать всё в памяти
+                chunk_size = 100_000
+                for i in range(0, html_size, chunk_size):
+                    f.write(html[i:i+chunk_size])
+            else:
+                # Для обычных HTML просто записываем
+                f.write(html)
+        
+        return html_path, output_path
+
+    def _remove_temp_files(self, *paths: Optional[str]):
+        """
+        Удаляет временные файлы рендеринга, если они были созданы
+        """
+        for path in paths:
+            if not path:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Error removing temp file {path}: {str(e)}")
+
+    def _calculate_dimensions(self, width: float, height: float, units: str, dpi: int) -> Tuple[int, int]:
         """
         Пересчитывает размеры в пиксели в зависимости от единиц измерения
+        
+        Размеры могут быть дробными (например, 85.6 mm), viewport требует целых пикселей
         """
-        return calculate_dimensions(width, height, units, dpi)
+        width_px, height_px = calculate_dimensions(width, height, units, dpi)
+        return int(round(width_px)), int(round(height_px))
 
 
 # Создаем экземпляр рендерера для использования в приложении